@@ -58,7 +58,11 @@ def _evaluate_invalid_fitness(toolbox, population):
     Returns the count of individuals with invalid fitness
     '''
     invalid_ind = [ind for ind in population if not ind.fitness.valid]
-    fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+    if hasattr(toolbox, 'evaluate_population'):
+        fitnesses = toolbox.evaluate_population(
+            invalid_ind, map_function=toolbox.map)
+    else:
+        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
     for ind, fit in zip(invalid_ind, fitnesses):
         ind.fitness.values = fit
 
@@ -102,7 +102,8 @@ class DEAPOptimisation(bluepyopt.optimisations.Optimisation):
                  cxpb=1.0,
                  map_function=None,
                  hof=None,
-                 selector_name=None):
+                 selector_name=None,
+                 split_protocols=False):
         """Constructor
 
         Args:
@@ -120,6 +121,9 @@ class DEAPOptimisation(bluepyopt.optimisations.Optimisation):
             hof (hof): Hall of Fame object
             selector_name (str): The selector used in the evolutionary
                 algorithm, possible values are 'IBEA' or 'NSGA2'
+            split_protocols (bool): map every protocol of every individual
+                as a separate task, instead of one task per individual
+                (requires an evaluator with an evaluate_population method)
         """
 
         super(DEAPOptimisation, self).__init__(evaluator=evaluator)
@@ -131,6 +135,7 @@ class DEAPOptimisation(bluepyopt.optimisations.Optimisation):
         self.cxpb = cxpb
         self.mutpb = mutpb
         self.map_function = map_function
+        self.split_protocols = split_protocols
 
         self.selector_name = selector_name
         if self.selector_name is None:
@@ -204,6 +209,12 @@ class DEAPOptimisation(bluepyopt.optimisations.Optimisation):
             self.evaluator.init_simulator_and_evaluate_with_lists
         )
 
+        if self.split_protocols:
+            self.toolbox.register(
+                "evaluate_population",
+                self.evaluator.evaluate_population
+            )
+
         # Register the mate operator
         self.toolbox.register(
             "mate",
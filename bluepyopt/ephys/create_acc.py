@@ -27,6 +27,15 @@ logger = logging.getLogger(__name__)
 # Inhomogeneous expression for scaled parameter in Arbor
 RangeIExpr = namedtuple("RangeIExpr", "name, value, scale")
 
+# Parsed templates and mechanism catalogue metadata, reused by create_acc
+_templates_cache = {}
+_mech_catalogue_meta_cache = {}
+
+# Arbor morphologies and label dicts parsed by load_acc, indexed by their
+# description, reused for every evaluation of a cell model
+_arb_morphology_cache = {}
+_arb_label_dict_cache = {}
+
 
 class ArbVar:
     """Definition of a Neuron to Arbor parameter conversion"""
@@ -371,7 +380,15 @@ class ArbNmodlMechFormatter:
             ext_catalogues (): Mapping of catalogue name to directory
             with NMODL files defining the mechanisms.
         """
-        self.cats = self._load_mech_catalogue_meta(ext_catalogues)
+        key = (
+            tuple(sorted((cat, str(cat_nmodl))
+                         for cat, cat_nmodl in ext_catalogues.items()))
+            if ext_catalogues is not None else None
+        )
+        if key not in _mech_catalogue_meta_cache:
+            _mech_catalogue_meta_cache[key] = \
+                self._load_mech_catalogue_meta(ext_catalogues)
+        self.cats = _mech_catalogue_meta_cache[key]
 
     @staticmethod
     def _load_catalogue_meta(cat_dir):
@@ -731,7 +748,12 @@ def create_acc(
         replace_axon_path = None
         modified_morphology_path = None
 
-    templates = _read_templates(template_dir, template_filename)
+    templates_key = (str(template_dir), template_filename)
+    if templates_key not in _templates_cache:
+        _templates_cache[templates_key] = _read_templates(
+            template_dir, template_filename
+        )
+    templates = _templates_cache[templates_key]
 
     default_location_order = list(ArbFileMorphology.region_labels.values())
 
@@ -852,6 +874,22 @@ def create_acc(
     return ret
 
 
+def _cell_json(output):
+    """Return the parsed JSON component of the output of create_acc"""
+
+    cell_json = [
+        comp_rendered
+        for comp, comp_rendered in output.items()
+        if pathlib.Path(comp).suffix == ".json"
+    ]
+    if len(cell_json) != 1:
+        raise CreateAccException(
+            "JSON file from create_acc is non-unique: %s" % cell_json
+        )
+
+    return json.loads(cell_json[0])
+
+
 def write_acc(
     output_dir,
     cell,
@@ -883,17 +921,7 @@ def write_acc(
         sim=sim,
     )
 
-    cell_json = [
-        comp_rendered
-        for comp, comp_rendered in output.items()
-        if pathlib.Path(comp).suffix == ".json"
-    ]
-    if len(cell_json) != 1:
-        raise CreateAccException(
-            "JSON file from create_acc is non-unique: %s" % cell_json
-        )
-
-    cell_json = json.loads(cell_json[0])
+    cell_json = _cell_json(output)
 
     output_dir = pathlib.Path(output_dir)
     if not output_dir.exists():
@@ -943,6 +971,70 @@ def read_acc(cell_json_filename):
     return cell_json, morpho, decor, labels
 
 
+def cache_acc_components(output, morphology_path):
+    """Parse the morphology and label dict of create_acc output, if needed
+
+    The parsed components are cached in this process (and in the processes
+    forked from it), indexed by the morphology path, the axon replacement
+    and the label dict description.
+
+    Args:
+        output (dict): output of create_acc, filename -> rendered JSON/ACC
+        morphology_path (str): path to the morphology file of the cell
+
+    Returns:
+        tuple (cell_json, morphology, label dict), the label dict is shared
+        and should not be modified
+    """
+
+    cell_json = _cell_json(output)
+
+    replace_axon = cell_json["morphology"].get("replace_axon", None)
+    if replace_axon is not None:
+        replace_axon = output[replace_axon]
+
+    morpho_key = (str(morphology_path), replace_axon)
+    if morpho_key not in _arb_morphology_cache:
+        _arb_morphology_cache[morpho_key] = ArbFileMorphology.load(
+            morphology_path,
+            io.StringIO(replace_axon) if replace_axon is not None else None,
+        )
+
+    labels_acc = output[cell_json["label_dict"]]
+    if labels_acc not in _arb_label_dict_cache:
+        _arb_label_dict_cache[labels_acc] = arbor.load_component(
+            io.StringIO(labels_acc)
+        ).component
+
+    return (
+        cell_json,
+        _arb_morphology_cache[morpho_key],
+        _arb_label_dict_cache[labels_acc],
+    )
+
+
+def load_acc(output, morphology_path):
+    """Return constituents to build an Arbor cable cell from create_acc output
+
+    In-memory counterpart of read_acc, without writing or reading files.
+    Only the decor is parsed for every call, the morphology and the label
+    dict are cached (see cache_acc_components).
+
+    Args:
+        output (dict): output of create_acc, filename -> rendered JSON/ACC
+        morphology_path (str): path to the morphology file of the cell
+    """
+
+    cell_json, morpho, labels = cache_acc_components(output, morphology_path)
+
+    decor = arbor.load_component(
+        io.StringIO(output[cell_json["decor"]])
+    ).component
+
+    # Copy, since locations of protocols can be added to the label dict
+    return cell_json, morpho, decor, arbor.label_dict(labels)
+
+
 class CreateAccException(Exception):
     """Exceptions generated by create_acc module"""
 
@@ -21,15 +21,121 @@ Copyright (c) 2016-2020, EPFL/Blue Brain Project
 
 # pylint: disable=R0914
 
+import collections
+import contextlib
 import logging
+import threading
+
 import numpy as np
 
 from bluepyopt.ephys.base import BaseEPhys
 from bluepyopt.ephys.serializer import DictMixin
+from bluepyopt.ephys import timing
 from .extra_features_utils import *
 
 logger = logging.getLogger(__name__)
 
+# eFEL features of the voltage after the end of the stimulus
+# eFEL features that only use the voltage between the start of the voltage
+# base and stim_end, and so give the same values on recordings cropped to
+# that interval (see eFELFeature.time_window)
+CROP_SAFE_FEATURES = frozenset([
+    'AP1_amp',
+    'AP1_begin_voltage',
+    'AP1_begin_width',
+    'AP2_AP1_begin_width_diff',
+    'AP2_AP1_diff',
+    'AP2_amp',
+    'AP2_begin_voltage',
+    'AP2_begin_width',
+    'AP_amplitude',
+    'AP_amplitude_change',
+    'AP_amplitude_diff',
+    'APlast_amp',
+    'Spikecount_stimint',
+    'activation_time_constant',
+    'deactivation_time_constant',
+    'depol_block',
+    'depol_block_bool',
+    'inactivation_time_constant',
+    'inv_second_ISI',
+    'is_not_stuck',
+    'maximum_voltage',
+    'maximum_voltage_from_voltagebase',
+    'mean_AP_amplitude',
+    'mean_frequency',
+    'minimum_voltage',
+    'number_initial_spikes',
+    'sag_ratio2',
+    'spike_count_stimint',
+    'steady_state_hyper',
+    'steady_state_voltage_stimend',
+    'voltage_base',
+    'voltage_deflection_vb_ssse',
+])
+
+# eFEL features that also use the voltage after stim_end, but not before the
+# start of the voltage base
+AFTER_STIM_FEATURES = frozenset([
+    'decay_time_constant_after_stim',
+    'steady_state_voltage',
+    'voltage_after_stim',
+])
+
+# Cache of the preprocessed responses of the current evaluation, per thread
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def preprocessing_cache():
+    """Share the preprocessing of the responses between features
+
+    Inside the context, the extraFELFeatures calculated on the same
+    responses share the peak times, the interpolated and filtered
+    recordings and the mean waveforms that depend on the same settings,
+    instead of recomputing them for every feature. The responses must not
+    change inside the context. Nested contexts use the outer cache.
+    """
+
+    if getattr(_local, 'cache', None) is not None:
+        yield _local.cache
+        return
+
+    _local.cache = {}
+    try:
+        yield _local.cache
+    finally:
+        _local.cache = None
+
+
+def _cached(key, response, function):
+    """Return function(), cached under key if a preprocessing_cache is active
+
+    The cache keeps a reference to response, whose id is part of key, so
+    that the id is not reused inside the context.
+    """
+
+    cache = getattr(_local, 'cache', None)
+
+    if cache is None:
+        return function()
+
+    if key not in cache:
+        cache[key] = (response, function())
+
+    return cache[key][1]
+
+
+def _freeze(value):
+    """Hashable version of a setting (dict, list, array or scalar)"""
+
+    if isinstance(value, dict):
+        return tuple(sorted(value.items()))
+    elif isinstance(value, (list, tuple, np.ndarray)):
+        return tuple(np.ravel(value).tolist())
+
+    return value
+
 
 def masked_cosine_distance(exp, model):
     from scipy.spatial import distance
@@ -78,7 +184,8 @@ class eFELFeature(EFeature, DictMixin):
             int_settings=None,
             string_settings=None,
             force_max_score=False,
-            max_score=250
+            max_score=250,
+            window_margin=None
     ):
         """Constructor
 
@@ -101,6 +208,10 @@ class eFELFeature(EFeature, DictMixin):
                 should be set before extracting the features
             string_settings(dict): dictionary with efel string settings that
                 should be set before extracting the features
+            window_margin(float): margin (ms) around the part of the
+                recordings used by the feature, see time_window for the
+                features that use the voltage outside the stimulus. None if
+                the feature needs the full recordings.
         """
 
         super(eFELFeature, self).__init__(name, comment)
@@ -119,6 +230,38 @@ class eFELFeature(EFeature, DictMixin):
         self.string_settings = string_settings
         self.force_max_score = force_max_score
         self.max_score = max_score
+        self.window_margin = window_margin
+
+    def time_window(self):
+        """Time window (start, end) of the recordings used by the feature
+
+        The window starts where eFEL starts the voltage base before the
+        stimulus (voltage_base_start_perc * stim_start) and ends at stim_end,
+        widened by window_margin on both sides. The window of the features
+        of the voltage after the stimulus (AFTER_STIM_FEATURES) extends to the
+        end of the recordings. Returns None if the feature needs the full
+        recordings, which is the case when window_margin is None and for the
+        features that are in neither CROP_SAFE_FEATURES nor
+        AFTER_STIM_FEATURES, e.g. Spikecount, which counts the spikes of the
+        whole recordings.
+        """
+
+        if self.window_margin is None or self.stim_start is None or \
+                self.stim_end is None:
+            return None
+
+        if self.efel_feature_name in AFTER_STIM_FEATURES:
+            end = float('inf')
+        elif self.efel_feature_name in CROP_SAFE_FEATURES:
+            end = self.stim_end + self.window_margin
+        else:
+            return None
+
+        double_settings = self.double_settings or {}
+        start_perc = double_settings.get('voltage_base_start_perc', 0.9)
+
+        return (max(0.0, start_perc * self.stim_start - self.window_margin),
+                end)
 
     def _construct_efel_trace(self, responses):
         """Construct trace that can be passed to eFEL"""
@@ -204,6 +347,7 @@ class eFELFeature(EFeature, DictMixin):
 
         return feature_value
 
+    @timing.timed('efeature.calculate_score')
     def calculate_score(self, responses, trace_check=False):
         """Calculate the score"""
 
@@ -232,6 +376,72 @@ class eFELFeature(EFeature, DictMixin):
 
         return score
 
+    def efel_group_key(self):
+        """Key of the trace and eFEL settings of the feature
+
+        Features with the same key can be calculated by a single eFEL call,
+        see calculate_efel_features.
+        """
+
+        def freeze(settings):
+            return tuple(sorted(settings.items())) if settings else ()
+
+        return (freeze(self.recording_names or {}),
+                self.stim_start,
+                self.stim_end,
+                self.threshold,
+                self.stimulus_current,
+                self.interp_step,
+                freeze(self.double_settings),
+                freeze(self.int_settings),
+                freeze(self.string_settings))
+
+    def score_from_values(self, feature_values):
+        """Calculate the score from the values returned by eFEL
+
+        Gives the same score as calculate_score (and efel.getDistance).
+        """
+
+        if feature_values is None or len(feature_values) < 1:
+            score = self.max_score
+        else:
+            # Same summation order as efel.getDistance
+            score = 0.0
+            for feature_value in feature_values:
+                score += abs(feature_value - self.exp_mean)
+            score = score / self.exp_std / len(feature_values)
+
+            if score != score:
+                score = self.max_score
+
+        if self.force_max_score:
+            score = min(score, self.max_score)
+
+        return score
+
+    def deviation_from_values(self, feature_values):
+        """Mean absolute deviation of the eFEL values from exp_mean
+
+        The score of the feature is this deviation divided by exp_std (up to
+        rounding), see score_from_values. NaN if eFEL failed.
+        """
+
+        if feature_values is None or len(feature_values) < 1:
+            return np.nan
+
+        return np.mean(np.abs(np.asarray(feature_values) - self.exp_mean))
+
+    def value_from_values(self, feature_values):
+        """Calculate the feature value from the values returned by eFEL
+
+        Gives the same value as calculate_feature.
+        """
+
+        if feature_values is None or len(feature_values) == 0:
+            return None
+
+        return np.mean(feature_values)
+
     def __str__(self):
         """String representation"""
 
@@ -246,6 +456,112 @@ class eFELFeature(EFeature, DictMixin):
              self.threshold)
 
 
+def feature_recording_names(feature):
+    """Names of the recordings used by a feature
+
+    Covers the recording_names of the eFEL features and the
+    somatic_recording_name of the features of extracellular recordings.
+    """
+
+    names = set((getattr(feature, 'recording_names', None) or {}).values())
+
+    somatic_recording_name = getattr(feature, 'somatic_recording_name', None)
+    if somatic_recording_name is not None:
+        names.add(somatic_recording_name)
+
+    return names
+
+
+def efel_batchable(feature):
+    """Check if a feature can be calculated by calculate_efel_features"""
+
+    feature_type = type(feature)
+
+    return issubclass(feature_type, eFELFeature) and \
+        feature_type.calculate_score is eFELFeature.calculate_score and \
+        feature_type.calculate_feature is eFELFeature.calculate_feature
+
+
+def calculate_efel_features(features, responses):
+    """Calculate the eFEL values of features, grouped by trace and settings
+
+    The features that share their recordings, stimulus times and eFEL
+    settings are calculated by a single eFEL call, so that the trace is
+    only parsed, interpolated and searched for spikes once per group.
+
+    Args:
+        features (list of eFELFeature): features to calculate, see
+            efel_batchable
+        responses (dict): responses of the recordings
+
+    Returns:
+        dict with for every feature id the array of values returned by eFEL,
+        None if the recording is missing or eFEL failed. The score and the
+        value of a feature are obtained from its values with
+        eFELFeature.score_from_values and eFELFeature.value_from_values.
+    """
+
+    return calculate_population_efel_features(features, [responses])[0]
+
+
+@timing.timed('efeature.calculate_batch')
+def calculate_population_efel_features(features, responses_list):
+    """Calculate the eFEL values of features for several responses
+
+    Works like calculate_efel_features, but the traces of all the
+    responses are passed to the eFEL call of a group, so that eFEL is only
+    set up once per group for the whole list.
+
+    Args:
+        features (list of eFELFeature): features to calculate, see
+            efel_batchable
+        responses_list (list of dict): responses, e.g. of the individuals
+            of a population
+
+    Returns:
+        list with the dict of calculate_efel_features of every responses
+    """
+
+    groups = {}
+    for feature in features:
+        groups.setdefault(feature.efel_group_key(), []).append(feature)
+
+    feature_values_list = [{} for _ in responses_list]
+    for group in groups.values():
+        efel_traces = [group[0]._construct_efel_trace(responses)
+                       for responses in responses_list]
+
+        for efel_trace, feature_values in zip(
+                efel_traces, feature_values_list):
+            if efel_trace is None:
+                for feature in group:
+                    feature_values[id(feature)] = None
+
+        calculated = [index for index, efel_trace in enumerate(efel_traces)
+                      if efel_trace is not None]
+        if not calculated:
+            continue
+
+        group[0]._setup_efel()
+
+        import efel
+        efel_feature_names = list(collections.OrderedDict.fromkeys(
+            feature.efel_feature_name for feature in group))
+        values_list = efel.getFeatureValues(
+            [efel_traces[index] for index in calculated],
+            efel_feature_names,
+            raise_warnings=False)
+
+        efel.reset()
+
+        for index, values in zip(calculated, values_list):
+            for feature in group:
+                feature_values_list[index][id(feature)] = \
+                    values[feature.efel_feature_name]
+
+    return feature_values_list
+
+
 class extraFELFeature(EFeature, DictMixin):
     """extraFEL feature"""
 
@@ -397,13 +713,25 @@ class extraFELFeature(EFeature, DictMixin):
             for setting_name, setting_value in self.int_settings.items():
                 efel.setIntSetting(setting_name, setting_value)
 
+    def _peak_times_key(self):
+        """Key of the settings on which the peak times depend"""
+
+        return (self.somatic_recording_name,
+                self.stim_start,
+                self.stim_end,
+                self.threshold,
+                self.interp_step,
+                _freeze(self.double_settings or {}),
+                _freeze(self.int_settings or {}))
+
     def _get_peak_times(self, responses, raise_warnings=False):
 
         efel_trace = self._construct_somatic_efel_trace(responses)
 
         if efel_trace is None:
-            peak_times = None
-        else:
+            return None
+
+        def calculate_peak_times():
             self._setup_efel()
 
             import efel
@@ -411,11 +739,68 @@ class extraFELFeature(EFeature, DictMixin):
             peaks = efel.getFeatureValues(
                 [efel_trace], ["peak_time"], raise_warnings=raise_warnings
             )
-            peak_times = peaks[0]["peak_time"]
 
             efel.reset()
 
-        return peak_times
+            return peaks[0]["peak_time"]
+
+        somatic_response = responses[self.somatic_recording_name]
+
+        return _cached(
+            ('peak_times', id(somatic_response), self._peak_times_key()),
+            somatic_response,
+            calculate_peak_times)
+
+    def _preprocess_response(self, response):
+        """Interpolate and filter the extracellular response"""
+
+        def interpolate():
+            if np.std(np.diff(response["time"])) > 0.001 * np.mean(
+                    np.diff(response["time"])
+            ):
+                assert self.fs is not None
+                logger.info("extraFELFeature.calculate_feature: interpolate")
+                return _interpolate_response(response, fs=self.fs)
+
+            return response
+
+        response_interp = _cached(
+            ('interpolate', id(response), self.fs), response, interpolate)
+
+        if self.fcut is None:
+            logger.info("extraFELFeature.calculate_feature: filter disabled")
+            return response_interp
+
+        def filter_response():
+            logger.info("extraFELFeature.calculate_feature: enabled")
+            return _filter_response(response_interp,
+                                    fcut=self.fcut,
+                                    filt_type=self.filt_type)
+
+        return _cached(
+            ('filter', id(response), self.fs, _freeze(self.fcut),
+             self.filt_type),
+            response,
+            filter_response)
+
+    def _get_mean_waveform(self, responses, response, peak_times):
+        """Mean waveform of the extracellular response around the peaks"""
+
+        def mean_waveform():
+            response_filter = self._preprocess_response(response)
+
+            ewf = _get_waveforms(response_filter, peak_times, self.ms_cut)
+
+            return np.mean(ewf, axis=0)
+
+        return _cached(
+            ('mean_waveform', id(response),
+             id(responses[self.somatic_recording_name]),
+             self._peak_times_key(), self.fs, _freeze(self.fcut),
+             self.filt_type, _freeze(self.ms_cut), self.skip_first_spike,
+             self.skip_last_spike),
+            response,
+            mean_waveform)
 
     def calculate_feature(
             self,
@@ -449,26 +834,7 @@ class extraFELFeature(EFeature, DictMixin):
             else:
                 return None
 
-        if np.std(np.diff(response["time"])) > 0.001 * np.mean(
-                np.diff(response["time"])
-        ):
-            assert self.fs is not None
-            logger.info("extraFELFeature.calculate_feature: interpolate")
-            response_interp = _interpolate_response(response, fs=self.fs)
-        else:
-            response_interp = response
-
-        if self.fcut is not None:
-            logger.info("extraFELFeature.calculate_feature: enabled")
-            response_filter = _filter_response(response_interp,
-                                               fcut=self.fcut,
-                                               filt_type=self.filt_type)
-        else:
-            logger.info("extraFELFeature.calculate_feature: filter disabled")
-            response_filter = response_interp
-
-        ewf = _get_waveforms(response_filter, peak_times, self.ms_cut)
-        mean_wf = np.mean(ewf, axis=0)
+        mean_wf = self._get_mean_waveform(responses, response, peak_times)
 
         values = calculate_features(
             mean_wf,
@@ -491,6 +857,7 @@ class extraFELFeature(EFeature, DictMixin):
         else:
             return feature_value
 
+    @timing.timed('efeature.calculate_score')
     def calculate_score(self, responses, trace_check=False):
         """Calculate the score"""
 
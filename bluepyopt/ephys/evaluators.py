@@ -22,12 +22,31 @@ Copyright (c) 2016-2020, EPFL/Blue Brain Project
 
 # pylint: disable=W0511
 
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import copy
+import functools
+import hashlib
+import itertools
+import os
+import pickle
+import tempfile
+
 import logging
 logger = logging.getLogger(__name__)
 
 import bluepyopt as bpopt
 import bluepyopt.tools
 
+from . import timing
+from .efeatures import feature_recording_names
+from .protocols import ArbSweepProtocol, MultiArbSweepProtocol
+from .protocols import MultiSweepProtocol, StepProtocol, SweepProtocol
+from .protocols import run_arb_batch, run_nrn_batch
+from .simulators import LFPySimulator, NrnSimulator
+
 
 class CellEvaluator(bpopt.evaluators.Evaluator):
 
@@ -42,7 +61,17 @@ class CellEvaluator(bpopt.evaluators.Evaluator):
             isolate_protocols=None,
             sim=None,
             use_params_for_seed=False,
-            timeout=None):
+            timeout=None,
+            prepare_cell=False,
+            reuse_cell=False,
+            stages=None,
+            cache=None,
+            response_archive=None,
+            timings=None,
+            batch_size=None,
+            crop_recordings=False,
+            feature_pool=None,
+            feature_batch_size=1):
         """Constructor
 
         Args:
@@ -54,16 +83,88 @@ class CellEvaluator(bpopt.evaluators.Evaluator):
             fitness_calculator (ObjectivesCalculator):
                 ObjectivesCalculator object used for the transformation of
                 Responses into Objective objects
-            isolate_protocols (bool): whether to use multiprocessing to
-                isolate the simulations
+            isolate_protocols (bool or ephys.isolation.IsolationPool):
+                whether to use multiprocessing to isolate the simulations
                 (disabling this could lead to unexpected behavior, and might
-                hinder the reproducability of the simulations)
+                hinder the reproducability of the simulations).
+                When an IsolationPool is given, its long-lived worker
+                processes are used instead of a new process per protocol
             sim (ephys.simulators.NrnSimulator): simulator to use for the cell
                 evaluation
             use_params_for_seed (bool): use a hashed version of the parameter
                 dictionary as a seed for the simulator
             timeout (int): duration in second after which a Process will
                 be interrupted when using multiprocessing
+            prepare_cell (bool): instantiate the morphology and mechanisms
+                of the cell model only once per process (see
+                ephys.models.CellModel.prepare), every protocol then only
+                sets the parameter values on this prepared cell. Isolated
+                protocols are forked from the process holding the prepared
+                cell. Parameters that change the morphology or the
+                mechanisms are not supported in this mode.
+            reuse_cell (bool): run all the sweep protocols of an individual
+                on a single instantiation of the cell model (see
+                ephys.protocols.MultiSweepProtocol), instead of instantiating
+                the cell model for every protocol. Arbor sweep protocols
+                are run as the cells of a single Arbor simulation (see
+                ephys.protocols.MultiArbSweepProtocol). In a population
+                evaluation, the protocols of an individual in a stage are
+                then run as a single task.
+            stages (list of (list of str, float) tuples): ordered stages
+                of the score evaluation. Each stage consists of the names of
+                fitness protocols and a score threshold. After a stage has
+                run, the objectives that only depend on the responses
+                obtained so far are scored, and if one of these scores is
+                above the threshold of the stage, the later stages are
+                skipped. These scores are not calculated again when the
+                evaluation is scored. The recordings of skipped protocols
+                have None as response, which gives the max_score of their
+                features. Protocols that are not part of any stage run after
+                the last stage.
+            cache (EvaluationCache): cache used to reuse the results of
+                earlier evaluations of the same parameter values
+            response_archive (ResponseArchive): archive in which the
+                responses of every evaluation are stored, so that they can
+                be rescored later without running the simulations again
+            timings (bool or str): time the phases of every evaluation
+                (see ephys.timing). When True, the timings are added to the
+                totals of the process running the evaluation, returned by
+                ephys.timing.summary(). When a path is given, the timings
+                of every evaluation are also appended to this file, which
+                can be shared by several processes and read with
+                ephys.timing.read_timing_file()
+            batch_size (int): in a population evaluation, group the
+                (individual, protocol) tasks of a stage in batches of
+                batch_size tasks, which are the tasks of map_function.
+                Batches of Arbor sweep protocols are simulated as the cells
+                of a single multi-threaded Arbor simulation (see
+                ephys.protocols.run_arb_batch). Batches of Neuron sweep
+                protocols with the same cvode_active are simulated as the
+                cells of a single multi-threaded Neuron run (see
+                ephys.protocols.run_nrn_batch). Such batches are not
+                isolated and not interrupted by timeout. The tasks of
+                other batches are run one after the other.
+            crop_recordings (bool): the recordings of the fitness protocols
+                only store the time windows used by the features of the
+                objectives (see ephys.protocols.recording_windows), which
+                makes the responses smaller. Recordings used by a feature
+                without a time window (see eFELFeature.window_margin) are
+                stored in full. The windows are set on copies of the fitness
+                protocols, fitness_protocols itself is not changed.
+            feature_pool (int or concurrent.futures.Executor): in a
+                population evaluation, calculate the objectives of the
+                individuals in this executor, or in a pool of this many
+                processes started for the duration of the evaluation. An
+                individual is submitted as soon as all its responses are
+                available, so that the feature extraction overlaps with the
+                simulations of the other individuals. The executor should
+                be process-based, since eFEL is not thread safe. By default
+                the objectives are calculated in the evaluating process
+                after all the simulations.
+            feature_batch_size (int): number of individuals of which the
+                objectives are calculated by a task of feature_pool, their
+                eFEL features are calculated together (see
+                ObjectivesCalculator.calculate_population)
         """
 
         super(CellEvaluator, self).__init__(
@@ -87,6 +188,54 @@ class CellEvaluator(bpopt.evaluators.Evaluator):
         self.timeout = timeout
         self.use_params_for_seed = use_params_for_seed
 
+        if prepare_cell and not hasattr(cell_model, 'prepare'):
+            raise ValueError(
+                "CellEvaluator: prepare_cell is not supported by the "
+                "cell model %s" % cell_model.name)
+        self.prepare_cell = prepare_cell
+
+        if reuse_cell and not hasattr(
+                cell_model, 'instantiate_stochastic_mechanisms'):
+            raise ValueError(
+                "CellEvaluator: reuse_cell is not supported by the "
+                "cell model %s" % cell_model.name)
+        self.reuse_cell = reuse_cell
+
+        if stages is not None and fitness_protocols is not None:
+            for protocol_names, _ in stages:
+                for protocol_name in protocol_names:
+                    if protocol_name not in fitness_protocols:
+                        raise ValueError(
+                            "CellEvaluator: stage protocol %s is not in "
+                            "fitness_protocols" % protocol_name)
+        self.stages = stages
+        self.cache = cache
+        self.response_archive = response_archive
+        self.timings = timings
+
+        if batch_size is not None and batch_size < 1:
+            raise ValueError(
+                "CellEvaluator: batch_size has to be at least 1")
+        self.batch_size = batch_size
+
+        if feature_batch_size < 1:
+            raise ValueError(
+                "CellEvaluator: feature_batch_size has to be at least 1")
+        self.feature_pool = feature_pool
+        self.feature_batch_size = feature_batch_size
+
+        self.crop_recordings = crop_recordings
+        if crop_recordings and fitness_protocols is not None:
+            # The windows are set on copies, the protocols of the caller
+            # keep storing the full recordings
+            self.fitness_protocols = copy.deepcopy(fitness_protocols)
+            features = [
+                feature
+                for objective in fitness_calculator.objectives
+                for feature in getattr(objective, 'features', None) or []]
+            for protocol in self.fitness_protocols.values():
+                protocol.set_recording_windows(features)
+
     def param_dict(self, param_array):
         """Convert param_array in param_dict"""
         param_dict = {}
@@ -168,9 +317,57 @@ class CellEvaluator(bpopt.evaluators.Evaluator):
             else:
                 raise
 
+    @staticmethod
+    def group_sweep_protocols(protocols):
+        """Group the sweep protocols in multi sweep protocols
+
+        Neuron sweep protocols are grouped in a MultiSweepProtocol, Arbor
+        sweep protocols in a MultiArbSweepProtocol.
+
+        Returns:
+            list with the multi sweep protocols, followed by the protocols
+            that are not sweep protocols
+        """
+
+        sweeps = []
+        arb_sweeps = []
+        others = []
+        for protocol in protocols:
+            if isinstance(protocol, (MultiSweepProtocol,
+                                     MultiArbSweepProtocol)):
+                others.append(protocol)
+            elif isinstance(protocol, SweepProtocol):
+                sweeps.append(protocol)
+            elif isinstance(protocol, ArbSweepProtocol):
+                arb_sweeps.append(protocol)
+            else:
+                others.append(protocol)
+
+        if len(sweeps) < 2 and len(arb_sweeps) < 2:
+            return list(protocols)
+
+        grouped = []
+        for group, multi_sweep_class in [
+                (sweeps, MultiSweepProtocol),
+                (arb_sweeps, MultiArbSweepProtocol)]:
+            if len(group) < 2:
+                grouped.extend(group)
+            else:
+                grouped.append(multi_sweep_class(
+                    name='+'.join(protocol.name for protocol in group),
+                    protocols=group))
+
+        return grouped + others
+
     def run_protocols(self, protocols, param_values):
         """Run a set of protocols"""
 
+        if self.prepare_cell:
+            self.cell_model.prepare(sim=self.sim)
+
+        if self.reuse_cell:
+            protocols = self.group_sweep_protocols(protocols)
+
         responses = {}
 
         for protocol in protocols:
@@ -182,6 +379,159 @@ class CellEvaluator(bpopt.evaluators.Evaluator):
 
         return responses
 
+    def timed_evaluation(self, label):
+        """Return context in which the phases of an evaluation are timed"""
+
+        if not self.timings:
+            return contextlib.nullcontext()
+
+        timing_file = self.timings if isinstance(self.timings, str) \
+            else None
+
+        return timing.evaluation(label=label, timing_file=timing_file)
+
+    def evaluation_stages(self, target='scores'):
+        """Return the stages of an evaluation
+
+        Returns:
+            list of (protocol_names, threshold) tuples, a threshold of
+            None means the stage is always followed by the next one
+        """
+
+        protocol_names = list(self.fitness_protocols.keys())
+
+        if target != 'scores' or self.stages is None:
+            return [(protocol_names, None)]
+
+        stages = [(list(names), threshold)
+                  for names, threshold in self.stages]
+        staged_names = set(name for names, _ in stages for name in names)
+        remaining_names = [name for name in protocol_names
+                           if name not in staged_names]
+        if remaining_names:
+            stages.append((remaining_names, None))
+
+        return stages
+
+    @staticmethod
+    def _recording_names(protocol):
+        """Return the names of the recordings of a protocol"""
+
+        if hasattr(protocol, 'protocols'):
+            return [name for subprotocol in protocol.protocols
+                    for name in CellEvaluator._recording_names(subprotocol)]
+
+        return [recording.name
+                for recording in getattr(protocol, 'recordings', [])]
+
+    def stage_scores(self, responses, scores=None):
+        """Score the objectives that only depend on responses
+
+        Only the objectives of which all the features have their recordings
+        in responses are scored, except the ones that are already in scores.
+
+        Returns:
+            dict with the new scores, by objective name
+        """
+
+        new_scores = {}
+        for objective in self.fitness_calculator.objectives:
+            features = getattr(objective, 'features', None)
+            if not features or \
+                    (scores is not None and objective.name in scores):
+                continue
+
+            recording_names = set()
+            for feature in features:
+                recording_names.update(feature_recording_names(feature))
+            if not recording_names.issubset(responses):
+                continue
+
+            new_scores[objective.name] = objective.calculate_score(responses)
+
+        return new_scores
+
+    @staticmethod
+    def _above_threshold(scores, threshold):
+        """Check if one of the scores exceeds threshold"""
+
+        for name, score in scores.items():
+            if score > threshold:
+                logger.debug('Objective %s above stage threshold %s',
+                             name, threshold)
+                return True
+
+        return False
+
+    def stage_failed(self, responses, threshold, scores=None):
+        """Check if the scores obtained from responses exceed threshold
+
+        Only the objectives of which all the features have their recordings
+        in responses are taken into account.
+
+        Args:
+            responses (dict): responses of the stages run so far
+            threshold (float): threshold of the stage, None if the stage
+                can't fail
+            scores (dict): scores calculated by the earlier stages, by
+                objective name. The scores calculated by this stage are
+                added to it, to be reused by the later stages and the final
+                scoring (see ObjectivesCalculator.calculate_scores).
+        """
+
+        if threshold is None:
+            return False
+
+        if scores is None:
+            scores = {}
+        scores.update(self.stage_scores(responses, scores))
+
+        return self._above_threshold(scores, threshold)
+
+    def _calculate_scores(self, responses, stage_scores=None):
+        """Calculate the scores, reusing the ones of the stages"""
+
+        if stage_scores:
+            return self.fitness_calculator.calculate_scores(
+                responses, known_scores=stage_scores)
+
+        return self.fitness_calculator.calculate_scores(responses)
+
+    def fill_skipped_responses(self, responses):
+        """Set None response for recordings of protocols that didn't run"""
+
+        for protocol in self.fitness_protocols.values():
+            for recording_name in self._recording_names(protocol):
+                responses.setdefault(recording_name, None)
+
+        return responses
+
+    def run_staged_protocols(self, param_values, target='scores',
+                             scores=None):
+        """Run the fitness protocols stage by stage
+
+        Args:
+            param_values (dict): parameter values of the individual
+            target (str): 'scores' or 'values'
+            scores (dict): dict to which the scores calculated to check the
+                stage thresholds are added, see stage_failed
+        """
+
+        responses = {}
+
+        for protocol_names, threshold in self.evaluation_stages(target):
+            responses.update(self.run_protocols(
+                [self.fitness_protocols[protocol_name]
+                 for protocol_name in protocol_names],
+                param_values))
+
+            if self.stage_failed(responses, threshold, scores=scores):
+                logger.debug('Evaluation stage %s failed, skipping the '
+                             'remaining stages', protocol_names)
+                break
+
+        return self.fill_skipped_responses(responses)
+
     def evaluate_with_dicts(self, param_dict=None, target='scores'):
         """Run evaluation with dict as input and output"""
 
@@ -195,15 +545,66 @@ class CellEvaluator(bpopt.evaluators.Evaluator):
 
         logger.debug('Evaluating %s', self.cell_model.name)
 
-        responses = self.run_protocols(
-            self.fitness_protocols.values(),
-            param_dict)
+        if self.cache is not None:
+            cache_key = self.cache.key(self, param_dict, target)
+            obj_dict = self.cache.get(cache_key)
+            if obj_dict is not None:
+                return obj_dict
+
+        stage_scores = {}
+        with self.timed_evaluation(self.cell_model.name):
+            if target == 'scores' and self.stages is not None:
+                responses = self.run_staged_protocols(
+                    param_dict, target=target, scores=stage_scores)
+            else:
+                responses = self.run_protocols(
+                    self.fitness_protocols.values(),
+                    param_dict)
+
+            if self.response_archive is not None:
+                self.response_archive.store(param_dict, responses)
+
+            if target == 'scores':
+                obj_dict = self._calculate_scores(responses, stage_scores)
+            elif target == 'values':
+                obj_dict = self.fitness_calculator.calculate_values(
+                    responses)
+
+        if self.cache is not None:
+            self.cache.set(cache_key, obj_dict)
+
+        return obj_dict
+
+    def evaluate_with_details(self, param_dict=None):
+        """Run the protocols once, and calculate both values and scores
+
+        Returns:
+            EvaluationResult with the responses, the value and score of
+            every feature, and the score of every objective
+        """
+
+        if self.fitness_calculator is None:
+            raise Exception(
+                'CellEvaluator: need fitness_calculator to evaluate')
+
+        logger.debug('Evaluating %s with details', self.cell_model.name)
+
+        with self.timed_evaluation(self.cell_model.name):
+            responses = self.run_protocols(
+                self.fitness_protocols.values(),
+                param_dict)
+
+            if self.response_archive is not None:
+                self.response_archive.store(param_dict, responses)
 
-        if target == 'scores':
-            return self.fitness_calculator.calculate_scores(responses)
+            feature_values, feature_scores, objective_scores = \
+                self.fitness_calculator.calculate_feature_details(responses)
 
-        elif target == 'values':
-            return self.fitness_calculator.calculate_values(responses)
+        return EvaluationResult(
+            responses=responses,
+            feature_values=feature_values,
+            feature_scores=feature_scores,
+            objective_scores=objective_scores)
 
     def evaluate_with_lists(self, param_list=None, target='scores'):
         """Run evaluation with lists as input and outputs"""
@@ -227,11 +628,470 @@ class CellEvaluator(bpopt.evaluators.Evaluator):
         self.sim.initialize()
         return self.evaluate_with_lists(param_list=param_list, target=target)
 
+    def run_protocol_task(self, task):
+        """Run a single protocol of a population evaluation
+
+        Args:
+            task (tuple): parameter dict of the individual and name of the
+                protocol in fitness_protocols, or tuple of names of protocols
+                that are run together
+        """
+
+        param_dict, protocol_name = task
+
+        # The task can be sent to a process with pristine NEURON
+        self.sim.initialize()
+
+        if self.prepare_cell:
+            self.cell_model.prepare(sim=self.sim)
+
+        if isinstance(protocol_name, tuple):
+            with self.timed_evaluation(
+                    '%s.%s' % (self.cell_model.name,
+                               '+'.join(protocol_name))):
+                return self.run_protocols(
+                    [self.fitness_protocols[name] for name in protocol_name],
+                    param_dict)
+
+        with self.timed_evaluation(
+                '%s.%s' % (self.cell_model.name, protocol_name)):
+            return self.run_protocol(
+                self.fitness_protocols[protocol_name],
+                param_values=param_dict,
+                isolate=self.isolate_protocols,
+                timeout=self.timeout)
+
+    def run_protocol_batch_task(self, tasks):
+        """Run a batch of protocol tasks of a population evaluation
+
+        Args:
+            tasks (list of tuples): tasks as in run_protocol_task
+
+        Returns:
+            list with the responses of every task
+        """
+
+        protocols = [self.fitness_protocols.get(protocol_name)
+                     if isinstance(protocol_name, str) else None
+                     for _, protocol_name in tasks]
+
+        if all(isinstance(protocol, ArbSweepProtocol)
+               for protocol in protocols):
+            run_batch = run_arb_batch
+        elif self.nrn_batchable(protocols):
+            run_batch = run_nrn_batch
+        else:
+            return [self.run_protocol_task(task) for task in tasks]
+
+        self.sim.initialize()
+
+        with self.timed_evaluation(
+                '%s.batch' % self.cell_model.name):
+            return run_batch(
+                [(protocol, self.cell_model, param_dict)
+                 for protocol, (param_dict, _) in zip(protocols, tasks)],
+                sim=self.sim)
+
+    def nrn_batchable(self, protocols):
+        """Can the protocols run as a batch of Neuron cells
+
+        The seeds of the individuals are not supported, since the
+        simulator has a single global index for Random123.
+        """
+
+        if not isinstance(self.sim, NrnSimulator) or \
+                isinstance(self.sim, LFPySimulator) or \
+                self.use_params_for_seed:
+            return False
+
+        if not all(type(protocol) in (SweepProtocol, StepProtocol) and
+                   protocol.equilibration is None
+                   for protocol in protocols):
+            return False
+
+        return len(set(protocol.cvode_active for protocol in protocols)) == 1
+
+    def _start_population(self, param_lists, target):
+        """Check arguments and cache before evaluating a population
+
+        Returns:
+            tuple (param_dicts, obj_dicts, cache_keys), obj_dicts contains
+            the cached results, and None for the individuals to evaluate
+        """
+
+        if target not in ['scores', 'values']:
+            raise Exception(
+                'CellEvaluator: target has to be "scores" or "values".')
+
+        if self.fitness_calculator is None:
+            raise Exception(
+                'CellEvaluator: need fitness_calculator to evaluate')
+
+        param_dicts = [self.param_dict(param_list)
+                       for param_list in param_lists]
+
+        logger.debug('Evaluating %d individuals of %s with %d protocols',
+                     len(param_dicts), self.cell_model.name,
+                     len(self.fitness_protocols))
+
+        obj_dicts = [None] * len(param_dicts)
+        cache_keys = None
+
+        if self.cache is not None:
+            cache_keys = [self.cache.key(self, param_dict, target)
+                          for param_dict in param_dicts]
+            obj_dicts = [self.cache.get(cache_key)
+                         for cache_key in cache_keys]
+
+        return param_dicts, obj_dicts, cache_keys
+
+    def _stage_task_names(self, protocol_names):
+        """Return the protocol names of the tasks of an individual in a stage
+
+        With reuse_cell, all the protocols of the stage form a single task.
+        """
+
+        if self.reuse_cell:
+            return [tuple(protocol_names)]
+
+        return list(protocol_names)
+
+    def score_population_task(self, task):
+        """Calculate the objectives of a batch of individuals
+
+        Args:
+            task (tuple): list with the responses of the individuals,
+                target ('scores' or 'values'), and optionally the list with
+                the scores of the stages of every individual (see
+                stage_failed)
+
+        Returns:
+            list with the objective dict of every individual
+        """
+
+        responses_list, target = task[:2]
+        stage_scores_list = task[2] if len(task) > 2 else None
+
+        with self.timed_evaluation(
+                '%s.scoring' % self.cell_model.name):
+            if stage_scores_list is not None and any(stage_scores_list):
+                return self.fitness_calculator.calculate_population(
+                    responses_list, target=target,
+                    known_scores_list=stage_scores_list)
+
+            return self.fitness_calculator.calculate_population(
+                responses_list, target=target)
+
+    def _finish_population(
+            self,
+            param_dicts,
+            all_responses,
+            obj_dicts,
+            cache_keys,
+            evaluated_indices,
+            target,
+            scored_obj_dicts=None,
+            stage_scores=None):
+        """Calculate the objectives of the evaluated individuals
+
+        The objectives of the individuals in scored_obj_dicts (dict by
+        index) were already calculated by the feature pool. The scores in
+        stage_scores (list with a dict per individual) were calculated by
+        the stages, and are reused.
+        """
+
+        for index in evaluated_indices:
+            responses = self.fill_skipped_responses(all_responses[index])
+
+            if self.response_archive is not None:
+                self.response_archive.store(param_dicts[index], responses)
+
+            if scored_obj_dicts is not None and index in scored_obj_dicts:
+                obj_dicts[index] = scored_obj_dicts[index]
+            else:
+                with self.timed_evaluation(
+                        '%s.scoring' % self.cell_model.name):
+                    if target == 'scores':
+                        obj_dicts[index] = self._calculate_scores(
+                            responses,
+                            stage_scores[index] if stage_scores is not None
+                            else None)
+                    elif target == 'values':
+                        obj_dicts[index] = self.fitness_calculator.\
+                            calculate_values(responses)
+
+            if self.cache is not None:
+                self.cache.set(cache_keys[index], obj_dicts[index])
+
+        return [self.objective_list(obj_dict) for obj_dict in obj_dicts]
+
+    def evaluate_population(
+            self, param_lists, target='scores', map_function=None):
+        """Run evaluation of a population with lists as input and outputs
+
+        Every protocol of every individual is run as a separate task of
+        map_function (or as part of a batch task, see batch_size), after
+        which the responses are assembled per individual to calculate the
+        objectives. With stages, all the
+        individuals that are still evaluated run a stage together, before
+        the next stage is started. With a feature_pool, the objectives of an
+        individual are calculated in the pool while the simulations of the
+        next individuals run.
+
+        Args:
+            param_lists (list of lists): parameter values of the individuals
+            target (str): 'scores' or 'values'
+            map_function (function): function used to map (parallelise) the
+                (individual, protocol) tasks, the builtin map by default
+
+        Returns:
+            list with the objective list of every individual
+        """
+
+        param_dicts, obj_dicts, cache_keys = self._start_population(
+            param_lists, target)
+
+        if map_function is None:
+            map_function = map
+
+        all_responses = [{} for _ in param_dicts]
+        stage_scores = [{} for _ in param_dicts]
+        active_indices = [index for index, obj_dict in enumerate(obj_dicts)
+                          if obj_dict is None]
+        evaluated_indices = list(active_indices)
+
+        feature_pipeline = None
+        if self.feature_pool is not None and evaluated_indices:
+            feature_pipeline = _FeaturePipeline(self, target)
+
+        try:
+            stages = self.evaluation_stages(target)
+            for stage_index, (protocol_names, threshold) in enumerate(stages):
+                last_stage = stage_index == len(stages) - 1
+                task_names = self._stage_task_names(protocol_names)
+
+                tasks = [(param_dicts[index], task_name)
+                         for index in active_indices
+                         for task_name in task_names]
+
+                if self.batch_size is not None:
+                    batches = [tasks[start:start + self.batch_size]
+                               for start in range(
+                                   0, len(tasks), self.batch_size)]
+                    task_responses = itertools.chain.from_iterable(
+                        map_function(self.run_protocol_batch_task, batches))
+                else:
+                    task_responses = iter(
+                        map_function(self.run_protocol_task, tasks))
+
+                next_active_indices = []
+                for index in active_indices:
+                    for _ in task_names:
+                        all_responses[index].update(next(task_responses))
+
+                    if not last_stage and not self.stage_failed(
+                            all_responses[index], threshold,
+                            scores=stage_scores[index]):
+                        next_active_indices.append(index)
+                    elif feature_pipeline is not None:
+                        # All the responses of the individual are available
+                        feature_pipeline.add(
+                            index,
+                            self.fill_skipped_responses(all_responses[index]),
+                            stage_scores[index])
+                active_indices = next_active_indices
+
+            scored_obj_dicts = feature_pipeline.results() \
+                if feature_pipeline is not None else None
+        finally:
+            if feature_pipeline is not None:
+                feature_pipeline.close()
+
+        return self._finish_population(
+            param_dicts, all_responses, obj_dicts, cache_keys,
+            evaluated_indices, target, scored_obj_dicts=scored_obj_dicts,
+            stage_scores=stage_scores)
+
+    async def _run_protocol_task_async(
+            self, task, executor, semaphore, timeout):
+        """Run a protocol task in executor, and await its responses"""
+
+        if semaphore is not None:
+            async with semaphore:
+                return await self._run_protocol_task_async(
+                    task, executor, None, timeout)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(executor, self.run_protocol_task, task)
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            _, protocol_names = task
+            if isinstance(protocol_names, str):
+                protocol_names = [protocol_names]
+
+            logger.debug('CellEvaluator: task %s took longer than timeout, '
+                         'will return empty response for its recordings',
+                         protocol_names)
+
+            return {recording_name: None
+                    for protocol_name in protocol_names
+                    for recording_name in self._recording_names(
+                        self.fitness_protocols[protocol_name])}
+
+    async def evaluate_population_async(
+            self,
+            param_lists,
+            target='scores',
+            executor=None,
+            max_concurrency=None,
+            timeout=None):
+        """Evaluate a population, awaiting the protocol runs in an executor
+
+        Works like evaluate_population, but every (individual, protocol)
+        task is submitted to executor, and awaited on the running event
+        loop. The stage thresholds and the objectives are also calculated in
+        executor, to keep the event loop responsive. Cancelling the coroutine
+        cancels the tasks that have not started yet, and discards the results
+        of the running ones.
+
+        Args:
+            param_lists (list of lists): parameter values of the individuals
+            target (str): 'scores' or 'values'
+            executor (concurrent.futures.Executor): executor running the
+                tasks, should be process-based since Neuron is not thread
+                safe. By default, a ProcessPoolExecutor is started for the
+                duration of the call, and its workers are joined when the
+                call returns or is cancelled.
+            max_concurrency (int or asyncio.Semaphore): maximum number of
+                tasks submitted at the same time. A semaphore can be shared
+                by concurrent evaluations to bound their total. By default
+                the number of tasks is not bounded.
+            timeout (float): duration in seconds after which the responses
+                of a task are considered empty. The worker running a task
+                that timed out is not interrupted, use the timeout argument
+                of the CellEvaluator for that.
+
+        Returns:
+            list with the objective list of every individual
+        """
+
+        param_dicts, obj_dicts, cache_keys = self._start_population(
+            param_lists, target)
+
+        if isinstance(max_concurrency, asyncio.Semaphore):
+            semaphore = max_concurrency
+        elif max_concurrency is not None:
+            semaphore = asyncio.Semaphore(max_concurrency)
+        else:
+            semaphore = None
+
+        loop = asyncio.get_running_loop()
+
+        own_executor = executor is None
+        if own_executor:
+            import multiprocessing
+
+            executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_concurrency
+                if isinstance(max_concurrency, int) else None,
+                mp_context=multiprocessing.get_context('fork'))
+
+        all_responses = [{} for _ in param_dicts]
+        stage_scores = [{} for _ in param_dicts]
+        active_indices = [index for index, obj_dict in enumerate(obj_dicts)
+                          if obj_dict is None]
+        evaluated_indices = list(active_indices)
+
+        try:
+            for protocol_names, threshold in self.evaluation_stages(target):
+                task_names = self._stage_task_names(protocol_names)
+
+                tasks = [(param_dicts[index], task_name)
+                         for index in active_indices
+                         for task_name in task_names]
+
+                task_responses = iter(await asyncio.gather(*[
+                    self._run_protocol_task_async(
+                        task, executor, semaphore, timeout)
+                    for task in tasks]))
+
+                for index in active_indices:
+                    for _ in task_names:
+                        all_responses[index].update(next(task_responses))
+
+                if threshold is not None:
+                    new_scores_list = await asyncio.gather(*[
+                        loop.run_in_executor(
+                            executor, self.stage_scores,
+                            all_responses[index], stage_scores[index])
+                        for index in active_indices])
+                    for index, new_scores in zip(
+                            active_indices, new_scores_list):
+                        stage_scores[index].update(new_scores)
+                    active_indices = [
+                        index for index in active_indices
+                        if not self._above_threshold(
+                            stage_scores[index], threshold)]
+
+            scored_obj_dicts = {}
+            if evaluated_indices:
+                scored_obj_dicts = dict(zip(
+                    evaluated_indices,
+                    await loop.run_in_executor(
+                        executor, self.score_population_task,
+                        ([self.fill_skipped_responses(all_responses[index])
+                          for index in evaluated_indices], target,
+                         [stage_scores[index]
+                          for index in evaluated_indices]))))
+        finally:
+            if own_executor:
+                # Join the workers without blocking the event loop, also
+                # when the coroutine is cancelled
+                await asyncio.shield(loop.run_in_executor(
+                    None, functools.partial(
+                        executor.shutdown, wait=True, cancel_futures=True)))
+
+        return self._finish_population(
+            param_dicts, all_responses, obj_dicts, cache_keys,
+            evaluated_indices, target, scored_obj_dicts=scored_obj_dicts)
+
+    async def evaluate_async(
+            self,
+            param_list=None,
+            target='scores',
+            executor=None,
+            max_concurrency=None,
+            timeout=None):
+        """Evaluate an individual, awaiting the protocol runs in an executor
+
+        See evaluate_population_async for the arguments.
+        """
+
+        results = await self.evaluate_population_async(
+            [param_list],
+            target=target,
+            executor=executor,
+            max_concurrency=max_concurrency,
+            timeout=timeout)
+
+        return results[0]
+
     def evaluate(self, param_list=None, target='scores'):
         """Run evaluation with lists as input and outputs"""
 
         return self.evaluate_with_lists(param_list, target=target)
 
+    def __getstate__(self):
+        """An executor given as feature_pool is not pickled"""
+
+        state = self.__dict__.copy()
+        if not isinstance(state.get('feature_pool'), (int, type(None))):
+            state['feature_pool'] = None
+
+        return state
+
     def __str__(self):
 
         content = 'cell evaluator:\n'
@@ -250,3 +1110,378 @@ class CellEvaluator(bpopt.evaluators.Evaluator):
             content += '    %s\n' % str(self.fitness_calculator)
 
         return content
+
+
+class _FeaturePipeline(object):
+
+    """Objectives of a population calculated in the feature pool
+
+    The individuals added to the pipeline are submitted in batches of
+    feature_batch_size to the feature pool of the evaluator.
+    """
+
+    def __init__(self, evaluator, target):
+        """Constructor
+
+        Args:
+            evaluator (CellEvaluator): evaluator of the population
+            target (str): 'scores' or 'values'
+        """
+
+        self.evaluator = evaluator
+        self.target = target
+
+        self.own_executor = isinstance(evaluator.feature_pool, int)
+        if self.own_executor:
+            import multiprocessing
+
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=evaluator.feature_pool,
+                mp_context=multiprocessing.get_context('fork'))
+        else:
+            self.executor = evaluator.feature_pool
+
+        self.pending = []
+        self.futures = []
+
+    def add(self, index, responses, stage_scores=None):
+        """Add the responses of the individual with index
+
+        stage_scores are the scores calculated by the stages of the
+        individual, which are reused.
+        """
+
+        self.pending.append((index, responses, stage_scores or {}))
+
+        if len(self.pending) >= self.evaluator.feature_batch_size:
+            self.submit()
+
+    def submit(self):
+        """Submit the pending individuals to the feature pool"""
+
+        if not self.pending:
+            return
+
+        indices = [index for index, _, _ in self.pending]
+        responses_list = [responses for _, responses, _ in self.pending]
+        stage_scores_list = [scores for _, _, scores in self.pending]
+        self.pending = []
+
+        self.futures.append((indices, self.executor.submit(
+            self.evaluator.score_population_task,
+            (responses_list, self.target, stage_scores_list))))
+
+    def results(self):
+        """Wait for the objectives, returns the objective dicts by index"""
+
+        self.submit()
+
+        obj_dicts = {}
+        for indices, future in self.futures:
+            obj_dicts.update(zip(indices, future.result()))
+
+        return obj_dicts
+
+    def close(self):
+        """Shut down the feature pool if it was started by the pipeline"""
+
+        if self.own_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.own_executor = False
+
+
+class EvaluationResult(object):
+
+    """Responses, feature values and scores of a single evaluation"""
+
+    def __init__(
+            self,
+            responses=None,
+            feature_values=None,
+            feature_scores=None,
+            objective_scores=None):
+        """Constructor
+
+        Args:
+            responses (dict): responses of the protocols, by recording name
+            feature_values (dict): feature values, by feature name
+            feature_scores (dict): feature scores, by feature name
+            objective_scores (dict): objective scores, by objective name
+        """
+
+        self.responses = responses
+        self.feature_values = feature_values
+        self.feature_scores = feature_scores
+        self.objective_scores = objective_scores
+
+    def __str__(self):
+        content = 'evaluation result:\n'
+
+        content += '  responses:\n'
+        for name in self.responses:
+            content += '    %s\n' % name
+
+        content += '  features:\n'
+        for name, value in self.feature_values.items():
+            content += '    %s: value %s, score %s\n' % (
+                name, value, self.feature_scores[name])
+
+        content += '  objectives:\n'
+        for name, score in self.objective_scores.items():
+            content += '    %s: %s\n' % (name, score)
+
+        return content
+
+
+class EvaluationCache(object):
+
+    """Cache of evaluation results indexed by parameter values
+
+    The results are kept in an in-memory LRU cache, and optionally in a
+    directory on disk, that can be shared by different processes and
+    different runs. The cache key is a hash of the cell model, the
+    fitness protocols, the fitness calculator, the evaluation stages, the
+    SIMULATOR_SETTINGS of the simulator, use_params_for_seed, the target
+    and the (quantised) parameter values.
+
+    The hits and misses counters are local to the process, the in-memory
+    entries are not sent along when the cache is pickled.
+    """
+
+    # Attributes of the Neuron and Arbor simulators that change the results
+    SIMULATOR_SETTINGS = (
+        'dt',
+        'cvode_active',
+        'cvode_minstep_value',
+        'coreneuron',
+        'nthread',
+        'random123_globalindex',
+        'cv_policy',
+        'nseg_frequency',
+        'ext_catalogues',
+    )
+
+    def __init__(self, max_size=1024, cache_dir=None, precision=None):
+        """Constructor
+
+        Args:
+            max_size (int): maximum number of results kept in memory
+            cache_dir (str): directory in which to store the results on
+                disk (None means results are only kept in memory)
+            precision (int): number of significant digits to which parameter
+                values are rounded in the key (None means exact values)
+        """
+
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self.precision = precision
+
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.results = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def quantise(self, value):
+        """Return string representation of quantised parameter value"""
+
+        if self.precision is None:
+            return repr(float(value))
+
+        return '%.*e' % (self.precision - 1, value)
+
+    def key(self, evaluator, param_dict, target='scores'):
+        """Return the cache key of an evaluation"""
+
+        # The token of a prepared cell differs between processes
+        cell_model = copy.copy(evaluator.cell_model)
+        if getattr(cell_model, 'prepared_token', None) is not None:
+            cell_model.prepared_token = None
+
+        # With use_params_for_seed, the global index is overwritten by the
+        # seed of the last evaluated individual, the seed of this one follows
+        # from the parameter values
+        use_params_for_seed = getattr(evaluator, 'use_params_for_seed', None)
+        settings = [name for name in self.SIMULATOR_SETTINGS
+                    if not (use_params_for_seed and
+                            name == 'random123_globalindex')]
+
+        sim = getattr(evaluator, 'sim', None)
+        simulator = (type(sim).__name__, tuple(
+            (name, getattr(sim, name)) for name in settings
+            if hasattr(sim, name)))
+
+        model = pickle.dumps((
+            cell_model,
+            evaluator.fitness_protocols,
+            evaluator.fitness_calculator,
+            getattr(evaluator, 'stages', None),
+            simulator,
+            use_params_for_seed))
+
+        params = ';'.join('%s=%s' % (name, self.quantise(param_dict[name]))
+                          for name in sorted(param_dict))
+
+        sha = hashlib.sha256(model)
+        sha.update(('%s;%s' % (target, params)).encode('utf-8'))
+
+        return sha.hexdigest()
+
+    def _path(self, key):
+        """Path of the file storing the result of key"""
+
+        return os.path.join(self.cache_dir, '%s.pkl' % key)
+
+    def get(self, key):
+        """Return the result stored for key, or None if there is none"""
+
+        if key in self.results:
+            self.results.move_to_end(key)
+            self.hits += 1
+            return dict(self.results[key])
+
+        if self.cache_dir is not None:
+            try:
+                with open(self._path(key), 'rb') as result_file:
+                    result = pickle.load(result_file)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+            else:
+                self._remember(key, result)
+                self.hits += 1
+                return dict(result)
+
+        self.misses += 1
+        return None
+
+    def set(self, key, result):
+        """Store result for key"""
+
+        self._remember(key, result)
+
+        if self.cache_dir is not None:
+            # Write to temporary file first, other processes should
+            # never read a partially written file
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir,
+                                            suffix='.tmp')
+            with os.fdopen(fd, 'wb') as result_file:
+                pickle.dump(result, result_file)
+            os.replace(tmp_path, self._path(key))
+
+    def _remember(self, key, result):
+        """Store result in memory, evict least recently used result"""
+
+        self.results[key] = dict(result)
+        self.results.move_to_end(key)
+        while len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+
+    def clear(self):
+        """Remove all results from memory and reset the counters"""
+
+        self.results.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.results)
+
+    def __getstate__(self):
+        """The in-memory results are not pickled"""
+
+        state = self.__dict__.copy()
+        state['results'] = collections.OrderedDict()
+        state['hits'] = 0
+        state['misses'] = 0
+
+        return state
+
+    def __str__(self):
+        return 'evaluation cache: %d results in memory, %d hits, %d misses' \
+            % (len(self.results), self.hits, self.misses)
+
+
+class ResponseArchive(object):
+
+    """On-disk archive of the responses of evaluations
+
+    Every evaluation is stored in a separate file in archive_dir, together
+    with its parameter values. An evaluation of the same parameter values
+    replaces the earlier one. Several processes can store responses in the
+    same archive concurrently.
+
+    The archived responses can be rescored with
+    ObjectivesCalculator.calculate_archive, e.g. after changing the
+    experimental values of the features, or adding features on the archived
+    recordings. The responses of protocols skipped during a staged
+    evaluation are archived as None.
+    """
+
+    def __init__(self, archive_dir):
+        """Constructor
+
+        Args:
+            archive_dir (str): directory in which to store the responses
+        """
+
+        self.archive_dir = archive_dir
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+    @staticmethod
+    def key(param_dict):
+        """Return the archive key of parameter values"""
+
+        params = ';'.join('%s=%r' % (name, float(param_dict[name]))
+                          for name in sorted(param_dict))
+
+        return hashlib.sha256(params.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        """Path of the file storing the responses of key"""
+
+        return os.path.join(self.archive_dir, '%s.pkl' % key)
+
+    def store(self, param_dict, responses):
+        """Store the responses of an evaluation, and return its key"""
+
+        key = self.key(param_dict)
+
+        # Write to temporary file first, other processes should
+        # never read a partially written file
+        fd, tmp_path = tempfile.mkstemp(dir=self.archive_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as archive_file:
+            pickle.dump(
+                {'param_dict': dict(param_dict), 'responses': responses},
+                archive_file)
+        os.replace(tmp_path, self._path(key))
+
+        return key
+
+    def load(self, key):
+        """Return the parameter dict and responses stored for key"""
+
+        with open(self._path(key), 'rb') as archive_file:
+            archived = pickle.load(archive_file)
+
+        return archived['param_dict'], archived['responses']
+
+    def keys(self):
+        """Return the sorted keys of all the archived evaluations"""
+
+        return sorted(filename[:-len('.pkl')]
+                      for filename in os.listdir(self.archive_dir)
+                      if filename.endswith('.pkl'))
+
+    def __iter__(self):
+        """Iterate over (param_dict, responses) of the archived evaluations"""
+
+        for key in self.keys():
+            yield self.load(key)
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __str__(self):
+        return 'response archive: %d evaluations in %s' % (
+            len(self), self.archive_dir)
@@ -0,0 +1,232 @@
+"""Process pool used to isolate protocol runs"""
+
+"""
+Copyright (c) 2016-2020, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import os
+import queue
+import sys
+import threading
+import logging
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+def _peak_rss():
+    """Return the peak resident set size of this process in MB"""
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in bytes on macOS, in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        rss /= 1024.0
+
+    return rss / 1024.0
+
+
+def _run_task(function, kwargs, max_rss):
+    """Run function inside a worker, and report if it should be recycled"""
+
+    result = function(**kwargs)
+
+    recycle = max_rss is not None and _peak_rss() > max_rss
+
+    return result, recycle
+
+
+class IsolationPool(object):
+
+    """Long-lived pool of worker processes to isolate protocol runs
+
+    The workers are started the first time a task is run, and are kept alive
+    between tasks. A worker is replaced by a fresh process when it has run
+    max_tasks tasks, when its resident memory exceeds max_rss after a task,
+    when a task times out, or when it crashes. The other workers are kept.
+
+    An IsolationPool can be passed as the 'isolate' argument of the run
+    method of the protocols, or as the 'isolate_protocols' argument of
+    the CellEvaluator.
+    """
+
+    def __init__(
+            self,
+            max_workers=1,
+            max_tasks=None,
+            max_rss=None,
+            start_method=None):
+        """Constructor
+
+        Args:
+            max_workers (int): number of worker processes
+            max_tasks (int): number of tasks after which a worker is
+                replaced (None means workers are never recycled because of
+                the number of tasks they ran)
+            max_rss (float): peak resident set size (in MB) of a worker above
+                which it is replaced after finishing its task
+                (None means no memory limit)
+            start_method (str): multiprocessing start method of the workers,
+                by default 'fork', or 'spawn' on Windows
+        """
+
+        if max_rss is not None and resource is None:
+            raise ValueError(
+                'IsolationPool: max_rss is not supported on this platform')
+
+        self.max_workers = max_workers
+        self.max_tasks = max_tasks
+        self.max_rss = max_rss
+
+        if start_method is None:
+            start_method = 'spawn' if sys.platform == 'win32' else 'fork'
+        self.start_method = start_method
+
+        self._pools = None
+        self._pid = None
+        # Guards the creation and the replacement of the queue of pools,
+        # the pool can be used by several threads
+        self._lock = threading.Lock()
+
+    def _idle_pools(self):
+        """Return the queue of idle pools, create it if necessary
+
+        Every worker is the single worker of its own pebble pool, so that a
+        worker can be replaced without stopping the others. The queue
+        contains None for the pools that are not started yet.
+        """
+
+        with self._lock:
+            # The pools are only valid in the process that created them
+            if self._pools is None or self._pid != os.getpid():
+                self._pools = queue.Queue()
+                for _ in range(self.max_workers):
+                    self._pools.put(None)
+                self._pid = os.getpid()
+
+            return self._pools
+
+    def _start_pool(self):
+        """Start a pebble pool with a single worker"""
+
+        import pebble
+        import multiprocessing
+
+        return pebble.ProcessPool(
+            max_workers=1,
+            max_tasks=self.max_tasks if self.max_tasks is not None else 0,
+            context=multiprocessing.get_context(self.start_method))
+
+    @staticmethod
+    def _stop_pool(pool):
+        """Stop the worker of pool once its running task is finished"""
+
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    def restart(self):
+        """Replace all the workers by fresh processes
+
+        Tasks that are still running are allowed to finish.
+        """
+
+        with self._lock:
+            if self._pools is None or self._pid != os.getpid():
+                self._pools = None
+                return
+            idle_pools = self._pools
+
+        pools = [idle_pools.get() for _ in range(self.max_workers)]
+        for pool in pools:
+            self._stop_pool(pool)
+            idle_pools.put(None)
+
+    def run(self, function, kwargs=None, timeout=None):
+        """Run function in one of the workers and return its result
+
+        Raises concurrent.futures.TimeoutError if the function didn't finish
+        in time, and pebble.ProcessExpired if the worker crashed.
+        """
+
+        if timeout is not None:
+            if timeout < 0:
+                raise ValueError("timeout should be > 0")
+
+        pools = self._idle_pools()
+        pool = pools.get()
+
+        try:
+            if pool is None:
+                pool = self._start_pool()
+
+            task = pool.schedule(
+                _run_task,
+                args=(function, kwargs if kwargs is not None else {},
+                      self.max_rss),
+                timeout=timeout)
+
+            # pebble replaces a worker that timed out or crashed
+            result, recycle = task.result()
+
+            if recycle:
+                logger.debug('IsolationPool: worker exceeded max_rss of %s '
+                             'MB, replacing it', self.max_rss)
+                self._stop_pool(pool)
+                pool = None
+        finally:
+            pools.put(pool)
+
+        return result
+
+    def close(self):
+        """Stop the workers once the running tasks are finished"""
+
+        self.restart()
+        with self._lock:
+            self._pools = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getstate__(self):
+        """The workers are not sent along when pickling the pool"""
+
+        state = self.__dict__.copy()
+        state['_pools'] = None
+        state['_pid'] = None
+        del state['_lock']
+
+        return state
+
+    def __setstate__(self, state):
+        """Create the lock of the unpickled pool"""
+
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return 'IsolationPool: %d worker(s), max_tasks %s, max_rss %s' % (
+            self.max_workers, self.max_tasks, self.max_rss)
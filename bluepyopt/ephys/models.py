@@ -30,13 +30,19 @@ import sys
 import os
 import collections
 import string
+import uuid
 
 from . import create_hoc, create_acc
 from . import morphologies
+from . import timing
 
 import logging
 logger = logging.getLogger(__name__)
 
+# Cells prepared by CellModel.prepare, indexed by their token.
+# Processes forked after the preparation inherit these cells.
+_prepared_icells = {}
+
 
 class Model(object):
 
@@ -103,6 +109,7 @@ class CellModel(Model):
         # Cell instantiation in simulator
         self.icell = None
         self.icell_existing_secs = None
+        self.prepared_token = None
 
         self.param_values = None
         self.gid = gid
@@ -250,15 +257,90 @@ class CellModel(Model):
         self.instantiate_morphology(sim=sim)
         sim.neuron.h.define_shape()
 
-    def instantiate(self, sim=None):
-        """Instantiate model in simulator"""
-
-        self.instantiate_morphology(sim)
+    def instantiate_mechanisms(self, sim=None):
+        """Instantiate mechanisms in simulator"""
 
         if self.mechanisms is not None:
             for mechanism in self.mechanisms:
                 mechanism.instantiate(sim=sim, icell=self.icell)
 
+    @property
+    def prepared(self):
+        """Is a prepared cell available in this process"""
+
+        return self.prepared_token in _prepared_icells
+
+    def prepare(self, sim=None):
+        """Instantiate morphology and mechanisms, to be reused by instantiate
+
+        As long as the cell is prepared, instantiate only sets the values of
+        the parameters on the prepared cell, and destroy keeps it.
+        Processes that are forked from this one (e.g. isolated protocols)
+        reuse the prepared cell as well.
+
+        The prepared cell is part of the Neuron simulation of this process
+        until unprepare is called.
+        """
+
+        if self.prepared:
+            return
+
+        self.instantiate_morphology(sim)
+        self.instantiate_mechanisms(sim)
+
+        self.prepared_token = '%s.%s' % (self.name, uuid.uuid4().hex)
+        _prepared_icells[self.prepared_token] = (
+            self.icell, self.icell_existing_secs)
+
+        # The icell can't be pickled, it is only kept in _prepared_icells
+        self.icell = None
+        self.icell_existing_secs = None
+
+    def unprepare(self, sim=None):
+        """Destroy the cell created by prepare"""
+
+        if not self.prepared:
+            self.prepared_token = None
+            return
+
+        self.icell, self.icell_existing_secs = \
+            _prepared_icells.pop(self.prepared_token)
+        self.prepared_token = None
+
+        self.destroy(sim=sim)
+
+    def instantiate_stochastic_mechanisms(self, sim=None):
+        """Seed the stochastic mechanisms of the instantiated cell again
+
+        The determinism of the mechanisms, which can be changed by a
+        protocol, is applied again as well.
+        """
+
+        if self.mechanisms is None:
+            return
+
+        for mechanism in self.mechanisms:
+            if not hasattr(mechanism, 'instantiate_determinism'):
+                continue
+
+            for location in mechanism.locations:
+                for isec in location.instantiate(sim=sim, icell=self.icell):
+                    mechanism.instantiate_determinism(
+                        mechanism.deterministic, self.icell, isec, sim)
+
+    @timing.timed('cell_model.instantiate')
+    def instantiate(self, sim=None):
+        """Instantiate model in simulator"""
+
+        if self.prepared:
+            self.icell, self.icell_existing_secs = \
+                _prepared_icells[self.prepared_token]
+
+            self.instantiate_stochastic_mechanisms(sim)
+        else:
+            self.instantiate_morphology(sim)
+            self.instantiate_mechanisms(sim)
+
         if self.params is not None:
             for param in self.params.values():
                 param.instantiate(sim=sim, icell=self.icell,
@@ -267,6 +349,14 @@ class CellModel(Model):
     def destroy(self, sim=None):  # pylint: disable=W0613
         """Destroy instantiated model in simulator"""
 
+        if self.prepared:
+            # Keep the prepared cell for the next instantiation
+            self.icell = None
+            self.icell_existing_secs = None
+            for param in self.params.values():
+                param.destroy(sim=sim)
+            return
+
         # Make sure the icell's destroy() method is called
         # without it a circular reference exists between CellRef and the object
         # this prevents the icells from being garbage collected, and
@@ -282,8 +372,9 @@ class CellModel(Model):
         self.icell_existing_secs = None
 
         self.morphology.destroy(sim=sim)
-        for mechanism in self.mechanisms:
-            mechanism.destroy(sim=sim)
+        if self.mechanisms is not None:
+            for mechanism in self.mechanisms:
+                mechanism.destroy(sim=sim)
         for param in self.params.values():
             param.destroy(sim=sim)
 
@@ -508,6 +599,9 @@ class HocCellModel(CellModel):
     def unfreeze(self, param_names):
         pass
 
+    def prepare(self, sim=None):
+        raise TypeError('HocCellModel: preparing the cell is not supported')
+
     def instantiate(self, sim=None):
         sim.neuron.h.load_file('stdrun.hoc')
         template_name = self.load_hoc_template(sim, self.hoc_string)
@@ -814,8 +908,9 @@ class LFPyCellModel(Model):
         self.icell = None
 
         self.morphology.destroy(sim=sim)
-        for mechanism in self.mechanisms:
-            mechanism.destroy(sim=sim)
+        if self.mechanisms is not None:
+            for mechanism in self.mechanisms:
+                mechanism.destroy(sim=sim)
         for param in self.params.values():
             param.destroy(sim=sim)
 
@@ -30,6 +30,7 @@ import numpy
 from bluepyopt.ephys.base import BaseEPhys
 from bluepyopt.ephys.serializer import DictMixin
 from bluepyopt.ephys.acc import arbor, ArbLabel
+from bluepyopt.ephys import timing
 
 logger = logging.getLogger(__name__)
 
@@ -114,6 +115,7 @@ class NrnFileMorphology(Morphology, DictMixin):
 
         return self.morphology_path
 
+    @timing.timed('morphology.instantiate')
     def instantiate(self, sim=None, icell=None):
         """Load morphology"""
 
@@ -56,6 +56,17 @@ class EFeatureObjective(bluepyopt.objectives.Objective):
 
         return values
 
+    def combine_feature_scores(self, feature_scores):
+        """Objective score from the scores of the features"""
+
+        raise NotImplementedError
+
+    def calculate_score(self, responses):
+        """Objective score"""
+
+        return self.combine_feature_scores(
+            self.calculate_feature_scores(responses))
+
 
 class SingletonObjective(EFeatureObjective):
 
@@ -71,10 +82,10 @@ class SingletonObjective(EFeatureObjective):
 
         super(SingletonObjective, self).__init__(name, [feature])
 
-    def calculate_score(self, responses):
-        """Objective score"""
+    def combine_feature_scores(self, feature_scores):
+        """Objective score from the scores of the features"""
 
-        return self.calculate_feature_scores(responses)[0]
+        return feature_scores[0]
 
     def calculate_value(self, responses):
         """Objective value"""
@@ -102,10 +113,10 @@ class SingletonWeightObjective(SingletonObjective):
         super(SingletonWeightObjective, self).__init__(name, feature)
         self.weight = weight
 
-    def calculate_score(self, responses):
-        """Objective score"""
+    def combine_feature_scores(self, feature_scores):
+        """Objective score from the scores of the features"""
 
-        return self.calculate_feature_scores(responses)[0] * self.weight
+        return feature_scores[0] * self.weight
 
     def __str__(self):
         """String representation"""
@@ -117,10 +128,10 @@ class MaxObjective(EFeatureObjective):
 
     """Max of list of EPhys feature"""
 
-    def calculate_score(self, responses):
-        """Objective score"""
+    def combine_feature_scores(self, feature_scores):
+        """Objective score from the scores of the features"""
 
-        return max(self.calculate_feature_scores(responses))
+        return max(feature_scores)
 
 
 class WeightedSumObjective(EFeatureObjective):
@@ -143,11 +154,10 @@ class WeightedSumObjective(EFeatureObjective):
                 'number of features')
         self.weights = weights
 
-    def calculate_score(self, responses):
-        """Objective score"""
+    def combine_feature_scores(self, feature_scores):
+        """Objective score from the scores of the features"""
 
         score = 0.0
-        feature_scores = self.calculate_feature_scores(responses)
 
         for feature_score, weight in zip(feature_scores, self.weights):
             score += weight * feature_score
@@ -19,6 +19,220 @@ Copyright (c) 2016-2020, EPFL/Blue Brain Project
  51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 """
 
+import collections
+import functools
+
+import numpy
+
+from . import efeatures
+from . import objectives
+
+
+def _calculate_archived(calculator, archive, target, key):
+    """Calculate the objectives of an archived evaluation"""
+
+    param_dict, responses = archive.load(key)
+
+    if target == 'scores':
+        return param_dict, calculator.calculate_scores(responses)
+    else:
+        return param_dict, calculator.calculate_values(responses)
+
+
+def _with_preprocessing_cache(function):
+    """Decorator that calls function inside a preprocessing cache
+
+    The features calculated from the same responses share their
+    preprocessing (see ephys.efeatures.preprocessing_cache).
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with efeatures.preprocessing_cache():
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+class CompiledObjectives(object):
+
+    """Objectives compiled into arrays, scored in one numpy pass
+
+    The features of the objectives are represented by the vector of their
+    mean absolute deviations from exp_mean (see
+    eFELFeature.deviation_from_values), NaN when the feature could not be
+    calculated. The scores of all the objectives are computed from this
+    vector, or from a matrix with one such vector per row (e.g. one row per
+    individual of a population), with array operations.
+
+    Only SingletonObjective, SingletonWeightObjective, MaxObjective and
+    WeightedSumObjective of eFELFeatures are supported. The scores equal
+    the ones of the objectives up to rounding.
+    """
+
+    # combine_feature_scores of the supported objectives
+    SUM_OBJECTIVES = (
+        objectives.SingletonObjective,
+        objectives.SingletonWeightObjective,
+        objectives.WeightedSumObjective)
+    MAX_OBJECTIVES = (objectives.MaxObjective,)
+
+    def __init__(self, objective_list):
+        """Constructor
+
+        Args:
+            objective_list (list of EFeatureObjective): objectives to compile
+        """
+
+        features = collections.OrderedDict()
+        for objective in objective_list:
+            if not self.supported(objective):
+                raise ValueError(
+                    'CompiledObjectives: objective %s is not supported' %
+                    objective.name)
+            for feature in objective.features:
+                features[id(feature)] = feature
+
+        self.objective_names = [objective.name for objective in objective_list]
+        self.features = list(features.values())
+        feature_indices = {feature_id: index
+                           for index, feature_id in enumerate(features)}
+
+        self.exp_mean = numpy.array(
+            [feature.exp_mean for feature in self.features], dtype=float)
+        self.exp_std = numpy.array(
+            [feature.exp_std for feature in self.features], dtype=float)
+        self.max_score = numpy.array(
+            [feature.max_score for feature in self.features], dtype=float)
+        self.force_max_score = numpy.array(
+            [feature.force_max_score for feature in self.features],
+            dtype=bool)
+
+        # Weights of the features in the sum objectives, features of the
+        # max objectives
+        shape = (len(objective_list), len(self.features))
+        self.weights = numpy.zeros(shape)
+        self.max_mask = numpy.zeros(shape, dtype=bool)
+        self.is_max = numpy.zeros(len(objective_list), dtype=bool)
+
+        for index, objective in enumerate(objective_list):
+            indices = [feature_indices[id(feature)]
+                       for feature in objective.features]
+            if isinstance(objective, self.MAX_OBJECTIVES):
+                self.is_max[index] = True
+                self.max_mask[index, indices] = True
+            else:
+                for feature_index, weight in zip(
+                        indices, self.objective_weights(objective)):
+                    self.weights[index, feature_index] += weight
+
+    @classmethod
+    def supported(cls, objective):
+        """Check if an objective can be compiled"""
+
+        objective_type = type(objective)
+        if objective_type.calculate_score is not \
+                objectives.EFeatureObjective.calculate_score:
+            return False
+
+        if not any(
+                objective_type.combine_feature_scores is
+                supported_type.combine_feature_scores
+                for supported_type in cls.SUM_OBJECTIVES + cls.MAX_OBJECTIVES):
+            return False
+
+        return all(efeatures.efel_batchable(feature)
+                   for feature in objective.features)
+
+    @staticmethod
+    def objective_weights(objective):
+        """Weights of the features of a sum objective"""
+
+        if isinstance(objective, objectives.WeightedSumObjective):
+            return objective.weights
+        elif isinstance(objective, objectives.SingletonWeightObjective):
+            return [objective.weight]
+
+        return [1.0]
+
+    def feature_deviations(self, responses, efel_values=None):
+        """Vector of the deviations of the features for responses
+
+        Args:
+            responses (dict): responses of the recordings
+            efel_values (dict): eFEL values of the features by feature id,
+                calculated from responses when not given
+        """
+
+        if efel_values is None:
+            efel_values = efeatures.calculate_efel_features(
+                self.features, responses)
+
+        values = [efel_values[id(feature)] for feature in self.features]
+        counts = numpy.array(
+            [0 if value is None else len(value) for value in values])
+
+        # All the eFEL values in one array, with the index of their feature
+        flat_values = numpy.concatenate(
+            [numpy.asarray(value, dtype=float)
+             for value in values if value is not None] + [numpy.empty(0)])
+        feature_indices = numpy.repeat(numpy.arange(len(values)), counts)
+
+        sums = numpy.bincount(
+            feature_indices,
+            weights=numpy.abs(flat_values - self.exp_mean[feature_indices]),
+            minlength=len(values))
+
+        # Features without values get NaN, and then the max score
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return sums / counts
+
+    def feature_scores(self, deviations):
+        """Scores of the features from their deviations
+
+        Args:
+            deviations (numpy.ndarray): deviations of the features in the
+                last axis
+        """
+
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            scores = deviations / self.exp_std
+
+        scores = numpy.where(numpy.isnan(scores), self.max_score, scores)
+
+        return numpy.where(
+            self.force_max_score,
+            numpy.minimum(scores, self.max_score),
+            scores)
+
+    def objective_scores(self, deviations):
+        """Scores of the objectives from the deviations of the features
+
+        Args:
+            deviations (numpy.ndarray): deviations of the features in the
+                last axis, e.g. a matrix with one row per individual
+
+        Returns:
+            numpy.ndarray with the scores of the objectives in the last axis
+        """
+
+        feature_scores = self.feature_scores(numpy.asarray(deviations))
+
+        sum_scores = feature_scores @ self.weights.T
+        max_scores = numpy.max(
+            numpy.where(self.max_mask, feature_scores[..., None, :],
+                        -numpy.inf),
+            axis=-1)
+
+        return numpy.where(self.is_max, max_scores, sum_scores)
+
+    def calculate_scores(self, responses):
+        """Calculate the score of every objective for responses"""
+
+        return collections.OrderedDict(zip(
+            self.objective_names,
+            self.objective_scores(self.feature_deviations(responses))))
+
 
 class ObjectivesCalculator(object):
 
@@ -26,26 +240,345 @@ class ObjectivesCalculator(object):
 
     def __init__(
             self,
-            objectives=None):
+            objectives=None,
+            batch_efel=True,
+            vectorised=False):
         """Constructor
 
         Args:
             objectives (list of Objective): objectives over which to calculate
+            batch_efel (bool): calculate the eFEL features that share their
+                trace and settings with a single eFEL call (see
+                ephys.efeatures.calculate_efel_features), instead of one
+                call per feature. The scores and values are the same.
+            vectorised (bool): calculate the scores with the objectives
+                compiled into arrays (see CompiledObjectives). The scores
+                are the same up to rounding. All objectives have to be
+                supported by CompiledObjectives.
         """
 
         self.objectives = objectives
+        self.batch_efel = batch_efel
+        self.vectorised = vectorised
 
-    def calculate_scores(self, responses):
-        """Calculator the score for every objective"""
+        self._compiled = None
 
-        return {objective.name: objective.calculate_score(responses)
-                for objective in self.objectives}
+    def _compile_key(self):
+        """Key of the objectives, features and targets that are compiled"""
+
+        return tuple(
+            (id(objective),
+             tuple(CompiledObjectives.objective_weights(objective)),
+             tuple((id(feature), feature.exp_mean, feature.exp_std,
+                    feature.max_score, feature.force_max_score)
+                   for feature in getattr(objective, 'features', None) or []))
+            for objective in self.objectives)
+
+    def compile(self):
+        """Return the objectives compiled into arrays
+
+        The compiled objectives are kept until the list of objectives, their
+        weights or the targets of their features (exp_mean, exp_std,
+        max_score, force_max_score) change.
+        """
+
+        key = self._compile_key()
+        if self._compiled is None or self._compiled[0] != key:
+            self._compiled = (key, CompiledObjectives(self.objectives))
+
+        return self._compiled[1]
+
+    def __getstate__(self):
+        """The compiled objectives are not pickled
+
+        They only hold the ids of the objects of this process, and would
+        change the pickle, which is part of the key of EvaluationCache.
+        """
+
+        state = self.__dict__.copy()
+        state['_compiled'] = None
+
+        return state
+
+    def calculate_population_scores(self, responses_list):
+        """Calculate the scores of a population with the compiled objectives
+
+        Args:
+            responses_list (list of dict): responses of every individual
+
+        Returns:
+            numpy.ndarray with one row of objective scores per individual,
+            in the order of the objectives
+        """
+
+        compiled = self.compile()
+
+        deviations = numpy.array(
+            [compiled.feature_deviations(responses)
+             for responses in responses_list], dtype=float).reshape(
+                 len(responses_list), len(compiled.features))
+
+        return compiled.objective_scores(deviations)
+
+    @staticmethod
+    def _combines_features(objective):
+        """Check if the score of objective combines the feature scores"""
+
+        return getattr(objective, 'features', None) is not None and \
+            type(objective).calculate_score is \
+            objectives.EFeatureObjective.calculate_score
+
+    @staticmethod
+    def _singleton_value(objective):
+        """Check if the value of objective is the value of its feature"""
+
+        return type(objective).calculate_value is \
+            objectives.SingletonObjective.calculate_value \
+            if isinstance(objective, objectives.SingletonObjective) else False
+
+    def _efel_values(self, responses_list, objective_list):
+        """eFEL values of the features of objective_list for every responses
+
+        Returns:
+            list with for every responses a dict with the values by
+            feature id
+        """
+
+        if not self.batch_efel:
+            return [{} for _ in responses_list]
+
+        features = collections.OrderedDict()
+        for objective in objective_list:
+            for feature in objective.features:
+                if efeatures.efel_batchable(feature):
+                    features[id(feature)] = feature
+
+        return efeatures.calculate_population_efel_features(
+            list(features.values()), responses_list)
+
+    @staticmethod
+    def _feature_score(feature, responses, efel_values):
+        """Score of a feature, from efel_values if it was batched"""
+
+        if id(feature) in efel_values:
+            return feature.score_from_values(efel_values[id(feature)])
+
+        return feature.calculate_score(responses)
+
+    @staticmethod
+    def _feature_value(feature, responses, efel_values):
+        """Value of a feature, from efel_values if it was batched"""
+
+        if id(feature) in efel_values:
+            return feature.value_from_values(efel_values[id(feature)])
+
+        return feature.calculate_feature(responses)
+
+    def calculate_scores(self, responses, known_scores=None):
+        """Calculator the score for every objective
+
+        Args:
+            responses (dict): responses of the recordings
+            known_scores (dict): scores already calculated from responses,
+                by objective name, which are reused instead of being
+                calculated again
+        """
+
+        return self.calculate_population(
+            [responses],
+            known_scores_list=None if known_scores is None
+            else [known_scores])[0]
 
     def calculate_values(self, responses):
         """Calculator the value of each objective"""
 
-        return {objective.name: objective.calculate_value(responses)
-                for objective in self.objectives}
+        return self.calculate_population([responses], target='values')[0]
+
+    def calculate_population(
+            self, responses_list, target='scores', known_scores_list=None):
+        """Calculate the objectives for several responses
+
+        The eFEL features of all the responses are calculated together (see
+        ephys.efeatures.calculate_population_efel_features).
+
+        Args:
+            responses_list (list of dict): responses, e.g. of the
+                individuals of a population
+            target (str): 'scores' or 'values'
+            known_scores_list (list of dict): for target 'scores', the
+                scores already calculated from every responses, by objective
+                name (see calculate_scores)
+
+        Returns:
+            list with the dict of objectives of every responses
+        """
+
+        if target == 'scores':
+            if known_scores_list is None:
+                known_scores_list = [{} for _ in responses_list]
+
+            # Objectives still to be scored for at least one responses
+            objective_list = [
+                objective for objective in self.objectives
+                if not all(objective.name in known_scores
+                           for known_scores in known_scores_list)]
+
+            if self.vectorised:
+                compiled = self.compile()
+                features = collections.OrderedDict(
+                    (id(feature), feature) for objective in objective_list
+                    for feature in objective.features)
+                efel_values_list = efeatures.\
+                    calculate_population_efel_features(
+                        list(features.values()), responses_list)
+                scores_list = []
+                for responses, efel_values, known_scores in zip(
+                        responses_list, efel_values_list, known_scores_list):
+                    # The features of the known objectives are not needed
+                    all_efel_values = dict.fromkeys(
+                        id(feature) for feature in compiled.features)
+                    all_efel_values.update(efel_values)
+                    deviations = compiled.feature_deviations(
+                        responses, all_efel_values)
+                    scores = dict(zip(
+                        compiled.objective_names,
+                        compiled.objective_scores(deviations)))
+                    scores.update(known_scores)
+                    scores_list.append(scores)
+                return scores_list
+
+            efel_values_list = self._efel_values(
+                responses_list,
+                [objective for objective in objective_list
+                 if self._combines_features(objective)])
+
+            return [self._scores(responses, efel_values, known_scores)
+                    for responses, efel_values, known_scores in zip(
+                        responses_list, efel_values_list, known_scores_list)]
+        elif target == 'values':
+            efel_values_list = self._efel_values(
+                responses_list,
+                [objective for objective in self.objectives
+                 if self._singleton_value(objective)])
+
+            return [self._values(responses, efel_values)
+                    for responses, efel_values in zip(
+                        responses_list, efel_values_list)]
+
+        raise ValueError(
+            'ObjectivesCalculator: target has to be "scores" or "values".')
+
+    @_with_preprocessing_cache
+    def _scores(self, responses, efel_values, known_scores):
+        """Score of every objective, using the precalculated efel_values"""
+
+        scores = {}
+        for objective in self.objectives:
+            if objective.name in known_scores:
+                scores[objective.name] = known_scores[objective.name]
+            elif self._combines_features(objective):
+                scores[objective.name] = objective.combine_feature_scores(
+                    [self._feature_score(feature, responses, efel_values)
+                     for feature in objective.features])
+            else:
+                scores[objective.name] = objective.calculate_score(responses)
+
+        return scores
+
+    @_with_preprocessing_cache
+    def _values(self, responses, efel_values):
+        """Value of every objective, using the precalculated efel_values"""
+
+        values = {}
+        for objective in self.objectives:
+            if self._singleton_value(objective):
+                values[objective.name] = self._feature_value(
+                    objective.features[0], responses, efel_values)
+            else:
+                values[objective.name] = objective.calculate_value(responses)
+
+        return values
+
+    @_with_preprocessing_cache
+    def calculate_feature_details(self, responses):
+        """Calculate the value and score of every feature, and the objectives
+
+        Every feature is calculated once, even if it is part of several
+        objectives.
+
+        Returns:
+            tuple of dicts (feature_values, feature_scores, objective_scores),
+            the feature dicts are indexed by feature name
+        """
+
+        feature_values = {}
+        feature_scores = {}
+        objective_scores = {}
+
+        # Features indexed by id, names of features are not always unique
+        calculated_scores = {}
+
+        efel_values = self._efel_values(
+            [responses],
+            [objective for objective in self.objectives
+             if getattr(objective, 'features', None) is not None])[0]
+
+        for objective in self.objectives:
+            features = getattr(objective, 'features', None)
+            if features is None:
+                objective_scores[objective.name] = \
+                    objective.calculate_score(responses)
+                continue
+
+            for feature in features:
+                if id(feature) not in calculated_scores:
+                    feature_values[feature.name] = self._feature_value(
+                        feature, responses, efel_values)
+                    calculated_scores[id(feature)] = self._feature_score(
+                        feature, responses, efel_values)
+                    feature_scores[feature.name] = \
+                        calculated_scores[id(feature)]
+
+            # Objectives that override calculate_score compute it themselves
+            if self._combines_features(objective):
+                objective_scores[objective.name] = \
+                    objective.combine_feature_scores(
+                        [calculated_scores[id(feature)]
+                         for feature in features])
+            else:
+                objective_scores[objective.name] = \
+                    objective.calculate_score(responses)
+
+        return feature_values, feature_scores, objective_scores
+
+    def calculate_archive(self, archive, target='scores', map_function=None):
+        """Calculate the objectives from archived responses
+
+        Args:
+            archive (ephys.evaluators.ResponseArchive): archive containing
+                the responses of earlier evaluations
+            target (str): 'scores' or 'values'
+            map_function (function): function used to map (parallelise) the
+                archived evaluations, the builtin map by default. Only the
+                archive keys are sent to the tasks, every task loads its
+                own responses.
+
+        Returns:
+            list of (param_dict, objective dict) tuples, one per archived
+            evaluation
+        """
+
+        if target not in ['scores', 'values']:
+            raise ValueError(
+                'ObjectivesCalculator: target has to be "scores" or '
+                '"values".')
+
+        if map_function is None:
+            map_function = map
+
+        return list(map_function(
+            functools.partial(_calculate_archived, self, archive, target),
+            archive.keys()))
 
     def __str__(self):
         return 'objectives:\n  %s' % '\n  '.join(
@@ -26,6 +26,7 @@ import logging
 import bluepyopt
 from bluepyopt.ephys.serializer import DictMixin
 from . import parameterscalers
+from . import timing
 
 logger = logging.getLogger(__name__)
 
@@ -153,6 +154,7 @@ class NrnGlobalParameter(NrnParameter, DictMixin):
 
         self.param_name = param_name
 
+    @timing.timed('parameter.instantiate')
     def instantiate(self, sim=None, icell=None, params=None):
         """Instantiate"""
 
@@ -216,6 +218,7 @@ class NrnSectionParameter(NrnParameter, DictMixin):
             self.value_scaler = parameterscalers.NrnSegmentLinearScaler()
         self.value_scale_func = self.value_scaler.scale
 
+    @timing.timed('parameter.instantiate')
     def instantiate(self, sim=None, icell=None, params=None):
         """Instantiate"""
         if self.value is None:
@@ -290,6 +293,7 @@ class NrnPointProcessParameter(NrnParameter, DictMixin):
         self.locations = locations
         self.param_name = param_name
 
+    @timing.timed('parameter.instantiate')
     def instantiate(self, sim=None, icell=None, params=None):
         """Instantiate"""
         if self.value is None:
@@ -364,6 +368,7 @@ class NrnRangeParameter(NrnParameter, DictMixin):
             self.value_scaler = parameterscalers.NrnSegmentLinearScaler()
         self.value_scale_func = self.value_scaler.scale
 
+    @timing.timed('parameter.instantiate')
     def instantiate(self, sim=None, icell=None, params=None):
         """Instantiate"""
         if self.value is None:
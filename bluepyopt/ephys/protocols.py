@@ -24,10 +24,12 @@ Copyright (c) 2016-2020, EPFL/Blue Brain Project
 
 # pylint: disable=W0511
 
-import os
 import sys
 import collections
-import tempfile
+import copy
+import os
+
+import numpy
 
 # TODO: maybe find a better name ? -> sweep ?
 import logging
@@ -35,9 +37,12 @@ logger = logging.getLogger(__name__)
 
 from . import models
 from . import locations
+from . import isolation
+from . import timing
 from . import simulators
 from . import stimuli
-from .responses import TimeVoltageResponse
+from . import efeatures
+from .responses import ArrayTimeVoltageResponse, TimeVoltageResponse
 from .acc import arbor
 from . import create_acc
 
@@ -55,6 +60,60 @@ class Protocol(object):
 
         self.name = name
 
+    def set_recording_windows(self, features):
+        """Only store the time windows of the recordings used by features
+
+        The windows of every recording of the protocol and its subprotocols
+        are set with recording_windows.
+
+        Args:
+            features (list of EFeature): features computed from the
+                responses of the protocol
+        """
+
+        for protocol in self.subprotocols().values():
+            for recording in getattr(protocol, 'recordings', None) or []:
+                recording.windows = recording_windows(recording.name,
+                                                      features)
+
+
+def recording_windows(recording_name, features):
+    """Union of the time windows of a recording used by features
+
+    Args:
+        recording_name (str): name of the recording
+        features (list of EFeature): features, the ones that don't use the
+            recording are ignored
+
+    Returns:
+        sorted list of the non-overlapping (start, end) windows, None if a
+        feature needs the full recording or if no feature uses it
+    """
+
+    windows = []
+    for feature in features:
+        if recording_name not in efeatures.feature_recording_names(feature):
+            continue
+
+        window = feature.time_window() \
+            if hasattr(feature, 'time_window') else None
+        if window is None:
+            return None
+        windows.append(window)
+
+    if not windows:
+        return None
+
+    merged_windows = []
+    for start, end in sorted(windows):
+        if merged_windows and start <= merged_windows[-1][1]:
+            merged_windows[-1] = (merged_windows[-1][0],
+                                  max(merged_windows[-1][1], end))
+        else:
+            merged_windows.append((start, end))
+
+    return merged_windows
+
 
 class SequenceProtocol(Protocol):
 
@@ -136,6 +195,70 @@ class SequenceProtocol(Protocol):
         return content
 
 
+class Equilibration(object):
+
+    """Simulation that brings the cell to a steady state before a sweep
+
+    A sweep protocol with an equilibration starts (at t=0) from the state
+    at the end of the equilibration. Sweep protocols that run on the same
+    instantiation of the cell (see MultiSweepProtocol) and share an
+    Equilibration object simulate it only once: its final state is saved
+    (neuron.h.SaveState) and restored for every protocol.
+    """
+
+    def __init__(
+            self,
+            name=None,
+            duration=None,
+            stimuli=None,
+            cvode_active=None):
+        """Constructor
+
+        Args:
+            name (str): name of this object
+            duration (float): duration of the equilibration (ms)
+            stimuli (list of Stimuli): Stimulus objects applied during the
+                equilibration, e.g. a holding current. The stimuli of the
+                protocols are not applied during the equilibration.
+                Stimuli that generate events (e.g. synaptic stimuli) are not
+                supported.
+            cvode_active (bool): whether to use variable time step
+        """
+
+        self.name = name
+        self.duration = duration
+        self.stimuli = stimuli if stimuli is not None else []
+        self.cvode_active = cvode_active
+
+    def run(self, cell_model, sim=None):
+        """Run equilibration on an instantiated cell, return its final state"""
+
+        for stimulus in self.stimuli:
+            stimulus.instantiate(sim=sim, icell=cell_model.icell)
+
+        try:
+            state = sim.run(
+                self.duration,
+                cvode_active=self.cvode_active,
+                save_state=True)
+        finally:
+            for stimulus in self.stimuli:
+                stimulus.destroy(sim=sim)
+
+        return state
+
+    def __str__(self):
+        """String representation"""
+
+        content = 'equilibration %s: %s ms\n' % (self.name, self.duration)
+
+        content += '  stimuli:\n'
+        for stimulus in self.stimuli:
+            content += '    %s\n' % str(stimulus)
+
+        return content
+
+
 class SweepProtocol(Protocol):
 
     """Sweep protocol"""
@@ -146,7 +269,8 @@ class SweepProtocol(Protocol):
             stimuli=None,
             recordings=None,
             cvode_active=None,
-            deterministic=False):
+            deterministic=False,
+            equilibration=None):
         """Constructor
 
         Args:
@@ -157,6 +281,8 @@ class SweepProtocol(Protocol):
             cvode_active (bool): whether to use variable time step
             deterministic (bool): whether to force all mechanism
                 to be deterministic
+            equilibration (Equilibration): simulation run before the
+                protocol, from the end state of which the protocol starts
         """
 
         super(SweepProtocol, self).__init__(name)
@@ -164,6 +290,7 @@ class SweepProtocol(Protocol):
         self.recordings = recordings
         self.cvode_active = cvode_active
         self.deterministic = deterministic
+        self.equilibration = equilibration
 
     @property
     def total_duration(self):
@@ -182,20 +309,101 @@ class SweepProtocol(Protocol):
             """Inner function"""
             previous_stoch_state = []
             if self.deterministic:
-                for mech in cell_model.mechanisms:
+                mechanisms = cell_model.mechanisms or []
+                for mech in mechanisms:
                     previous_stoch_state.append(mech.deterministic)
                     mech.deterministic = True
 
             responses = func(self, cell_model, param_values, **kwargs)
 
             if self.deterministic:
-                for i, mech in enumerate(cell_model.mechanisms):
+                for i, mech in enumerate(mechanisms):
                     mech.deterministic = previous_stoch_state[i]
 
             return responses
 
         return inner
 
+    def equilibrate(self, cell_model, sim=None, states=None):
+        """Return the state at the end of the equilibration of the protocol
+
+        Args:
+            cell_model (CellModel): instantiated cell model
+            sim (NrnSimulator): simulator
+            states (dict): states of the equilibrations that already ran on
+                this cell, the new state is added to it
+        """
+
+        if self.equilibration is None:
+            return None
+
+        if isinstance(sim, LFPySimulator):
+            raise ValueError(
+                'SweepProtocol: equilibration is not supported with '
+                'LFPySimulator')
+
+        key = (id(self.equilibration), self.deterministic)
+        if states is not None and key in states:
+            return states[key]
+
+        state = self.equilibration.run(cell_model, sim=sim)
+
+        if states is not None:
+            states[key] = state
+
+        return state
+
+    def run_on_instantiated_cell(
+            self, cell_model, param_values, sim=None, states=None):
+        """Run the sweep on a cell model that is already instantiated
+
+        Args:
+            states (dict): states of the equilibrations that already ran on
+                this cell (see equilibrate)
+        """
+
+        try:
+            initial_state = self.equilibrate(
+                cell_model, sim=sim, states=states)
+        except (RuntimeError, simulators.NrnSimulatorException):
+            logger.debug(
+                'SweepProtocol: Equilibration of parameter set {%s} '
+                'generated an exception, returning None in responses',
+                str(param_values))
+            return {recording.name: None for recording in self.recordings}
+
+        self.instantiate(sim=sim, cell_model=cell_model)
+
+        try:
+            if isinstance(sim, LFPySimulator):
+                sim.run(
+                    lfpy_cell=cell_model.lfpy_cell,
+                    lfpy_electrode=cell_model.lfpy_electrode,
+                    tstop=self.total_duration,
+                    cvode_active=self.cvode_active)
+            else:
+                # Simulators without equilibration support keep working
+                run_kwargs = {'cvode_active': self.cvode_active}
+                if initial_state is not None:
+                    run_kwargs['initial_state'] = initial_state
+                sim.run(self.total_duration, **run_kwargs)
+        except (RuntimeError, simulators.NrnSimulatorException):
+            logger.debug(
+                'SweepProtocol: Running of parameter set {%s} generated '
+                'an exception, returning None in responses',
+                str(param_values))
+            responses = {recording.name:
+                         None for recording in self.recordings}
+        else:
+            responses = {
+                recording.name: recording.response
+                for recording in self.recordings}
+
+        self.destroy(sim=sim)
+
+        return responses
+
+    @timing.timed('protocol.run')
     def _run_func(self, cell_model, param_values, sim=None):
         """Run protocols"""
 
@@ -203,32 +411,8 @@ class SweepProtocol(Protocol):
             cell_model.freeze(param_values)
             cell_model.instantiate(sim=sim)
 
-            self.instantiate(sim=sim, cell_model=cell_model)
-
-            try:
-                if isinstance(sim, LFPySimulator):
-                    sim.run(
-                        lfpy_cell=cell_model.lfpy_cell,
-                        lfpy_electrode=cell_model.lfpy_electrode,
-                        tstop=self.total_duration,
-                        cvode_active=self.cvode_active)
-                else:
-                    sim.run(
-                        self.total_duration, cvode_active=self.cvode_active
-                    )
-            except (RuntimeError, simulators.NrnSimulatorException):
-                logger.debug(
-                    'SweepProtocol: Running of parameter set {%s} generated '
-                    'an exception, returning None in responses',
-                    str(param_values))
-                responses = {recording.name:
-                             None for recording in self.recordings}
-            else:
-                responses = {
-                    recording.name: recording.response
-                    for recording in self.recordings}
-
-            self.destroy(sim=sim)
+            responses = self.run_on_instantiated_cell(
+                cell_model, param_values, sim=sim)
 
             cell_model.destroy(sim=sim)
 
@@ -252,7 +436,28 @@ class SweepProtocol(Protocol):
         if isolate is None:
             isolate = True
 
-        if isolate:
+        if isinstance(isolate, isolation.IsolationPool):
+            import pebble
+            from concurrent.futures import TimeoutError
+
+            try:
+                responses = timing.collect(isolate.run(
+                    timing.isolated(self._run_func),
+                    kwargs={
+                        'cell_model': cell_model,
+                        'param_values': param_values,
+                        'sim': sim},
+                    timeout=timeout))
+            except TimeoutError:
+                logger.debug('SweepProtocol: task took longer than '
+                             'timeout, will return empty response '
+                             'for this recording')
+                responses = {recording.name:
+                             None for recording in self.recordings}
+            except pebble.ProcessExpired as e:
+                raise SweepProtocolException(
+                    'Worker running Neuron Sweep Protocol crashed') from e
+        elif isolate:
             def _reduce_method(meth):
                 """Overwrite reduce"""
                 return (getattr, (meth.__self__, meth.__func__.__name__))
@@ -285,13 +490,15 @@ class SweepProtocol(Protocol):
                 max_tasks=1,
                 context=multiprocessing_context
             ) as pool:
-                tasks = pool.schedule(self._run_func, kwargs={
-                    'cell_model': cell_model,
-                    'param_values': param_values,
-                    'sim': sim},
+                tasks = pool.schedule(
+                    timing.isolated(self._run_func),
+                    kwargs={
+                        'cell_model': cell_model,
+                        'param_values': param_values,
+                        'sim': sim},
                     timeout=timeout)
                 try:
-                    responses = tasks.result()
+                    responses = timing.collect(tasks.result())
                 except TimeoutError:
                     logger.debug('SweepProtocol: task took longer than '
                                  'timeout, will return empty response '
@@ -363,7 +570,8 @@ class StepProtocol(SweepProtocol):
             holding_stimulus=None,
             recordings=None,
             cvode_active=None,
-            deterministic=False):
+            deterministic=False,
+            equilibration=None):
         """Constructor
 
         Args:
@@ -374,6 +582,8 @@ class StepProtocol(SweepProtocol):
             cvode_active (bool): whether to use variable time step
             deterministic (bool): whether to force all mechanism
                 to be deterministic
+            equilibration (Equilibration): simulation run before the
+                protocol, from the end state of which the protocol starts
         """
 
         super(StepProtocol, self).__init__(
@@ -383,7 +593,8 @@ class StepProtocol(SweepProtocol):
                 holding_stimulus]
             if holding_stimulus is not None else [step_stimulus],
             recordings=recordings,
-            cvode_active=cvode_active)
+            cvode_active=cvode_active,
+            equilibration=equilibration)
 
         self.step_stimulus = step_stimulus
         self.holding_stimulus = holding_stimulus
@@ -399,6 +610,120 @@ class StepProtocol(SweepProtocol):
         return self.step_stimulus.step_duration
 
 
+class MultiSweepProtocol(SweepProtocol):
+
+    """Sweep protocols that run on a single instantiation of the cell
+
+    The cell model is instantiated once, after which the sweep protocols
+    run one after the other on it. Between two sweeps, the stimuli and
+    recordings are swapped, and the stochastic mechanisms are seeded
+    again. The state of the cell is reinitialised by the simulator run
+    (finitialize), so the responses are identical to the ones of the
+    sweep protocols run separately. Sweeps that share an Equilibration
+    start from a single saved state of it.
+    """
+
+    def __init__(self, name=None, protocols=None):
+        """Constructor
+
+        Args:
+            name (str): name of this object
+            protocols (list of SweepProtocols): sweep protocols to run
+        """
+
+        # Stimuli, recordings and determinism are the ones of the sweeps
+        Protocol.__init__(self, name)
+        self.protocols = protocols
+        self.cvode_active = None
+        self.deterministic = False
+        self.equilibration = None
+
+    @property
+    def stimuli(self):
+        """Stimuli of all the sweeps"""
+
+        return [stimulus for protocol in self.protocols
+                for stimulus in protocol.stimuli]
+
+    @property
+    def recordings(self):
+        """Recordings of all the sweeps"""
+
+        return [recording for protocol in self.protocols
+                for recording in protocol.recordings]
+
+    def subprotocols(self):
+        """Return subprotocols"""
+
+        subprotocols = collections.OrderedDict({self.name: self})
+
+        for protocol in self.protocols:
+            subprotocols.update(protocol.subprotocols())
+
+        return subprotocols
+
+    @timing.timed('protocol.run')
+    def _run_func(self, cell_model, param_values, sim=None):
+        """Run protocols"""
+
+        try:
+            cell_model.freeze(param_values)
+
+            mechanisms = cell_model.mechanisms \
+                if cell_model.mechanisms is not None else []
+            previous_stoch_state = [mech.deterministic
+                                    for mech in mechanisms]
+
+            # Saved states of the equilibrations shared by the sweeps
+            states = {}
+
+            responses = collections.OrderedDict()
+            for index, protocol in enumerate(self.protocols):
+                for mech, deterministic in zip(
+                        mechanisms, previous_stoch_state):
+                    mech.deterministic = protocol.deterministic or \
+                        deterministic
+
+                if index == 0:
+                    cell_model.instantiate(sim=sim)
+                else:
+                    cell_model.instantiate_stochastic_mechanisms(sim=sim)
+
+                responses.update(protocol.run_on_instantiated_cell(
+                    cell_model, param_values, sim=sim, states=states))
+
+            for mech, deterministic in zip(mechanisms, previous_stoch_state):
+                mech.deterministic = deterministic
+
+            cell_model.destroy(sim=sim)
+
+            cell_model.unfreeze(param_values.keys())
+
+            return responses
+        except BaseException as e:
+            raise SweepProtocolException(
+                'Failed to run Neuron Multi Sweep Protocol') from e
+
+    def __str__(self):
+        """String representation"""
+
+        content = 'Multi sweep protocol %s:\n' % self.name
+
+        content += '%d sweeps:\n' % len(self.protocols)
+        for protocol in self.protocols:
+            content += '%s\n' % str(protocol)
+
+        return content
+
+
+def arb_sampling_frequency(recording):
+    """Sampling frequency (kHz) of a recording in Arbor, 10 kHz by default"""
+
+    sampling_interval = getattr(recording, 'sampling_interval', None)
+
+    return 10.0 if sampling_interval is None else 1.0 / sampling_interval
+
+
 class ArbSweepProtocol(Protocol):
 
     """Arbor Sweep protocol"""
@@ -435,23 +760,13 @@ class ArbSweepProtocol(Protocol):
 
         return collections.OrderedDict({self.name: self})
 
-    def _run_func(self, cell_json, param_values, sim=None):
+    @timing.timed('protocol.run')
+    def _run_func(self, cell_acc, morphology_path, param_values, sim=None):
         """Run protocols"""
 
         try:
-            # Loading cell constituents from ACC
-            cell_json, morph, decor, labels = \
-                create_acc.read_acc(cell_json)
-
-            # Locations of stimuli and recordings can be instantiated
-            # as labels (useful for visualization in Arbor GUI)
-            if self.use_labels:
-                labels = self.instantiate_locations(labels)
-
-            # Adding stimuli to decor (could also be written/loaded from ACC)
-            decor = self.instantiate_iclamp_stimuli(
-                decor,
-                use_labels=self.use_labels)
+            morph, decor, labels = self.instantiate_cell_components(
+                cell_acc, morphology_path)
 
             arb_cell_model = sim.instantiate(morph, decor, labels)
 
@@ -481,8 +796,8 @@ class ArbSweepProtocol(Protocol):
                                      (len(self.recordings),
                                       len(arb_cell_model.traces)))
                 responses = {
-                    recording.name: TimeVoltageResponse(
-                        recording.name, trace.time, trace.value)
+                    recording.name: recording.create_response(
+                        trace.time, trace.value)
                     for recording, trace in zip(self.recordings,
                                                 arb_cell_model.traces)}
 
@@ -491,6 +806,100 @@ class ArbSweepProtocol(Protocol):
             raise ArbSweepProtocolException(
                 'Failed to run Arbor Sweep Protocol') from e
 
+    def instantiate_cell_components(self, cell_acc, morphology_path):
+        """Load the cell from in-memory ACC and add the iclamp stimuli
+
+        Returns:
+            the morphology, decor and label dict of the Arbor cable cell
+        """
+
+        # Loading cell constituents from in-memory ACC
+        cell_json, morph, decor, labels = \
+            create_acc.load_acc(cell_acc, morphology_path)
+
+        # Locations of stimuli and recordings can be instantiated
+        # as labels (useful for visualization in Arbor GUI)
+        if self.use_labels:
+            labels = self.instantiate_locations(labels)
+
+        # Adding stimuli to decor (could also be written/loaded from ACC)
+        decor = self.instantiate_iclamp_stimuli(
+            decor,
+            use_labels=self.use_labels)
+
+        return morph, decor, labels
+
+    def instantiate_batch_cell(self, cell_model, param_values, sim=None):
+        """Instantiate the protocol on a cell of a batch simulation
+
+        Args:
+            cell_model (CellModel): cell model with the parameters
+                param_values
+            param_values (dict): parameter values of the cell
+            sim (ArbSimulator): simulator of the batch
+
+        Returns:
+            ArbBatchCell with one voltage probe per recording, the probes
+            are in the same order as the recordings
+        """
+
+        cell_acc = cell_model.create_acc(param_values,
+                                         ext_catalogues=sim.ext_catalogues)
+
+        return self.instantiate_acc_batch_cell(
+            cell_acc, cell_model.morphology.morphology_path, sim=sim)
+
+    def instantiate_acc_batch_cell(self, cell_acc, morphology_path, sim=None):
+        """Instantiate the protocol on a batch cell from in-memory ACC
+
+        See instantiate_batch_cell.
+        """
+
+        morph, decor, labels = self.instantiate_cell_components(
+            cell_acc, morphology_path)
+
+        cable_cell = sim.cable_cell(morph, decor, labels)
+
+        event_generators = [
+            acc_events
+            for stim in self.stimuli
+            if isinstance(stim, stimuli.SynapticStimulus)
+            for acc_events in stim.acc_events()]
+
+        probes = []
+        for i, rec in enumerate(self.recordings):
+            arb_loc = rec.location.acc_label()
+            if isinstance(arb_loc, list) and len(arb_loc) != 1:
+                raise ValueError('ArbSweepProtocol: ACC label %s' % arb_loc +
+                                 ' of recording with length != 1.')
+
+            rec_locations = cable_cell.locations(arb_loc.loc)
+            if len(rec_locations) != 1:
+                raise ValueError(
+                    'Recording %s\'s' % rec.name +
+                    ' location "%s"' % arb_loc.loc +
+                    ' is non-unique in Arbor: %s.' % rec_locations)
+
+            probes.append((arb_loc.ref if self.use_labels else arb_loc.loc,
+                           'probe-%d' % i,
+                           arb_sampling_frequency(rec)))
+
+        return simulators.ArbBatchCell(
+            cable_cell,
+            probes=probes,
+            event_generators=event_generators,
+            tstop=self.total_duration)
+
+    def batch_responses(self, traces):
+        """Return the responses from the traces of a batch cell"""
+
+        if traces is None:
+            return {recording.name: None for recording in self.recordings}
+
+        return {
+            recording.name: recording.create_response(time, value)
+            for recording, (time, value) in zip(self.recordings, traces)}
+
     def run(
             self,
             cell_model,
@@ -500,52 +909,76 @@ class ArbSweepProtocol(Protocol):
             timeout=None):
         """Instantiate protocol"""
 
-        # Export cell model to mixed JSON/ACC-format
-        with tempfile.TemporaryDirectory() as acc_dir:
-            cell_model.write_acc(acc_dir, param_values,
-                                 ext_catalogues=sim.ext_catalogues)
+        # Export cell model to mixed JSON/ACC-format in memory
+        cell_acc = cell_model.create_acc(param_values,
+                                         ext_catalogues=sim.ext_catalogues)
+        morphology_path = cell_model.morphology.morphology_path
 
-            cell_json = os.path.join(acc_dir, cell_model.name + '.json')
+        # Parse morphology and label dict before isolating, forked
+        # processes find them in the cache
+        create_acc.cache_acc_components(cell_acc, morphology_path)
 
-            # protocols are directly instantiated on Arbor cell
-            # (serialization would require representation for probes, events)
+        # protocols are directly instantiated on Arbor cell
+        # (serialization would require representation for probes, events)
 
-            if isolate is None:
-                isolate = True
+        run_kwargs = {
+            'cell_acc': cell_acc,
+            'morphology_path': morphology_path,
+            'param_values': param_values,
+            'sim': sim}
 
-            if isolate:
-                def _reduce_method(meth):
-                    """Overwrite reduce"""
-                    return (getattr, (meth.__self__, meth.__func__.__name__))
+        if isolate is None:
+            isolate = True
 
-                import copyreg
-                import types
-                copyreg.pickle(types.MethodType, _reduce_method)
-                import pebble
-                from concurrent.futures import TimeoutError
+        if isinstance(isolate, isolation.IsolationPool):
+            import pebble
+            from concurrent.futures import TimeoutError
 
-                if timeout is not None:
-                    if timeout < 0:
-                        raise ValueError("timeout should be > 0")
+            try:
+                responses = timing.collect(isolate.run(
+                    timing.isolated(self._run_func),
+                    kwargs=run_kwargs,
+                    timeout=timeout))
+            except TimeoutError:
+                logger.debug('SweepProtocol: task took longer than '
+                             'timeout, will return empty response '
+                             'for this recording')
+                responses = {recording.name:
+                             None for recording in self.recordings}
+            except pebble.ProcessExpired as e:
+                raise ArbSweepProtocolException(
+                    'Worker running Arbor Sweep Protocol crashed') from e
+        elif isolate:
+            def _reduce_method(meth):
+                """Overwrite reduce"""
+                return (getattr, (meth.__self__, meth.__func__.__name__))
+
+            import copyreg
+            import types
+            copyreg.pickle(types.MethodType, _reduce_method)
+            import pebble
+            from concurrent.futures import TimeoutError
+
+            if timeout is not None:
+                if timeout < 0:
+                    raise ValueError("timeout should be > 0")
+
+            with pebble.ProcessPool(max_workers=1, max_tasks=1) as pool:
+                tasks = pool.schedule(
+                    timing.isolated(self._run_func),
+                    kwargs=run_kwargs,
+                    timeout=timeout)
+                try:
+                    responses = timing.collect(tasks.result())
+                except TimeoutError:
+                    logger.debug('SweepProtocol: task took longer than '
+                                 'timeout, will return empty response '
+                                 'for this recording')
+                    responses = {recording.name:
+                                 None for recording in self.recordings}
+        else:
+            responses = self._run_func(**run_kwargs)
 
-                with pebble.ProcessPool(max_workers=1, max_tasks=1) as pool:
-                    tasks = pool.schedule(self._run_func, kwargs={
-                        'cell_json': cell_json,
-                        'param_values': param_values,
-                        'sim': sim},
-                        timeout=timeout)
-                    try:
-                        responses = tasks.result()
-                    except TimeoutError:
-                        logger.debug('SweepProtocol: task took longer than '
-                                     'timeout, will return empty response '
-                                     'for this recording')
-                        responses = {recording.name:
-                                     None for recording in self.recordings}
-            else:
-                responses = self._run_func(cell_json=cell_json,
-                                           param_values=param_values,
-                                           sim=sim)
         return responses
 
     def instantiate_locations(self, label_dict):
@@ -635,7 +1068,6 @@ class ArbSweepProtocol(Protocol):
     def instantiate_recordings(self, cell_model, use_labels=False):
         """Instantiate recordings"""
 
-        # Attach voltage probe sampling at 10 kHz (every 0.1 ms)
         for i, rec in enumerate(self.recordings):
             # alternatively arbor.cable_probe_membrane_voltage
             arb_loc = rec.location.acc_label()
@@ -654,8 +1086,8 @@ class ArbSweepProtocol(Protocol):
             cell_model.probe('voltage',
                              arb_loc.ref if use_labels else arb_loc.loc,
                              f"probe-{i}",
-                             # frequency could be a parameter
-                             frequency=10 * arbor.units.kHz)
+                             frequency=arb_sampling_frequency(rec) *
+                             arbor.units.kHz)
 
         return cell_model
 
@@ -675,6 +1107,231 @@ class ArbSweepProtocol(Protocol):
         return content
 
 
+class MultiArbSweepProtocol(ArbSweepProtocol):
+
+    """Arbor sweep protocols that run as the cells of one simulation
+
+    The cell model is exported to ACC once, every sweep protocol then adds
+    its stimuli and probes to its own cable cell. The cells are simulated
+    together in a single Arbor simulation (see ArbSimulator.run_batch), on
+    the threads of the Arbor context of the simulator.
+    """
+
+    def __init__(self, name=None, protocols=None):
+        """Constructor
+
+        Args:
+            name (str): name of this object
+            protocols (list of ArbSweepProtocols): sweep protocols to run
+        """
+
+        # Stimuli and recordings are the ones of the sweeps
+        Protocol.__init__(self, name)
+        self.protocols = protocols
+        self.use_labels = False
+
+    @property
+    def stimuli(self):
+        """Stimuli of all the sweeps"""
+
+        return [stimulus for protocol in self.protocols
+                for stimulus in protocol.stimuli]
+
+    @property
+    def recordings(self):
+        """Recordings of all the sweeps"""
+
+        return [recording for protocol in self.protocols
+                for recording in protocol.recordings]
+
+    def subprotocols(self):
+        """Return subprotocols"""
+
+        subprotocols = collections.OrderedDict({self.name: self})
+
+        for protocol in self.protocols:
+            subprotocols.update(protocol.subprotocols())
+
+        return subprotocols
+
+    @timing.timed('protocol.run')
+    def _run_func(self, cell_acc, morphology_path, param_values, sim=None):
+        """Run protocols"""
+
+        try:
+            batch_cells = [protocol.instantiate_acc_batch_cell(
+                cell_acc, morphology_path, sim=sim)
+                for protocol in self.protocols]
+
+            try:
+                traces = sim.run_batch(batch_cells)
+            except (RuntimeError, simulators.ArbSimulatorException):
+                logger.debug(
+                    'MultiArbSweepProtocol: Running of parameter set {%s} '
+                    'generated an exception, returning None in responses',
+                    str(param_values))
+                traces = [None] * len(self.protocols)
+
+            responses = collections.OrderedDict()
+            for protocol, cell_traces in zip(self.protocols, traces):
+                responses.update(protocol.batch_responses(cell_traces))
+
+            return responses
+        except BaseException as e:
+            raise ArbSweepProtocolException(
+                'Failed to run Arbor Multi Sweep Protocol') from e
+
+    def __str__(self):
+        """String representation"""
+
+        content = 'Multi Arbor sweep protocol %s:\n' % self.name
+
+        content += '%d sweeps:\n' % len(self.protocols)
+        for protocol in self.protocols:
+            content += '%s\n' % str(protocol)
+
+        return content
+
+
+def run_nrn_batch(runs, sim=None):
+    """Run many Neuron sweep protocols in a single Neuron simulation
+
+    Every run instantiates its own copy of the cell model and of the
+    protocol, all the copies are simulated together by one run of Neuron,
+    distributed over the threads of sim (see NrnSimulator). The mechanisms
+    have to be thread safe to use more than one thread.
+
+    With a fixed time step, the responses are the same as the ones of the
+    protocols run separately. With cvode, the cells share the variable time
+    step, which is set by the fastest dynamics of all the cells: the
+    responses are then only the same within the tolerance of cvode, and
+    are sampled at the time steps of the whole batch.
+
+    Args:
+        runs (list of tuples): the (protocol, cell_model, param_values) to run,
+            protocols are SweepProtocols with the same cvode_active and
+            without equilibration
+        sim (NrnSimulator): simulator
+
+    Returns:
+        list with the responses of every run. If the simulation fails, all
+        the responses are None
+    """
+
+    cvode_actives = set(protocol.cvode_active for protocol, _, _ in runs)
+    if len(cvode_actives) != 1:
+        raise ValueError('run_nrn_batch: protocols of a batch need to have '
+                         'the same cvode_active')
+
+    if any(protocol.equilibration is not None for protocol, _, _ in runs):
+        raise ValueError('run_nrn_batch: equilibration is not supported')
+
+    # The copies hold the Neuron objects of their cell, they are destroyed
+    # even if the instantiation of a later copy fails
+    copies = []
+    try:
+        for protocol, cell_model, param_values in runs:
+            protocol = copy.deepcopy(protocol)
+            cell_model = copy.deepcopy(cell_model)
+            cell_model.prepared_token = None
+
+            if protocol.deterministic and cell_model.mechanisms is not None:
+                for mechanism in cell_model.mechanisms:
+                    mechanism.deterministic = True
+
+            cell_model.freeze(param_values)
+            copies.append((protocol, cell_model, param_values))
+
+            cell_model.instantiate(sim=sim)
+            protocol.instantiate(sim=sim, cell_model=cell_model)
+
+        nthread = sim.nthread if sim.nthread is not None \
+            else min(len(runs), os.cpu_count() or 1)
+
+        try:
+            sim.run(
+                max(protocol.total_duration for protocol, _, _ in copies),
+                cvode_active=cvode_actives.pop(),
+                nthread=nthread)
+        except (RuntimeError, simulators.NrnSimulatorException):
+            logger.debug(
+                'run_nrn_batch: Running of batch of %d cells generated an '
+                'exception, returning None in responses', len(runs))
+            all_responses = [
+                {recording.name: None for recording in protocol.recordings}
+                for protocol, _, _ in copies]
+        else:
+            all_responses = [
+                {recording.name: _truncate_response(
+                    recording.response, protocol.total_duration)
+                 for recording in protocol.recordings}
+                for protocol, _, _ in copies]
+    finally:
+        for protocol, cell_model, param_values in copies:
+            protocol.destroy(sim=sim)
+            if cell_model.icell is not None:
+                cell_model.destroy(sim=sim)
+            cell_model.unfreeze(param_values.keys())
+
+    return all_responses
+
+
+def _truncate_response(response, tstop):
+    """Remove the samples of a time voltage response after tstop"""
+
+    if not isinstance(response, TimeVoltageResponse):
+        return response
+
+    # The time of the last step drifts by the rounding errors of the sum of
+    # the time steps, and can be slightly larger than tstop
+    time = numpy.asarray(response['time'])
+    in_run = (time <= tstop) | numpy.isclose(time, tstop, rtol=1e-9, atol=0)
+
+    if isinstance(response, ArrayTimeVoltageResponse):
+        return ArrayTimeVoltageResponse(
+            response.name,
+            response.time[in_run],
+            response.voltage[in_run],
+            dtype=response.voltage.dtype)
+
+    return TimeVoltageResponse(
+        response.name,
+        response['time'][in_run],
+        response['voltage'][in_run])
+
+
+def run_arb_batch(runs, sim=None):
+    """Run many Arbor sweep protocols in a single Arbor simulation
+
+    Every run becomes a cell of one recipe, the cells are simulated together
+    on the threads of the Arbor context of sim.
+
+    Args:
+        runs (list of tuples): the (protocol, cell_model, param_values) to run,
+            protocols are ArbSweepProtocols
+        sim (ArbSimulator): simulator
+
+    Returns:
+        list with the responses of every run. If the simulation fails, all
+        the responses are None
+    """
+
+    batch_cells = [protocol.instantiate_batch_cell(
+        cell_model, param_values, sim=sim)
+        for protocol, cell_model, param_values in runs]
+
+    try:
+        traces = sim.run_batch(batch_cells)
+    except (RuntimeError, simulators.ArbSimulatorException):
+        logger.debug(
+            'run_arb_batch: Running of batch of %d cells generated an '
+            'exception, returning None in responses', len(runs))
+        traces = [None] * len(runs)
+
+    return [protocol.batch_responses(cell_traces)
+            for (protocol, _, _), cell_traces in zip(runs, traces)]
+
+
 class SweepProtocolException(Exception):
 
     """All exceptions generated by SweepProtocol"""
@@ -22,6 +22,8 @@ Copyright (c) 2016-2020, EPFL/Blue Brain Project
 
 import logging
 
+import numpy
+
 from . import responses
 
 logger = logging.getLogger(__name__)
@@ -40,6 +42,37 @@ class Recording(object):
 
         self.name = name
 
+        # Time windows (list of (start, end) in ms) the recording stores,
+        # None to store the full recording
+        self.windows = None
+
+    def crop(self, time, voltage):
+        """Keep only the samples of time and voltage inside the windows
+
+        The first sample is always kept: eFEL interpolates the recordings on
+        a grid that starts at the first time point, so dropping it would
+        shift the grid, and change the feature values, when the time steps
+        are not regular (cvode).
+        """
+
+        if self.windows is None:
+            return time, voltage
+
+        time = numpy.asarray(time)
+        in_windows = numpy.zeros(len(time), dtype=bool)
+        in_windows[:1] = True
+        for start, end in self.windows:
+            in_windows |= (time >= start) & (time <= end)
+
+        return time[in_windows], numpy.asarray(voltage)[in_windows]
+
+    def create_response(self, time, voltage):
+        """Create the response of this recording from its time and values"""
+
+        time, voltage = self.crop(time, voltage)
+
+        return responses.TimeVoltageResponse(self.name, time, voltage)
+
 
 class CompRecording(Recording):
 
@@ -49,19 +82,39 @@ class CompRecording(Recording):
             self,
             name=None,
             location=None,
-            variable='v'):
+            variable='v',
+            array_response=False,
+            dtype=None,
+            sampling_interval=None):
         """Constructor
 
         Args:
             name (str): name of this object
             location (Location): location in the model of the recording
             variable (str): which variable to record from (e.g. 'v')
+            array_response (bool): return the response as an
+                ArrayTimeVoltageResponse, which is lighter to create and to
+                send to other processes than a TimeVoltageResponse
+            dtype (numpy.dtype): dtype of the recorded variable in an
+                ArrayTimeVoltageResponse (e.g. numpy.float32), float64 by
+                default
+            sampling_interval (float): interval (ms) at which the variable
+                is sampled. By default NEURON records at every time step
+                (an irregular trace with cvode), and Arbor at 10 kHz.
         """
 
+        if sampling_interval is not None and sampling_interval <= 0:
+            raise ValueError(
+                'CompRecording: sampling_interval has to be > 0, got %s' %
+                sampling_interval)
+
         super(CompRecording, self).__init__(
             name=name)
         self.location = location
         self.variable = variable
+        self.array_response = array_response
+        self.dtype = dtype
+        self.sampling_interval = sampling_interval
 
         self.varvector = None
         self.tvector = None
@@ -78,22 +131,50 @@ class CompRecording(Recording):
         if not self.instantiated:
             return None
 
+        if self.array_response:
+            # The vectors are destroyed with the recording, copy their data
+            return self.create_response(
+                numpy.array(self.tvector.as_numpy()),
+                numpy.array(self.varvector.as_numpy(), dtype=self.dtype))
+
+        if self.windows is not None:
+            return self.create_response(
+                self.tvector.as_numpy(), self.varvector.as_numpy())
+
         return responses.TimeVoltageResponse(self.name,
                                              self.tvector.to_python(),
                                              self.varvector.to_python())
 
+    def create_response(self, time, voltage):
+        """Create the response of this recording from its time and values"""
+
+        time, voltage = self.crop(time, voltage)
+
+        if self.array_response:
+            return responses.ArrayTimeVoltageResponse(
+                self.name, time, voltage, dtype=self.dtype)
+
+        return responses.TimeVoltageResponse(self.name, time, voltage)
+
     def instantiate(self, sim=None, icell=None):
         """Instantiate recording"""
 
         logger.debug('Adding compartment recording of %s at %s',
                      self.variable, self.location)
 
+        # With a sampling interval, cvode interpolates the variable at
+        # the sampling times
+        record_args = () if self.sampling_interval is None \
+            else (self.sampling_interval,)
+
         self.varvector = sim.neuron.h.Vector()
         seg = self.location.instantiate(sim=sim, icell=icell)
-        self.varvector.record(getattr(seg, '_ref_%s' % self.variable))
+        self.varvector.record(
+            getattr(seg, '_ref_%s' % self.variable), *record_args)
 
         self.tvector = sim.neuron.h.Vector()
-        self.tvector.record(sim.neuron.h._ref_t)  # pylint: disable=W0212
+        self.tvector.record(
+            sim.neuron.h._ref_t, *record_args)  # pylint: disable=W0212
 
         self.instantiated = True
 
@@ -20,6 +20,7 @@ Copyright (c) 2016-2020, EPFL/Blue Brain Project
 """
 
 
+import numpy
 import pandas
 
 
@@ -86,6 +87,76 @@ class TimeVoltageResponse(Response):
             self.name)
 
 
+class ArrayTimeVoltageResponse(TimeVoltageResponse):
+
+    """Response to stimulus, stored in numpy arrays
+
+    Indexing with 'time' or 'voltage' returns the arrays themselves, no
+    pandas objects are created. The voltage can be stored in single
+    precision, the time is always stored in double precision since the
+    steps of cvode are below the resolution of float32 in long simulations.
+    """
+
+    # The base classes have a __dict__ (for name), the slots only avoid
+    # the dict entries of the arrays
+    __slots__ = ('time', 'voltage')
+
+    def __init__(self, name, time=None, voltage=None, dtype=None):
+        """Constructor
+
+        Args:
+            name (str): name of this object
+            time (array of floats): time series
+            voltage (array of floats): voltage series
+            dtype (numpy.dtype): dtype in which the voltage is stored,
+                float64 by default
+        """
+
+        # TimeVoltageResponse.__init__ would build the DataFrame that this
+        # class avoids
+        Response.__init__(self, name)
+
+        self.time = numpy.asarray(
+            time if time is not None else [], dtype=numpy.float64)
+        self.voltage = numpy.asarray(
+            voltage if voltage is not None else [],
+            dtype=dtype if dtype is not None else numpy.float64)
+
+    @property
+    def response(self):
+        """Return the response as a pandas.DataFrame"""
+
+        return pandas.DataFrame({'time': self.time, 'voltage': self.voltage})
+
+    @response.setter
+    def response(self, response):
+        """Set the time and voltage from a pandas.DataFrame"""
+
+        voltage_dtype = getattr(self, 'voltage', numpy.empty(0)).dtype
+
+        if response is None:
+            self.time = numpy.empty(0)
+            self.voltage = numpy.empty(0, dtype=voltage_dtype)
+        else:
+            self.time = response['time'].to_numpy(dtype=numpy.float64)
+            self.voltage = response['voltage'].to_numpy(dtype=voltage_dtype)
+
+    def __getitem__(self, index):
+        """Return the time or voltage array"""
+
+        if index == 'time':
+            return self.time
+        elif index == 'voltage':
+            return self.voltage
+
+        raise KeyError(index)
+
+    def plot(self, axes):
+        """Plot the response"""
+
+        axes.plot(self.time, self.voltage, label='%s' % self.name)
+
+
 class TimeLFPResponse(TimeVoltageResponse):
 
     """Response to stimulus"""
@@ -2,15 +2,20 @@
 
 # pylint: disable=W0511
 
+import collections
 import ctypes
 import importlib.util
 import logging
 import os
 import pathlib
 import platform
+import time
 import warnings
 
+import numpy
+
 from bluepyopt.ephys.acc import arbor
+from bluepyopt.ephys import timing
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +30,8 @@ class NrnSimulator(object):
         cvode_minstep=None,
         random123_globalindex=None,
         mechanisms_directory=None,
+        nthread=None,
+        coreneuron=False,
     ):
         """Constructor
 
@@ -40,6 +47,17 @@ class NrnSimulator(object):
                 directory containing the mod files. If the mod files are in
                 "./data/mechanisms", then mechanisms_directory should be
                 "./data/".
+            nthread (int): number of threads over which Neuron distributes
+                the cells of batch runs (see ephys.protocols.run_nrn_batch),
+                by default one per cell, up to the number of CPUs
+            coreneuron (bool): run the simulations with the CPU engine of
+                CoreNEURON, the recordings are transferred back to Neuron.
+                CoreNEURON only integrates with a fixed time step,
+                cvode_active is set to False, and runs that ask for cvode
+                (e.g. protocols with cvode_active) use the fixed time step
+                dt, with a warning. The mechanisms have to be compiled with
+                nrnivmodl -coreneuron, in mechanisms_directory or in the
+                directory given by the CORENEURONLIB environment variable.
         """
 
         # hoc.so does not exist on NEURON Windows or MacOS
@@ -53,12 +71,15 @@ class NrnSimulator(object):
 
         self.cvode_minstep_value = cvode_minstep
 
-        self.cvode_active = cvode_active
+        self.coreneuron = coreneuron
+        self.cvode_active = cvode_active and not coreneuron
 
         self.initialize()
 
         self.random123_globalindex = random123_globalindex
 
+        self.nthread = nthread
+
     @property
     def cvode(self):
         """Return cvode instance"""
@@ -121,14 +142,40 @@ class NrnSimulator(object):
         self.neuron.h.dt = self.dt
         self.neuron.h.cvode_active(1 if self.cvode_active else 0)
 
+    @timing.timed('simulator.run')
     def run(
         self,
         tstop=None,
         dt=None,
         cvode_active=None,
         random123_globalindex=None,
+        initial_state=None,
+        save_state=False,
+        nthread=None,
     ):
-        """Run protocol"""
+        """Run protocol
+
+        Args:
+            tstop (float): duration of the simulation
+            dt (float): time step, when not using cvode
+            cvode_active (bool): use the variable time step integration
+                method, by default the one of the simulator
+            random123_globalindex (int): global index of the Random123
+                random number generators
+            initial_state (neuron.h.SaveState): state, saved by an earlier
+                run with save_state, from which the simulation starts at
+                t=0, instead of starting from the initial conditions of
+                the mechanisms. Events still in the queue of the saved state
+                are not supported.
+            save_state (bool): save and return the state at the end of the
+                simulation
+            nthread (int): number of threads over which the cells are
+                distributed during this run, by default the threads of
+                Neuron are not changed
+
+        Returns:
+            neuron.h.SaveState with the final state if save_state is True
+        """
 
         self.neuron.h.tstop = tstop
 
@@ -141,6 +188,17 @@ class NrnSimulator(object):
         if cvode_active is None:
             cvode_active = self.cvode_active
 
+        if self.coreneuron:
+            if cvode_active:
+                warnings.warn(
+                    "NrnSimulator: cvode_active is not supported with "
+                    "CoreNEURON, running with the fixed time step dt")
+                cvode_active = False
+            if initial_state is not None or save_state:
+                raise ValueError(
+                    "NrnSimulator: saved states are not supported with "
+                    "CoreNEURON")
+
         if not cvode_active and dt is None:  # use dt of simulator
             if self.neuron.h.dt != self.dt:
                 raise Exception(
@@ -173,16 +231,87 @@ class NrnSimulator(object):
             rng = self.neuron.h.Random()
             rng.Random123_globalindex(random123_globalindex)
 
+        if nthread is not None:
+            parallel_context = self.neuron.h.ParallelContext()
+            previous_nthread = int(parallel_context.nthread())
+            parallel_context.nthread(nthread)
+
         try:
-            self.neuron.h.run()
+            if self.coreneuron:
+                self._run_coreneuron(tstop)
+            elif initial_state is None:
+                self.neuron.h.run()
+            else:
+                self._run_from_state(initial_state, tstop)
         except Exception as e:
             raise NrnSimulatorException("Neuron simulator error", e)
+        finally:
+            if nthread is not None:
+                parallel_context.nthread(previous_nthread)
+
+        state = None
+        if save_state:
+            state = self.neuron.h.SaveState()
+            state.save()
 
         if self.cvode_minstep_value is not None:
             self.cvode_minstep = save_minstep
 
         logger.debug("Neuron simulation finished")
 
+        return state
+
+    def _run_coreneuron(self, tstop):
+        """Initialise in Neuron, and run until tstop with CoreNEURON"""
+
+        from neuron import coreneuron
+
+        # CoreNEURON loads the mechanisms compiled for it from CORENEURONLIB
+        # or from x86_64 in the current directory. CORENEURONLIB is only set
+        # for the duration of the run.
+        library = None
+        if self.mechanisms_directory is not None and \
+                'CORENEURONLIB' not in os.environ:
+            library = os.path.join(
+                self.mechanisms_directory,
+                platform.machine(),
+                'libcorenrnmech.so')
+            if not os.path.exists(library):
+                library = None
+
+        # CoreNEURON copies the model in the layout of cache_efficient
+        cache_efficient = self.neuron.h.cvode.cache_efficient()
+        self.neuron.h.cvode.cache_efficient(1)
+        self.neuron.h.stdinit()
+
+        coreneuron.enable = True
+        coreneuron.verbose = 0
+        try:
+            if library is not None:
+                os.environ['CORENEURONLIB'] = library
+            self.neuron.h.ParallelContext().psolve(tstop)
+        finally:
+            if library is not None:
+                del os.environ['CORENEURONLIB']
+            coreneuron.enable = False
+            self.neuron.h.cvode.cache_efficient(cache_efficient)
+
+    def _run_from_state(self, initial_state, tstop):
+        """Restore initial_state at t=0, and run until tstop"""
+
+        self.neuron.h.stdinit()
+        initial_state.restore()
+
+        # The saved state contains the time at which it was saved
+        self.neuron.h.t = 0.0
+        if self.neuron.h.cvode.active():
+            self.neuron.h.cvode.re_init()
+        else:
+            self.neuron.h.fcurrent()
+        self.neuron.h.frecord_init()
+
+        self.neuron.h.continuerun(tstop)
+
 
 class NrnSimulatorException(Exception):
     """All exception generated by Neuron simulator"""
@@ -300,20 +429,64 @@ class LFPySimulatorException(Exception):
         self.original = original
 
 
+# Merged mechanism catalogues of this process, per external catalogues
+_arb_catalogue_cache = {}
+
+
 class ArbSimulator(object):
     """Arbor simulator"""
 
-    def __init__(self, dt=None, ext_catalogues=None):
+    # Spatial discretisations from fast and coarse to slow and accurate
+    CV_POLICY_PRESETS = collections.OrderedDict([
+        ('coarse', '(fixed-per-branch 1)'),
+        ('medium', '(max-extent 40)'),
+        ('fine', '(max-extent 10)'),
+        ('finest', '(max-extent 1)'),
+    ])
+
+    def __init__(
+            self,
+            dt=None,
+            ext_catalogues=None,
+            threads=None,
+            cpu_group_size=None,
+            cv_policy=None,
+            nseg_frequency=40):
         """Constructor
 
         Args:
             dt (float): the integration time step used by Arbor.
             ext_catalogues (): Name to path mapping of non-Arbor built-in
             NMODL mechanism catalogues compiled with modcc
+            threads (int): number of threads of the Arbor execution context
+                of batch simulations, by default the number of CPUs
+            cpu_group_size (int): number of cells per cell group in the
+                domain decomposition of batch simulations, by default every
+                cell is in its own group
+            cv_policy (str): spatial discretisation of the cells, either
+                the name of one of the CV_POLICY_PRESETS, 'nseg' for the
+                compartments NEURON uses with nseg_frequency, or an Arbor
+                CV policy expression. By default Arbor's default policy.
+            nseg_frequency (float): length of the compartments with the
+                'nseg' policy, as in ephys.morphologies.NrnFileMorphology
         """
 
         self.dt = dt
         self.ext_catalogues = ext_catalogues
+        self.threads = threads
+        self.cpu_group_size = cpu_group_size
+        self._context = None
+        self._context_pid = None
+
+        if cv_policy is not None and cv_policy != 'nseg' and \
+                cv_policy not in self.CV_POLICY_PRESETS and \
+                not cv_policy.startswith('('):
+            raise ValueError(
+                'ArbSimulator: cv_policy %s is not a preset, nseg or a CV '
+                'policy expression' % cv_policy)
+        self.cv_policy = cv_policy
+        self.nseg_frequency = nseg_frequency
+
         if ext_catalogues is not None:
             for cat, cat_path in ext_catalogues.items():
                 cat_lib = "%s-catalogue.so" % cat
@@ -325,49 +498,158 @@ class ArbSimulator(object):
                         + " mechanism catalogue with modcc:"
                         + " arbor-build-catalogue %s %s" % (cat, cat_path)
                     )
-        # TODO: add parameters for discretization
 
     def initialize(self):
         """Initialize simulator"""
         pass
 
-    def instantiate(self, morph, decor, labels):
-        cable_cell = arbor.cable_cell(
-            morphology=morph, decor=decor, labels=labels
-        )
+    def __getstate__(self):
+        """Arbor execution contexts are not sent to other processes"""
 
-        arb_cell_model = arbor.single_cell_model(cable_cell)
+        state = self.__dict__.copy()
+        state['_context'] = None
+        state['_context_pid'] = None
 
-        # Add catalogues with explicit qualifiers
-        arb_cell_model.properties.catalogue = arbor.catalogue()
+        return state
+
+    @property
+    def context(self):
+        """Arbor execution context, created once per process"""
+
+        # The threads of a context do not survive a fork
+        if self._context is None or self._context_pid != os.getpid():
+            threads = self.threads if self.threads is not None \
+                else os.cpu_count() or 1
+            self._context = arbor.context(threads=threads)
+            self._context_pid = os.getpid()
+
+        return self._context
+
+    def partition_hints(self):
+        """Return the partition hints of the domain decomposition"""
+
+        if self.cpu_group_size is None:
+            return {}
+
+        return {arbor.cell_kind.cable: arbor.partition_hint(
+            cpu_group_size=self.cpu_group_size)}
+
+    def catalogue(self):
+        """Return the mechanism catalogue with explicit qualifiers
+
+        The catalogue is built once per process and external catalogues.
+        """
+
+        if self.ext_catalogues is None:
+            cache_key = None
+        else:
+            cache_key = tuple(sorted(
+                (cat, str(pathlib.Path(cat_path).resolve()))
+                for cat, cat_path in self.ext_catalogues.items()))
+
+        if cache_key not in _arb_catalogue_cache:
+            _arb_catalogue_cache[cache_key] = self._build_catalogue()
+
+        return _arb_catalogue_cache[cache_key]
+
+    def _build_catalogue(self):
+        """Build the mechanism catalogue"""
+
+        catalogue = arbor.catalogue()
 
         # User-supplied catalogues take precedence
         if self.ext_catalogues is not None:
             for cat, cat_path in self.ext_catalogues.items():
                 cat_lib = "%s-catalogue.so" % cat
                 cat_path = pathlib.Path(cat_path).resolve()
-                arb_cell_model.properties.catalogue.extend(
+                catalogue.extend(
                     arbor.load_catalogue(cat_path / cat_lib), cat + "::"
                 )
 
         # Built-in catalogues are always added (could be made optional)
         if self.ext_catalogues is None or "default" not in self.ext_catalogues:
-            arb_cell_model.properties.catalogue.extend(
-                arbor.default_catalogue(), "default::"
-            )
+            catalogue.extend(arbor.default_catalogue(), "default::")
 
         if self.ext_catalogues is None or "BBP" not in self.ext_catalogues:
-            arb_cell_model.properties.catalogue.extend(
-                arbor.bbp_catalogue(), "BBP::"
-            )
+            catalogue.extend(arbor.bbp_catalogue(), "BBP::")
 
         if self.ext_catalogues is None or "allen" not in self.ext_catalogues:
-            arb_cell_model.properties.catalogue.extend(
-                arbor.allen_catalogue(), "allen::"
-            )
+            catalogue.extend(arbor.allen_catalogue(), "allen::")
+
+        return catalogue
+
+    @staticmethod
+    def branch_length(morph, branch):
+        """Return the length of a branch of an Arbor morphology"""
+
+        return sum(
+            numpy.linalg.norm([segment.dist.x - segment.prox.x,
+                               segment.dist.y - segment.prox.y,
+                               segment.dist.z - segment.prox.z])
+            for segment in morph.branch_segments(branch))
+
+    @staticmethod
+    def nseg_cv_policy(morph, nseg_frequency=40):
+        """Return the CV policy equivalent to the nseg of NEURON
+
+        Every branch gets the 1 + 2 * int(length / nseg_frequency)
+        compartments that NrnFileMorphology.set_nseg gives its sections.
+        """
+
+        policies = [
+            '(fixed-per-branch %d (branch %d))' % (
+                1 + 2 * int(ArbSimulator.branch_length(morph, branch) /
+                            nseg_frequency), branch)
+            for branch in range(morph.num_branches)]
+
+        if len(policies) == 1:
+            return policies[0]
+
+        return '(join %s)' % ' '.join(policies)
+
+    def cv_policy_expression(self, morph):
+        """Return the CV policy expression of a morphology
+
+        Returns None for Arbor's default policy.
+        """
+
+        if self.cv_policy is None:
+            return None
+        elif self.cv_policy == 'nseg':
+            return self.nseg_cv_policy(morph, self.nseg_frequency)
+        else:
+            return self.CV_POLICY_PRESETS.get(self.cv_policy, self.cv_policy)
+
+    def cable_cell(self, morph, decor, labels):
+        """Create a cable cell with the CV policy of the simulator"""
+
+        cv_policy = self.cv_policy_expression(morph)
+
+        if cv_policy is None:
+            return arbor.cable_cell(
+                morphology=morph, decor=decor, labels=labels)
+
+        # Arbor < 0.11 sets the policy on the decor
+        if hasattr(decor, 'discretization'):
+            decor.discretization(arbor.cv_policy(cv_policy))
+            return arbor.cable_cell(
+                morphology=morph, decor=decor, labels=labels)
+
+        return arbor.cable_cell(
+            morphology=morph, decor=decor, labels=labels,
+            discretization=arbor.cv_policy(cv_policy))
+
+    def instantiate(self, morph, decor, labels):
+        cable_cell = self.cable_cell(morph, decor, labels)
+
+        arb_cell_model = arbor.single_cell_model(cable_cell)
+
+        # Add catalogues with explicit qualifiers
+        arb_cell_model.properties.catalogue = self.catalogue()
 
         return arb_cell_model
 
+    @timing.timed('simulator.run')
     def run(self, arb_cell_model, tstop=None, dt=None):
         dt = dt if dt is not None else self.dt
 
@@ -378,6 +660,220 @@ class ArbSimulator(object):
         else:
             return arb_cell_model.run(tfinal=tstop * arbor.units.ms)
 
+    @timing.timed('simulator.run')
+    def run_batch(self, batch_cells, dt=None):
+        """Run many cells in a single Arbor simulation
+
+        The cells are independent, they are distributed over the threads of
+        the Arbor context of the simulator. The simulation runs until the
+        largest tstop of the cells, the samples of every cell are cut at its
+        own tstop.
+
+        Args:
+            batch_cells (list of ArbBatchCell): cells to simulate
+            dt (float): time step, by default the one of the simulator
+
+        Returns:
+            list with, for every cell, the list of (time, value) numpy
+            arrays of its probes
+        """
+
+        dt = dt if dt is not None else self.dt
+
+        properties = arbor.neuron_cable_properties()
+        properties.catalogue = self.catalogue()
+
+        recipe = _arb_batch_recipe_class()(batch_cells, properties)
+
+        domains = arbor.partition_load_balance(
+            recipe, self.context, self.partition_hints())
+        simulation = arbor.simulation(recipe, self.context, domains)
+
+        handles = [
+            [simulation.sample(
+                (gid, tag),
+                arbor.regular_schedule((1.0 / frequency) * arbor.units.ms))
+             for tag, frequency in zip(batch_cell.probe_tags,
+                                       batch_cell.probe_frequencies)]
+            for gid, batch_cell in enumerate(batch_cells)]
+
+        tstop = max(batch_cell.tstop for batch_cell in batch_cells)
+        if dt is not None:
+            simulation.run(tfinal=tstop * arbor.units.ms,
+                           dt=dt * arbor.units.ms)
+        else:
+            simulation.run(tfinal=tstop * arbor.units.ms)
+
+        traces = []
+        for batch_cell, cell_handles in zip(batch_cells, handles):
+            cell_traces = []
+            for handle in cell_handles:
+                data, _ = simulation.samples(handle)[0]
+                data = data[data[:, 0] < batch_cell.tstop]
+                cell_traces.append((data[:, 0], data[:, 1]))
+            traces.append(cell_traces)
+
+        return traces
+
+
+def benchmark_cv_policies(
+        protocol,
+        cell_model,
+        param_values,
+        cv_policies=None,
+        reference='finest',
+        repeat=1,
+        **sim_kwargs):
+    """Compare the speed and accuracy of Arbor CV policies
+
+    The protocol is run without isolation with every CV policy, the voltage
+    traces are compared with those of the reference policy, which should be
+    the finest discretisation.
+
+    Args:
+        protocol (ArbSweepProtocol): protocol to run
+        cell_model (CellModel): cell model
+        param_values (dict): parameter values of the cell
+        cv_policies (list of str): CV policies (see ArbSimulator), by
+            default the presets and 'nseg'
+        reference (str): CV policy of the reference traces
+        repeat (int): number of runs per CV policy, the fastest is reported
+        sim_kwargs: other arguments of the ArbSimulators
+
+    Returns:
+        OrderedDict with for every CV policy the run time (in s), and the
+        root mean square and maximum absolute difference (in mV) with the
+        reference traces over all recordings
+    """
+
+    if cv_policies is None:
+        cv_policies = list(ArbSimulator.CV_POLICY_PRESETS) + ['nseg']
+
+    def run(cv_policy):
+        sim = ArbSimulator(cv_policy=cv_policy, **sim_kwargs)
+        durations = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            responses = protocol.run(
+                cell_model, param_values, sim=sim, isolate=False)
+            durations.append(time.perf_counter() - start)
+
+        return min(durations), responses
+
+    _, reference_responses = run(reference)
+
+    results = collections.OrderedDict()
+    for cv_policy in cv_policies:
+        duration, responses = run(cv_policy)
+
+        errors = []
+        for name, reference_response in reference_responses.items():
+            reference_time = numpy.asarray(reference_response['time'])
+            voltage = numpy.interp(
+                reference_time,
+                numpy.asarray(responses[name]['time']),
+                numpy.asarray(responses[name]['voltage']))
+            errors.append(
+                voltage - numpy.asarray(reference_response['voltage']))
+        errors = numpy.concatenate(errors)
+
+        results[cv_policy] = {
+            'time': duration,
+            'rms_error': float(numpy.sqrt(numpy.mean(errors ** 2))),
+            'max_error': float(numpy.max(numpy.abs(errors)))}
+
+    return results
+
+
+class ArbBatchCell(object):
+
+    """Cable cell of a batch simulation, with its probes and events"""
+
+    def __init__(
+            self,
+            cable_cell,
+            probes=None,
+            event_generators=None,
+            tstop=None,
+            frequency=10.0):
+        """Constructor
+
+        Args:
+            cable_cell (arbor.cable_cell): the cell
+            probes (list of tuples): location, tag and optionally the
+                sampling frequency (kHz) of the voltage probes
+            event_generators (list of arbor.event_generator): events sent
+                to the synapses of the cell
+            tstop (float): duration of the simulation of the cell (ms)
+            frequency (float): sampling frequency of the probes without
+                their own (kHz)
+        """
+
+        self.cable_cell = cable_cell
+        self.probes = probes if probes is not None else []
+        self.event_generators = event_generators \
+            if event_generators is not None else []
+        self.tstop = tstop
+        self.frequency = frequency
+
+    @property
+    def probe_tags(self):
+        """Tags of the probes"""
+
+        return [probe[1] for probe in self.probes]
+
+    @property
+    def probe_frequencies(self):
+        """Sampling frequencies of the probes (kHz)"""
+
+        return [probe[2] if len(probe) > 2 else self.frequency
+                for probe in self.probes]
+
+
+_arb_batch_recipe = None
+
+
+def _arb_batch_recipe_class():
+    """Return the recipe class of batch simulations
+
+    The class is only created when needed, arbor is an optional dependency.
+    """
+
+    global _arb_batch_recipe
+
+    if _arb_batch_recipe is None:
+        class ArbBatchRecipe(arbor.recipe):
+
+            """Recipe of independent cells of a batch simulation"""
+
+            def __init__(self, batch_cells, properties):
+                arbor.recipe.__init__(self)
+                self.batch_cells = batch_cells
+                self.properties = properties
+
+            def num_cells(self):
+                return len(self.batch_cells)
+
+            def cell_kind(self, gid):
+                return arbor.cell_kind.cable
+
+            def cell_description(self, gid):
+                return self.batch_cells[gid].cable_cell
+
+            def probes(self, gid):
+                return [arbor.cable_probe_membrane_voltage(probe[0], probe[1])
+                        for probe in self.batch_cells[gid].probes]
+
+            def event_generators(self, gid):
+                return self.batch_cells[gid].event_generators
+
+            def global_properties(self, kind):
+                return self.properties
+
+        _arb_batch_recipe = ArbBatchRecipe
+
+    return _arb_batch_recipe
+
 
 class ArbSimulatorException(Exception):
     """All exception generated by Arbor simulator"""
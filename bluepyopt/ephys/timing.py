@@ -0,0 +1,241 @@
+"""Timing of the phases of the evaluation pipeline"""
+
+"""
+Copyright (c) 2016-2020, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+# Stack of the records of the evaluations being timed, per thread
+_local = threading.local()
+
+# Totals of the evaluations finished in this process
+_totals = {}
+_totals_lock = threading.Lock()
+
+
+def recording():
+    """Return True if the phases are timed in the current thread"""
+
+    return bool(getattr(_local, 'stack', None))
+
+
+def _add(record, phase_name, duration, count=1):
+    """Add the duration of a phase to a record"""
+
+    total = record.setdefault(phase_name, [0.0, 0])
+    total[0] += duration
+    total[1] += count
+
+
+def merge(record):
+    """Add a record to the current evaluation, or to the process totals"""
+
+    stack = getattr(_local, 'stack', None)
+
+    if stack:
+        for phase_name, (duration, count) in record.items():
+            _add(stack[-1], phase_name, duration, count)
+    else:
+        with _totals_lock:
+            for phase_name, (duration, count) in record.items():
+                _add(_totals, phase_name, duration, count)
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Time a phase of the current evaluation
+
+    Does nothing when no evaluation is being timed. Phases can be nested,
+    the time of a phase includes the time of its nested phases.
+    """
+
+    stack = getattr(_local, 'stack', None)
+
+    if not stack:
+        yield
+        return
+
+    record = stack[-1]
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add(record, name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator that times every call of a function as a phase"""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not getattr(_local, 'stack', None):
+                return function(*args, **kwargs)
+
+            with phase(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def write_record(timing_file, label, record):
+    """Append a record as a line of json to timing_file"""
+
+    line = json.dumps({
+        'label': label,
+        'pid': os.getpid(),
+        'timings': record}) + '\n'
+
+    # A single write of one line, concurrent processes can share the file
+    with open(timing_file, 'a') as timing_fh:
+        timing_fh.write(line)
+
+
+@contextlib.contextmanager
+def evaluation(label=None, timing_file=None):
+    """Time the phases of an evaluation
+
+    When the evaluation is finished, its record is added to the enclosing
+    evaluation if there is one, otherwise to the totals of the process.
+
+    Args:
+        label (str): label of the evaluation in timing_file
+        timing_file (str): path of the file to which the record of the
+            evaluation is appended (None means the record is not written)
+    """
+
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+
+    record = {}
+    _local.stack.append(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        _local.stack.pop()
+        _add(record, 'evaluation', time.perf_counter() - start)
+        merge(record)
+
+        if timing_file is not None:
+            write_record(timing_file, label, record)
+
+
+class _IsolatedResult(object):
+
+    """Result of a function run in another process, with its timings"""
+
+    def __init__(self, value, record):
+        self.value = value
+        self.record = record
+
+
+class _IsolatedCall(object):
+
+    """Function run in another process that sends back its timings"""
+
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self, *args, **kwargs):
+        old_stack = getattr(_local, 'stack', None)
+        _local.stack = [{}]
+        try:
+            value = self.function(*args, **kwargs)
+        finally:
+            record = _local.stack.pop()
+            _local.stack = old_stack
+
+        return _IsolatedResult(value, record)
+
+
+def isolated(function):
+    """Wrap a function that is run in another process
+
+    If the current evaluation is timed, the phases of the function in the
+    other process are sent back with its result, and are added to the
+    current evaluation by collect.
+    """
+
+    if not recording():
+        return function
+
+    return _IsolatedCall(function)
+
+
+def collect(result):
+    """Return the result of an isolated function, merge its timings"""
+
+    if isinstance(result, _IsolatedResult):
+        merge(result.record)
+        return result.value
+
+    return result
+
+
+def _summarise(totals):
+    """Add the mean duration to totals"""
+
+    return {phase_name: {
+        'total': duration,
+        'count': count,
+        'mean': duration / count if count else 0.0}
+        for phase_name, (duration, count) in totals.items()}
+
+
+def summary():
+    """Return the timings of the evaluations finished in this process
+
+    Returns:
+        dict with for every phase the total duration (in s), the number of
+        times it was run, and the mean duration
+    """
+
+    with _totals_lock:
+        return _summarise(_totals)
+
+
+def reset():
+    """Remove the timings of the evaluations finished in this process"""
+
+    with _totals_lock:
+        _totals.clear()
+
+
+def read_timing_file(timing_file):
+    """Return the summary of all the evaluations in a timing file"""
+
+    totals = {}
+
+    with open(timing_file) as timing_fh:
+        for line in timing_fh:
+            if not line.strip():
+                continue
+            record = json.loads(line)['timings']
+            for phase_name, (duration, count) in record.items():
+                _add(totals, phase_name, duration, count)
+
+    return _summarise(totals)
@@ -60,6 +60,23 @@ def test_DEAPOptimisation_run():
     numpy.testing.assert_almost_equal(hist.genealogy_history[1], ind)
 
 
+@pytest.mark.unit
+def test_DEAPOptimisation_run_split_protocols():
+    "deapext.optimisation: Testing DEAPOptimisation run with split protocols"
+
+    simplecell = bluepyopt.ephys.examples.simplecell.SimpleCell()
+    optimisation = bluepyopt.optimisations.DEAPOptimisation(
+        simplecell.cell_evaluator, offspring_size=2, split_protocols=True)
+
+    pop, hof, log, hist = optimisation.run(max_ngen=1)
+
+    assert log[0]['nevals'] == 2
+    for ind in pop:
+        numpy.testing.assert_almost_equal(
+            ind.fitness.values,
+            simplecell.cell_evaluator.evaluate_with_lists(list(ind)))
+
+
 @pytest.mark.unit
 def test_DEAPOptimisation_run_from_parents():
     "deapext.optimisation: Testing DEAPOptimisation run using prior parents"
@@ -571,6 +571,41 @@ def test_cell_model_write_and_read_acc():
     run_short_sim(cable_cell)
 
 
+@pytest.mark.unit
+def test_cell_model_create_and_load_acc():
+    """ephys.create_acc: Test load_acc against write_acc and read_acc"""
+    cell = make_cell(replace_axon=False)
+    param_values = {"gnabar_hh": 0.1, "gkbar_hh": 0.03}
+
+    with tempfile.TemporaryDirectory() as acc_dir:
+        cell.write_acc(acc_dir, param_values)
+        cell_json, arb_morph, arb_decor, arb_labels = create_acc.read_acc(
+            pathlib.Path(acc_dir).joinpath(cell.name + ".json")
+        )
+
+    cell_acc = cell.create_acc(param_values)
+    loaded_json, loaded_morph, loaded_decor, loaded_labels = \
+        create_acc.load_acc(cell_acc, cell.morphology.morphology_path)
+
+    assert loaded_json == cell_json
+    assert loaded_morph.num_branches == arb_morph.num_branches
+    assert dict(loaded_labels.items()) == dict(arb_labels.items())
+    assert str(loaded_decor.paintings()) == str(arb_decor.paintings())
+
+    # Morphology is parsed once, label dict is copied for every call
+    _, other_morph, _, other_labels = create_acc.load_acc(
+        cell.create_acc({"gnabar_hh": 0.2, "gkbar_hh": 0.01}),
+        cell.morphology.morphology_path,
+    )
+    assert other_morph is loaded_morph
+    assert other_labels is not loaded_labels
+
+    cable_cell = arbor.cable_cell(
+        morphology=loaded_morph, decor=loaded_decor, labels=loaded_labels
+    )
+    run_short_sim(cable_cell)
+
+
 @pytest.mark.unit
 def test_cell_model_write_and_read_acc_replace_axon():
     """ephys.create_acc: Test write_acc and read_acc w/ axon replacement"""
@@ -3,6 +3,7 @@
 # pylint: disable=R0914
 
 import os
+from unittest import mock
 
 
 import pytest
@@ -128,3 +129,777 @@ def test_CellEvaluator_evaluate():
     numpy.testing.assert_almost_equal(
         feature_value, feature_value_eva['singleton']
     )
+
+
+@pytest.mark.unit
+def test_CellEvaluator_prepare_cell():
+    """ephys.evaluators: Test CellEvaluator with prepare_cell"""
+    from bluepyopt.ephys.examples.simplecell import SimpleCell
+
+    simplecell = SimpleCell()
+    evaluator = simplecell.cell_evaluator
+    param_values = [0.1, 0.03]
+    expected_scores = evaluator.evaluate_with_lists(param_values)
+    expected_values = evaluator.evaluate_with_lists(
+        param_values, target='values')
+
+    prepared_evaluator = ephys.evaluators.CellEvaluator(
+        cell_model=evaluator.cell_model,
+        param_names=evaluator.param_names,
+        fitness_protocols=evaluator.fitness_protocols,
+        fitness_calculator=evaluator.fitness_calculator,
+        sim=evaluator.sim,
+        prepare_cell=True)
+
+    for isolate in [True, False]:
+        prepared_evaluator.isolate_protocols = isolate
+        numpy.testing.assert_almost_equal(
+            prepared_evaluator.evaluate_with_lists(param_values),
+            expected_scores)
+        numpy.testing.assert_almost_equal(
+            prepared_evaluator.evaluate_with_lists(
+                param_values, target='values'),
+            expected_values)
+        assert evaluator.cell_model.prepared
+
+    evaluator.cell_model.unprepare(sim=evaluator.sim)
+
+
+class _RecordingMap(object):
+
+    """map_function that records the tasks it maps"""
+
+    def __init__(self):
+        self.tasks = []
+
+    def __call__(self, function, tasks):
+        tasks = list(tasks)
+        self.tasks.extend(tasks)
+        return map(function, tasks)
+
+
+@pytest.fixture
+def two_step_simplecell():
+    """Simplecell evaluator with a second step protocol, and a _RecordingMap
+
+    Step1 makes the first individual of the tests, [0.1, 0.03], spike, but
+    not the second one, [0.06, 0.065].
+    """
+    from bluepyopt.ephys.examples.simplecell import SimpleCell
+
+    simplecell = SimpleCell()
+    evaluator = simplecell.cell_evaluator
+
+    step2 = ephys.protocols.SweepProtocol(
+        'Step2',
+        [ephys.stimuli.NrnSquarePulse(
+            step_amplitude=0.05,
+            step_delay=100,
+            step_duration=50,
+            location=simplecell.soma_loc,
+            total_duration=200)],
+        [ephys.recordings.CompRecording(
+            name='Step2.soma.v',
+            location=simplecell.soma_loc,
+            variable='v')])
+    evaluator.fitness_protocols['Step2'] = step2
+    evaluator.fitness_calculator.objectives.append(
+        ephys.objectives.SingletonObjective(
+            'Step2.Spikecount',
+            ephys.efeatures.eFELFeature(
+                'Step2.Spikecount',
+                efel_feature_name='Spikecount',
+                recording_names={'': 'Step2.soma.v'},
+                stim_start=100,
+                stim_end=150,
+                exp_mean=5.0,
+                exp_std=0.05)))
+
+    return evaluator, _RecordingMap()
+
+
+@pytest.mark.unit
+def test_CellEvaluator_evaluate_population(two_step_simplecell):
+    """ephys.evaluators: Test CellEvaluator evaluate_population"""
+
+    evaluator, recording_map = two_step_simplecell
+    param_lists = [[0.1, 0.03], [0.06, 0.065], [0.12, 0.01]]
+    param_dicts = [evaluator.param_dict(param_list)
+                   for param_list in param_lists]
+
+    def reversed_map(function, tasks):
+        """Map that runs the tasks in reverse order"""
+        tasks = list(tasks)
+        return reversed([function(task) for task in reversed(tasks)])
+
+    for target in ['scores', 'values']:
+        expected = [evaluator.evaluate_with_lists(param_list, target=target)
+                    for param_list in param_lists]
+        for map_function in [recording_map, reversed_map]:
+            objective_lists = evaluator.evaluate_population(
+                param_lists, target=target, map_function=map_function)
+            numpy.testing.assert_almost_equal(objective_lists, expected)
+
+        # One task per protocol of every individual, in order
+        assert recording_map.tasks == [
+            (param_dict, protocol_name) for param_dict in param_dicts
+            for protocol_name in ['Step1', 'Step2']]
+        recording_map.tasks.clear()
+
+    pytest.raises(Exception, evaluator.evaluate_population, param_lists,
+                  target='wrong')
+
+
+@pytest.mark.unit
+def test_CellEvaluator_stages(two_step_simplecell):
+    """ephys.evaluators: Test CellEvaluator with evaluation stages"""
+
+    evaluator, recording_map = two_step_simplecell
+    # First individual spikes in Step1, second one doesn't
+    param_lists = [[0.1, 0.03], [0.06, 0.065]]
+    expected_scores = [evaluator.evaluate_with_lists(param_list)
+                       for param_list in param_lists]
+    assert expected_scores[0][0] < 10.0 < expected_scores[1][0]
+
+    evaluator.stages = [(['Step1'], 10.0)]
+    assert evaluator.evaluation_stages() == [
+        (['Step1'], 10.0), (['Step2'], None)]
+    assert evaluator.evaluation_stages(target='values') == [
+        (['Step1', 'Step2'], None)]
+
+    for scores in [
+            [evaluator.evaluate_with_lists(param_list)
+             for param_list in param_lists],
+            evaluator.evaluate_population(
+                param_lists, map_function=recording_map)]:
+        numpy.testing.assert_almost_equal(scores[0], expected_scores[0])
+        numpy.testing.assert_almost_equal(
+            scores[1], [expected_scores[1][0], 250])
+
+    # Step1 runs for all the individuals before Step2, which was not run
+    # for the second individual
+    param_dicts = [evaluator.param_dict(param_list)
+                   for param_list in param_lists]
+    assert recording_map.tasks == [
+        (param_dicts[0], 'Step1'), (param_dicts[1], 'Step1'),
+        (param_dicts[0], 'Step2')]
+
+    # The scores of Step1 calculated for the stage threshold are reused
+    calculate_efel = ephys.efeatures.calculate_population_efel_features
+    with mock.patch.object(
+            ephys.efeatures, 'calculate_population_efel_features',
+            wraps=calculate_efel) as calculate_efel_mock:
+        for scores in [
+                [evaluator.evaluate_with_lists(param_list)
+                 for param_list in param_lists],
+                evaluator.evaluate_population(param_lists)]:
+            numpy.testing.assert_almost_equal(scores[0], expected_scores[0])
+            numpy.testing.assert_almost_equal(
+                scores[1], [expected_scores[1][0], 250])
+    assert set(feature.name for call in calculate_efel_mock.call_args_list
+               for feature in call.args[0]) == {'Step2.Spikecount'}
+
+    # The recordings of the features follow their somatic_recording_name
+    class SomaticFeature(object):
+        name = 'Step1.somatic'
+        somatic_recording_name = 'Step1.soma.v'
+
+        def calculate_score(self, responses):
+            return 100.0
+
+    evaluator.fitness_calculator.objectives.append(
+        ephys.objectives.SingletonObjective(
+            'Step1.somatic', SomaticFeature()))
+    responses = {'Step1.soma.v': None}
+    assert evaluator.stage_scores(responses) == {
+        'Step1.Spikecount': 250.0, 'Step1.somatic': 100.0}
+    assert evaluator.stage_scores({}) == {}
+    stage_scores = {'Step1.Spikecount': 1.0}
+    assert evaluator.stage_failed(responses, 10.0, scores=stage_scores)
+    assert stage_scores == {'Step1.Spikecount': 1.0, 'Step1.somatic': 100.0}
+
+    pytest.raises(
+        ValueError,
+        ephys.evaluators.CellEvaluator,
+        cell_model=evaluator.cell_model,
+        param_names=evaluator.param_names,
+        fitness_protocols=evaluator.fitness_protocols,
+        fitness_calculator=evaluator.fitness_calculator,
+        sim=evaluator.sim,
+        stages=[(['Step3'], 10.0)])
+
+
+@pytest.mark.unit
+def test_CellEvaluator_cache(two_step_simplecell):
+    """ephys.evaluators: Test CellEvaluator with EvaluationCache"""
+    import copy
+    import tempfile
+
+    evaluator, recording_map = two_step_simplecell
+    param_lists = [[0.1, 0.03], [0.06, 0.065]]
+    expected_scores = [evaluator.evaluate_with_lists(param_list)
+                       for param_list in param_lists]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ephys.evaluators.EvaluationCache(
+            max_size=1, cache_dir=cache_dir, precision=6)
+        evaluator.cache = cache
+
+        numpy.testing.assert_almost_equal(
+            evaluator.evaluate_with_lists(param_lists[0]),
+            expected_scores[0])
+        assert (cache.hits, cache.misses) == (0, 1)
+
+        # Parameters are rounded to 6 significant digits
+        numpy.testing.assert_almost_equal(
+            evaluator.evaluate_with_lists([0.1000000001, 0.03]),
+            expected_scores[0])
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        # Values are cached separately from scores
+        evaluator.evaluate_with_lists(param_lists[0], target='values')
+        assert (cache.hits, cache.misses) == (1, 2)
+        assert len(cache) == 1
+
+        # Only the protocols of the individual that is not cached run
+        numpy.testing.assert_almost_equal(
+            evaluator.evaluate_population(
+                param_lists, map_function=recording_map),
+            expected_scores)
+        assert (cache.hits, cache.misses) == (2, 3)
+        assert recording_map.tasks == [
+            (evaluator.param_dict(param_lists[1]), protocol_name)
+            for protocol_name in ['Step1', 'Step2']]
+
+        # Results on disk are shared with other caches
+        other_cache = ephys.evaluators.EvaluationCache(
+            cache_dir=cache_dir, precision=6)
+        evaluator.cache = other_cache
+        recording_map.tasks.clear()
+        numpy.testing.assert_almost_equal(
+            evaluator.evaluate_population(
+                param_lists, map_function=recording_map),
+            expected_scores)
+        assert (other_cache.hits, other_cache.misses) == (2, 0)
+        assert recording_map.tasks == []
+
+        # Changing a feature changes the key
+        feature = evaluator.fitness_calculator.objectives[0].features[0]
+        feature.exp_mean = 2.0
+        evaluator.evaluate_with_lists(param_lists[0])
+        assert (other_cache.hits, other_cache.misses) == (2, 1)
+
+        # So do the simulator settings and the seeding
+        param_dict = evaluator.param_dict(param_lists[0])
+        keys = [other_cache.key(evaluator, param_dict)]
+        sim = evaluator.sim
+        for name, value in [('dt', 0.01), ('cvode_active', False),
+                            ('coreneuron', True), ('nthread', 2)]:
+            evaluator.sim = copy.copy(sim)
+            setattr(evaluator.sim, name, value)
+            keys.append(other_cache.key(evaluator, param_dict))
+        evaluator.sim = sim
+        evaluator.use_params_for_seed = True
+        keys.append(other_cache.key(evaluator, param_dict))
+        evaluator.use_params_for_seed = False
+        assert len(set(keys)) == 6
+        assert other_cache.key(evaluator, param_dict) == keys[0]
+
+        # Seeds from the parameters don't depend on the evaluation order
+        seed_cache = ephys.evaluators.EvaluationCache()
+        evaluator.cache = seed_cache
+        evaluator.use_params_for_seed = True
+        seeded_scores = [
+            evaluator.evaluate_with_lists(param_lists[index])
+            for index in [0, 1, 0, 0]]
+        evaluator.use_params_for_seed = False
+        assert (seed_cache.hits, seed_cache.misses) == (2, 2)
+        assert seeded_scores[0] == seeded_scores[2] == seeded_scores[3]
+
+        # The compiled objectives of a vectorised calculator are not part
+        # of the key
+        vectorised_cache = ephys.evaluators.EvaluationCache()
+        evaluator.cache = vectorised_cache
+        evaluator.fitness_calculator.vectorised = True
+        for _ in range(2):
+            evaluator.evaluate_with_lists(param_lists[0])
+        evaluator.fitness_calculator.vectorised = False
+        assert (vectorised_cache.hits, vectorised_cache.misses) == (1, 1)
+
+        import pickle
+        unpickled_cache = pickle.loads(pickle.dumps(other_cache))
+        assert len(unpickled_cache) == 0
+        assert unpickled_cache.cache_dir == cache_dir
+
+
+@pytest.mark.unit
+def test_CellEvaluator_evaluate_with_details(two_step_simplecell):
+    """ephys.evaluators: Test CellEvaluator evaluate_with_details"""
+
+    evaluator, _ = two_step_simplecell
+    param_dict = {'gnabar_hh': 0.1, 'gkbar_hh': 0.03}
+
+    # The protocols run once for the values and the scores
+    with mock.patch.object(
+            evaluator, 'run_protocols',
+            wraps=evaluator.run_protocols) as run_protocols:
+        result = evaluator.evaluate_with_details(param_dict)
+    assert run_protocols.call_count == 1
+
+    assert set(result.responses) == {'Step1.soma.v', 'Step2.soma.v'}
+    expected_responses = evaluator.run_protocols(
+        evaluator.fitness_protocols.values(), param_dict)
+    for name, response in result.responses.items():
+        numpy.testing.assert_array_equal(
+            response['voltage'], expected_responses[name]['voltage'])
+
+    expected_scores = evaluator.evaluate_with_dicts(param_dict)
+    for name, score in expected_scores.items():
+        numpy.testing.assert_almost_equal(
+            result.objective_scores[name], score)
+
+    expected_values = evaluator.evaluate_with_dicts(
+        param_dict, target='values')
+    for objective in evaluator.fitness_calculator.objectives:
+        feature = objective.features[0]
+        numpy.testing.assert_almost_equal(
+            result.feature_values[feature.name],
+            expected_values[objective.name])
+        numpy.testing.assert_almost_equal(
+            result.feature_scores[feature.name],
+            expected_scores[objective.name])
+
+    assert 'Step2.Spikecount' in str(result)
+
+
+@pytest.mark.unit
+def test_CellEvaluator_response_archive(two_step_simplecell):
+    """ephys.evaluators: Test rescoring from a ResponseArchive"""
+    import tempfile
+
+    evaluator, _ = two_step_simplecell
+    param_lists = [[0.1, 0.03], [0.06, 0.065], [0.12, 0.02]]
+
+    with tempfile.TemporaryDirectory() as archive_dir:
+        archive = ephys.evaluators.ResponseArchive(archive_dir)
+        evaluator.response_archive = archive
+
+        evaluator.evaluate_with_lists(param_lists[0])
+        evaluator.evaluate_population(param_lists[1:])
+        assert len(archive) == 3
+
+        # Re-evaluation replaces the archived responses
+        evaluator.evaluate_with_lists(param_lists[0])
+        assert len(archive) == 3
+
+        evaluator.response_archive = None
+        feature = evaluator.fitness_calculator.objectives[0].features[0]
+        feature.exp_mean = 2.0
+
+        for target in ['scores', 'values']:
+            results = evaluator.fitness_calculator.calculate_archive(
+                archive, target=target)
+            assert len(results) == 3
+
+            for param_dict, obj_dict in results:
+                expected = evaluator.evaluate_with_dicts(
+                    param_dict, target=target)
+                for name, value in expected.items():
+                    numpy.testing.assert_almost_equal(obj_dict[name], value)
+
+        pytest.raises(
+            ValueError,
+            evaluator.fitness_calculator.calculate_archive,
+            archive,
+            target='responses')
+
+
+@pytest.mark.unit
+def test_CellEvaluator_reuse_cell(two_step_simplecell):
+    """ephys.evaluators: Test CellEvaluator reusing the cell for sweeps"""
+
+    evaluator, _ = two_step_simplecell
+    param_dict = {'gnabar_hh': 0.1, 'gkbar_hh': 0.03}
+    param_lists = [[0.1, 0.03], [0.06, 0.065]]
+
+    expected_responses = evaluator.run_protocols(
+        evaluator.fitness_protocols.values(), param_dict)
+    expected_scores = evaluator.evaluate_population(param_lists)
+
+    evaluator.reuse_cell = True
+
+    responses = evaluator.run_protocols(
+        evaluator.fitness_protocols.values(), param_dict)
+
+    assert set(responses) == set(expected_responses)
+    for name, response in responses.items():
+        numpy.testing.assert_array_equal(
+            response['time'], expected_responses[name]['time'])
+        numpy.testing.assert_array_equal(
+            response['voltage'], expected_responses[name]['voltage'])
+
+    assert evaluator.evaluate_population(param_lists) == expected_scores
+
+    multi_sweep = evaluator.group_sweep_protocols(
+        evaluator.fitness_protocols.values())
+    assert len(multi_sweep) == 1
+    assert len(multi_sweep[0].recordings) == 2
+    assert 'Multi sweep protocol' in str(multi_sweep[0])
+
+    pytest.raises(
+        ValueError,
+        ephys.evaluators.CellEvaluator,
+        cell_model=ephys.models.LFPyCellModel('lfpy', morph=None, mechs=[]),
+        param_names=[],
+        fitness_calculator=evaluator.fitness_calculator,
+        sim=evaluator.sim,
+        reuse_cell=True)
+
+
+@pytest.mark.unit
+def test_CellEvaluator_group_arb_sweep_protocols(two_step_simplecell):
+    """ephys.evaluators: Test grouping of Arbor sweep protocols"""
+
+    soma_loc = ephys.locations.ArbLocsetLocation(
+        name='soma', locset='(location 0 0.5)')
+
+    def arb_protocol(name):
+        stimulus = ephys.stimuli.NrnSquarePulse(
+            step_amplitude=0.1, step_delay=20, step_duration=50,
+            location=soma_loc, total_duration=100)
+        recording = ephys.recordings.CompRecording(
+            name='%s.soma.v' % name, location=soma_loc, variable='v')
+        return ephys.protocols.ArbSweepProtocol(
+            name, [stimulus], [recording])
+
+    evaluator, _ = two_step_simplecell
+    protocols = list(evaluator.fitness_protocols.values()) + \
+        [arb_protocol('arb_step1'), arb_protocol('arb_step2')]
+
+    grouped = evaluator.group_sweep_protocols(protocols)
+
+    assert len(grouped) == 2
+    assert isinstance(grouped[0], ephys.protocols.MultiSweepProtocol)
+    multi_arb_sweep = grouped[1]
+    assert isinstance(
+        multi_arb_sweep, ephys.protocols.MultiArbSweepProtocol)
+    assert multi_arb_sweep.name == 'arb_step1+arb_step2'
+    assert [recording.name for recording in multi_arb_sweep.recordings] \
+        == ['arb_step1.soma.v', 'arb_step2.soma.v']
+    assert multi_arb_sweep.total_duration == 100
+    assert list(multi_arb_sweep.subprotocols()) == \
+        ['arb_step1+arb_step2', 'arb_step1', 'arb_step2']
+    assert 'Multi Arbor sweep protocol' in str(multi_arb_sweep)
+
+    # A single Arbor sweep is not grouped
+    assert evaluator.group_sweep_protocols(protocols[:-1])[-1] is \
+        protocols[-2]
+
+
+@pytest.mark.unit
+def test_CellEvaluator_batch_size(two_step_simplecell):
+    """ephys.evaluators: Test CellEvaluator with batches of tasks"""
+
+    evaluator, recording_map = two_step_simplecell
+    param_lists = [[0.1, 0.03], [0.06, 0.065], [0.08, 0.04]]
+    param_dicts = [evaluator.param_dict(param_list)
+                   for param_list in param_lists]
+
+    # With a fixed time step, batches give the same responses, also when
+    # the protocols of a batch have different durations
+    for protocol in evaluator.fitness_protocols.values():
+        protocol.cvode_active = False
+    evaluator.fitness_protocols['Step2'].stimuli[0].total_duration = 170
+    expected_scores = evaluator.evaluate_population(param_lists)
+
+    evaluator.batch_size = 4
+    assert evaluator.nrn_batchable(evaluator.fitness_protocols.values())
+    assert evaluator.evaluate_population(
+        param_lists, map_function=recording_map) == expected_scores
+
+    # The tasks are batched in order
+    tasks = [(param_dict, protocol_name) for param_dict in param_dicts
+             for protocol_name in ['Step1', 'Step2']]
+    assert recording_map.tasks == [tasks[:4], tasks[4:]]
+
+    # The responses of the batch stop at the end of their own protocol
+    for task, batch_responses in zip(
+            tasks, evaluator.run_protocol_batch_task(tasks)):
+        task_responses = evaluator.run_protocol_task(task)
+        assert list(batch_responses) == list(task_responses)
+        for name, response in batch_responses.items():
+            numpy.testing.assert_array_equal(
+                response['time'], task_responses[name]['time'])
+            numpy.testing.assert_array_equal(
+                response['voltage'], task_responses[name]['voltage'])
+
+    # Seeds from the parameters need separate simulations, batches then run
+    # their tasks one after the other
+    evaluator.use_params_for_seed = True
+    assert not evaluator.nrn_batchable(evaluator.fitness_protocols.values())
+    seeded_scores = evaluator.evaluate_population(param_lists)
+    evaluator.batch_size = None
+    assert evaluator.evaluate_population(param_lists) == seeded_scores
+
+    pytest.raises(
+        ValueError,
+        ephys.evaluators.CellEvaluator,
+        cell_model=evaluator.cell_model,
+        param_names=evaluator.param_names,
+        fitness_calculator=evaluator.fitness_calculator,
+        sim=evaluator.sim,
+        batch_size=0)
+
+
+@pytest.mark.unit
+def test_CellEvaluator_arb_batch_size():
+    """ephys.evaluators: Test CellEvaluator with batches of Arbor tasks"""
+    from bluepyopt.ephys.examples.simplecell import SimpleCell
+
+    soma_loc = ephys.locations.ArbLocsetLocation(
+        name='soma', locset='(location 0 0.5)')
+
+    fitness_protocols = {}
+    objectives = []
+    for name, amplitude in [('Step1', 0.01), ('Step2', 0.05)]:
+        fitness_protocols[name] = ephys.protocols.ArbSweepProtocol(
+            name,
+            [ephys.stimuli.NrnSquarePulse(
+                step_amplitude=amplitude,
+                step_delay=100,
+                step_duration=50,
+                location=soma_loc,
+                total_duration=200)],
+            [ephys.recordings.CompRecording(
+                name='%s.soma.v' % name,
+                location=soma_loc,
+                variable='v')])
+        objectives.append(ephys.objectives.SingletonObjective(
+            '%s.Spikecount' % name,
+            ephys.efeatures.eFELFeature(
+                '%s.Spikecount' % name,
+                efel_feature_name='Spikecount',
+                recording_names={'': '%s.soma.v' % name},
+                stim_start=100,
+                stim_end=150,
+                exp_mean=1.0,
+                exp_std=0.05)))
+
+    evaluator = ephys.evaluators.CellEvaluator(
+        cell_model=SimpleCell().cell_model,
+        param_names=['gnabar_hh', 'gkbar_hh'],
+        fitness_protocols=fitness_protocols,
+        fitness_calculator=ephys.objectivescalculators.ObjectivesCalculator(
+            objectives),
+        sim=ephys.simulators.ArbSimulator(dt=0.025),
+        isolate_protocols=False)
+    param_lists = [[0.1, 0.03], [0.06, 0.065], [0.08, 0.04]]
+
+    tasks = [(evaluator.param_dict(param_list), protocol_name)
+             for param_list in param_lists
+             for protocol_name in fitness_protocols]
+    expected_responses = [evaluator.run_protocol_task(task)
+                          for task in tasks]
+
+    for batch_responses, task_responses in zip(
+            evaluator.run_protocol_batch_task(tasks), expected_responses):
+        assert list(batch_responses) == list(task_responses)
+        for name, response in batch_responses.items():
+            numpy.testing.assert_array_equal(
+                response['time'], task_responses[name]['time'])
+            numpy.testing.assert_allclose(
+                response['voltage'], task_responses[name]['voltage'])
+
+    expected_scores = evaluator.evaluate_population(param_lists)
+
+    recording_map = _RecordingMap()
+    evaluator.batch_size = 4
+    numpy.testing.assert_allclose(
+        evaluator.evaluate_population(
+            param_lists, map_function=recording_map),
+        expected_scores)
+    assert recording_map.tasks == [tasks[:4], tasks[4:]]
+
+
+@pytest.mark.unit
+def test_CellEvaluator_evaluate_async(two_step_simplecell):
+    """ephys.evaluators: Test CellEvaluator asyncio evaluation"""
+    import asyncio
+    import concurrent.futures
+    import multiprocessing
+
+    evaluator, _ = two_step_simplecell
+    param_lists = [[0.1, 0.03], [0.06, 0.065]]
+    expected_scores = evaluator.evaluate_population(param_lists)
+
+    async def evaluate(executor):
+        semaphore = asyncio.Semaphore(2)
+        population_scores = await evaluator.evaluate_population_async(
+            param_lists, executor=executor, max_concurrency=semaphore)
+        scores = await evaluator.evaluate_async(
+            param_lists[1], executor=executor, max_concurrency=1)
+
+        # Tasks that time out have empty responses, giving max scores
+        timeout_scores = await evaluator.evaluate_async(
+            param_lists[0], executor=executor, timeout=1e-9)
+
+        return population_scores, scores, timeout_scores
+
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=2,
+            mp_context=multiprocessing.get_context('fork')) as executor:
+        population_scores, scores, timeout_scores = asyncio.run(
+            evaluate(executor))
+
+    numpy.testing.assert_almost_equal(population_scores, expected_scores)
+    numpy.testing.assert_almost_equal(scores, expected_scores[1])
+    assert timeout_scores == [250.0, 250.0]
+
+    # Default executor, and cancellation
+    async def cancel():
+        task = asyncio.ensure_future(
+            evaluator.evaluate_async(param_lists[0]))
+        await asyncio.sleep(0)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancel())
+
+    # The workers of the default executor are joined
+    assert not multiprocessing.active_children()
+
+    numpy.testing.assert_almost_equal(
+        asyncio.run(evaluator.evaluate_async(param_lists[0])),
+        expected_scores[0])
+
+    # Stage thresholds checked in the executor
+    evaluator.stages = [(['Step1'], 10.0)]
+    numpy.testing.assert_almost_equal(
+        asyncio.run(evaluator.evaluate_population_async(param_lists)),
+        evaluator.evaluate_population(param_lists))
+
+
+@pytest.mark.unit
+def test_CellEvaluator_crop_recordings():
+    """ephys.evaluators: Test CellEvaluator with cropped recordings"""
+    from bluepyopt.ephys.examples.simplecell import SimpleCell
+
+    simplecell = SimpleCell()
+    param_values = [0.1, 0.03]
+
+    def create_evaluator(cvode_active, sampling_interval):
+        protocol = ephys.protocols.SweepProtocol(
+            'Step',
+            [ephys.stimuli.NrnSquarePulse(
+                step_amplitude=0.05,
+                step_delay=100,
+                step_duration=50,
+                location=simplecell.soma_loc,
+                total_duration=400)],
+            [ephys.recordings.CompRecording(
+                name='Step.soma.v',
+                location=simplecell.soma_loc,
+                variable='v',
+                sampling_interval=sampling_interval)])
+        objectives = [
+            ephys.objectives.SingletonObjective(
+                feature_name,
+                ephys.efeatures.eFELFeature(
+                    feature_name,
+                    efel_feature_name=feature_name,
+                    recording_names={'': 'Step.soma.v'},
+                    stim_start=100,
+                    stim_end=150,
+                    exp_mean=1.0,
+                    exp_std=0.05,
+                    window_margin=5))
+            for feature_name in ['Spikecount_stimint', 'voltage_base',
+                                 'AP_amplitude', 'mean_frequency']]
+
+        return ephys.evaluators.CellEvaluator(
+            cell_model=simplecell.cell_model,
+            param_names=simplecell.cell_evaluator.param_names,
+            fitness_protocols={'Step': protocol},
+            fitness_calculator=ephys.objectivescalculators.
+            ObjectivesCalculator(objectives),
+            sim=ephys.simulators.NrnSimulator(cvode_active=cvode_active))
+
+    for cvode_active, sampling_interval in [(False, None), (False, 0.025),
+                                            (True, None)]:
+        uncropped_evaluator = create_evaluator(cvode_active,
+                                               sampling_interval)
+        expected_values = uncropped_evaluator.evaluate_with_lists(
+            param_values, target='values')
+
+        evaluator = ephys.evaluators.CellEvaluator(
+            cell_model=uncropped_evaluator.cell_model,
+            param_names=uncropped_evaluator.param_names,
+            fitness_protocols=uncropped_evaluator.fitness_protocols,
+            fitness_calculator=uncropped_evaluator.fitness_calculator,
+            sim=uncropped_evaluator.sim,
+            crop_recordings=True)
+        recording = evaluator.fitness_protocols['Step'].recordings[0]
+        assert recording.windows == [(85.0, 155.0)]
+
+        # The windows are set on copies of the protocols
+        assert uncropped_evaluator.fitness_protocols['Step'].recordings[
+            0].windows is None
+
+        responses = evaluator.run_protocols(
+            evaluator.fitness_protocols.values(),
+            evaluator.param_dict(param_values))
+        time = responses['Step.soma.v']['time']
+        # The first sample is kept, e.g. for the interpolation of eFEL
+        assert time[0] == 0.0
+        assert 85.0 <= min(time[1:]) and max(time) <= 155.0
+
+        numpy.testing.assert_allclose(
+            evaluator.evaluate_with_lists(param_values, target='values'),
+            expected_values, rtol=1e-6)
+
+
+@pytest.mark.unit
+def test_CellEvaluator_feature_pool(two_step_simplecell):
+    """ephys.evaluators: Test CellEvaluator with a feature pool"""
+    import concurrent.futures
+    import multiprocessing
+
+    evaluator, _ = two_step_simplecell
+    param_lists = [[0.1, 0.03], [0.06, 0.065], [0.12, 0.01]]
+
+    expected = {}
+    for stages in [None, [(['Step1'], 10.0)]]:
+        evaluator.stages = stages
+        for target in ['scores', 'values']:
+            expected[bool(stages), target] = evaluator.evaluate_population(
+                param_lists, target=target)
+
+    pytest.raises(
+        ValueError,
+        ephys.evaluators.CellEvaluator,
+        cell_model=evaluator.cell_model,
+        param_names=evaluator.param_names,
+        fitness_protocols=evaluator.fitness_protocols,
+        fitness_calculator=evaluator.fitness_calculator,
+        sim=evaluator.sim,
+        feature_batch_size=0)
+
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context('fork'))
+
+    try:
+        for feature_pool, feature_batch_size, stages in [
+                (2, 2, None),
+                (executor, 1, None),
+                (executor, 2, [(['Step1'], 10.0)])]:
+            evaluator.feature_pool = feature_pool
+            evaluator.feature_batch_size = feature_batch_size
+            evaluator.stages = stages
+            for target in ['scores', 'values']:
+                numpy.testing.assert_almost_equal(
+                    evaluator.evaluate_population(
+                        param_lists, target=target),
+                    expected[bool(stages), target])
+    finally:
+        executor.shutdown()
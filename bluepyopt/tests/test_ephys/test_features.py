@@ -230,6 +230,82 @@ def test_eFELFeature_string_settings():
     assert vb_median != vb_default
 
 
+@pytest.mark.unit
+def test_calculate_efel_features():
+    """ephys.efeatures: Testing batched calculation of eFELFeatures"""
+
+    from bluepyopt.ephys import objectives, objectivescalculators
+
+    recording_names = {'': 'square_pulse_step1.soma.v'}
+
+    response = TimeVoltageResponse('mock_response')
+    testdata_dir = joinp(
+        os.path.dirname(
+            os.path.abspath(__file__)),
+        'testdata')
+    response.read_csv(joinp(testdata_dir, 'TimeVoltageResponse.csv'))
+    responses = {'square_pulse_step1.soma.v': response, }
+
+    def efeature(efel_feature_name, stim_start=700, **kwargs):
+        return efeatures.eFELFeature(
+            name='test_%s' % efel_feature_name,
+            efel_feature_name=efel_feature_name,
+            recording_names=kwargs.pop('recording_names', recording_names),
+            stim_start=stim_start,
+            stim_end=2700,
+            exp_mean=1,
+            exp_std=0.5,
+            **kwargs)
+
+    features = [
+        efeature('voltage_base'),
+        efeature('Spikecount'),
+        efeature('AP_amplitude'),
+        efeature('AP_amplitude', force_max_score=True, max_score=20),
+        efeature('AP_amplitude', stim_start=600),
+        efeature('AP_amplitude', threshold=-10),
+        efeature('AP_amplitude', double_settings={'interp_step': 0.2}),
+        efeature('voltage_base',
+                 recording_names={'': 'missing.soma.v'})]
+
+    efel_values = efeatures.calculate_efel_features(features, responses)
+
+    # Same settings and trace give one group
+    assert len(set(feature.efel_group_key() for feature in features)) == 5
+    assert efel_values[id(features[-1])] is None
+
+    for feature in features:
+        assert efeatures.efel_batchable(feature)
+        assert feature.score_from_values(efel_values[id(feature)]) == \
+            feature.calculate_score(responses)
+        assert feature.value_from_values(efel_values[id(feature)]) == \
+            feature.calculate_feature(responses)
+
+    singletons = [
+        objectives.SingletonObjective('singleton%d' % i, feature)
+        for i, feature in enumerate(features)]
+    combined = [
+        objectives.MaxObjective('max', features),
+        objectives.WeightedSumObjective(
+            'sum', features, [1.0] * len(features))]
+
+    for objective_list in [singletons, singletons + combined]:
+        batched_calculator = objectivescalculators.ObjectivesCalculator(
+            objective_list)
+        calculator = objectivescalculators.ObjectivesCalculator(
+            objective_list, batch_efel=False)
+
+        assert batched_calculator.calculate_scores(responses) == \
+            calculator.calculate_scores(responses)
+        assert batched_calculator.calculate_feature_details(responses) == \
+            calculator.calculate_feature_details(responses)
+
+    assert objectivescalculators.ObjectivesCalculator(
+        singletons).calculate_values(responses) == \
+        objectivescalculators.ObjectivesCalculator(
+            singletons, batch_efel=False).calculate_values(responses)
+
+
 @pytest.mark.unit
 def test_eFELFeature_serialize():
     """ephys.efeatures: Testing eFELFeature serialization"""
@@ -328,6 +404,71 @@ def test_extraFELFeature():
     assert extrafel_feature_name in str(efeature)
 
 
+@pytest.mark.unit
+def test_extraFELFeature_preprocessing_cache(monkeypatch):
+    """ephys.efeatures: Testing shared preprocessing of extraFELFeatures"""
+
+    # Somatic trace with a spike every 50 ms and its derivative as LFP
+    time = numpy.arange(0, 500, 0.1)
+    voltage = -70.0 + sum(
+        100.0 * numpy.exp(-((time - spike_time) / 0.5) ** 2)
+        for spike_time in range(75, 450, 50))
+    lfp = -numpy.array([numpy.gradient(voltage) * scale
+                        for scale in [1.0, 0.5, 0.2]]) * 1e-3
+
+    responses = {
+        'soma.v': TimeVoltageResponse('soma.v', time, voltage),
+        'MEA.LFP': TimeLFPResponse('MEA.LFP', time, lfp)}
+
+    def efeature(extrafel_feature_name, channel_ids=None, fcut=None):
+        return efeatures.extraFELFeature(
+            name=extrafel_feature_name,
+            extrafel_feature_name=extrafel_feature_name,
+            somatic_recording_name='soma.v',
+            recording_names={'': 'MEA.LFP'},
+            channel_ids=channel_ids,
+            fcut=fcut,
+            fs=10,
+            ms_cut=[3, 5],
+            stim_start=50,
+            stim_end=480,
+            exp_mean=[0.1, 0.1, 0.1],
+            exp_std=[0.1, 0.1, 0.1])
+
+    features = [efeature('halfwidth'),
+                efeature('peak_to_valley'),
+                efeature('peak_trough_ratio', channel_ids=[0, 1]),
+                efeature('halfwidth', fcut=[0.5, 4000]),
+                efeature('peak_to_valley', fcut=[0.5, 4000])]
+
+    expected = [feature.calculate_feature(responses) for feature in features]
+
+    calls = []
+    for function_name in ['_filter_response', '_get_waveforms']:
+        def counted(*args, _function=getattr(efeatures, function_name),
+                    _name=function_name, **kwargs):
+            calls.append(_name)
+            return _function(*args, **kwargs)
+        monkeypatch.setattr(efeatures, function_name, counted)
+
+    with efeatures.preprocessing_cache():
+        values = [feature.calculate_feature(responses)
+                  for feature in features]
+
+    for expected_value, value in zip(expected, values):
+        numpy.testing.assert_array_equal(value, expected_value)
+
+    # Once per filter setting
+    assert calls.count('_filter_response') == 1
+    assert calls.count('_get_waveforms') == 2
+
+    # Without cache every feature preprocesses the responses
+    calls.clear()
+    for feature in features:
+        feature.calculate_feature(responses)
+    assert calls.count('_get_waveforms') == len(features)
+
+
 @pytest.mark.unit
 def test_masked_cosine_distance():
     """ephys.efeatures: Testing masked_cosine_distance"""
@@ -0,0 +1,179 @@
+"""bluepyopt.ephys.isolation tests"""
+
+"""
+Copyright (c) 2016-2020, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+# pylint:disable=W0612
+
+import os
+import pickle
+import time
+
+import numpy
+import pytest
+
+import bluepyopt.ephys as ephys
+import bluepyopt.ephys.examples as examples
+
+
+def _getpid():
+    """Return pid of the process running this function"""
+    return os.getpid()
+
+
+def _sleep(duration):
+    """Sleep for duration seconds"""
+    time.sleep(duration)
+
+
+def _sleep_getpid(duration):
+    """Sleep for duration seconds, and return the pid"""
+    time.sleep(duration)
+    return os.getpid()
+
+
+def _exit(*args, **kwargs):
+    """Terminate the process running this function"""
+    os._exit(1)
+
+
+def _peak_rss():
+    """Return peak resident set size of the process running this function"""
+    return ephys.isolation._peak_rss()
+
+
+def _allocate(size):
+    """Allocate and touch size MB of memory"""
+    return len(bytearray(int(size * 1024 * 1024)))
+
+
+@pytest.mark.unit
+def test_isolationpool_reuse_workers():
+    """ephys.isolation: test if IsolationPool reuses and recycles workers"""
+
+    with ephys.isolation.IsolationPool() as pool:
+        pids = [pool.run(_getpid) for _ in range(3)]
+        assert len(set(pids)) == 1
+        assert os.getpid() not in pids
+
+    with ephys.isolation.IsolationPool(max_tasks=1) as pool:
+        pids = [pool.run(_getpid) for _ in range(3)]
+        assert len(set(pids)) == 3
+
+    with ephys.isolation.IsolationPool(max_rss=0.0) as pool:
+        pids = [pool.run(_getpid) for _ in range(2)]
+        assert len(set(pids)) == 2
+
+    # Only the worker that exceeded max_rss is replaced
+    with ephys.isolation.IsolationPool(max_workers=2) as pool:
+        max_rss = pool.run(_peak_rss) + 100.0
+    with ephys.isolation.IsolationPool(
+            max_workers=2, max_rss=max_rss) as pool:
+        pids = [pool.run(_getpid) for _ in range(2)]
+        assert len(set(pids)) == 2
+        pool.run(_allocate, kwargs={'size': 200.0})
+        new_pids = [pool.run(_getpid) for _ in range(2)]
+        assert pids[0] not in new_pids
+        assert pids[1] in new_pids
+
+
+@pytest.mark.unit
+def test_isolationpool_threads():
+    """ephys.isolation: test IsolationPool used by several threads"""
+
+    import concurrent.futures
+
+    with ephys.isolation.IsolationPool(max_workers=2) as pool:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as threads:
+            pids = list(threads.map(
+                lambda _: pool.run(_sleep_getpid, kwargs={'duration': 0.1}),
+                range(8)))
+
+        # All the threads share the same two workers
+        assert len(set(pids)) == 2
+
+
+@pytest.mark.unit
+def test_isolationpool_pickle():
+    """ephys.isolation: test if IsolationPool can be pickled after use"""
+
+    pool = ephys.isolation.IsolationPool(max_tasks=10)
+    pool.run(_getpid)
+
+    unpickled_pool = pickle.loads(pickle.dumps(pool))
+    assert unpickled_pool.max_tasks == 10
+    assert unpickled_pool.run(_getpid) != pool.run(_getpid)
+
+    unpickled_pool.close()
+    pool.close()
+
+
+@pytest.mark.unit
+def test_isolationpool_timeout():
+    """ephys.isolation: test if IsolationPool raises exception on timeout"""
+
+    from concurrent.futures import TimeoutError
+
+    with ephys.isolation.IsolationPool() as pool:
+        pytest.raises(ValueError, pool.run, _sleep, timeout=-1)
+        pid = pool.run(_getpid)
+        pytest.raises(
+            TimeoutError,
+            pool.run,
+            _sleep,
+            kwargs={'duration': 5},
+            timeout=0.1)
+        # Worker was replaced after timeout
+        assert pool.run(_getpid) != pid
+
+
+@pytest.mark.unit
+def test_isolationpool_crash(monkeypatch):
+    """ephys.isolation: test if a crashed worker fails the protocol run"""
+
+    simplecell = examples.simplecell.SimpleCell()
+    monkeypatch.setattr(ephys.models.CellModel, 'instantiate', _exit)
+
+    with ephys.isolation.IsolationPool() as pool:
+        pytest.raises(
+            ephys.protocols.SweepProtocolException,
+            simplecell.protocol.run,
+            simplecell.cell_model,
+            simplecell.default_param_values,
+            sim=simplecell.nrn_sim,
+            isolate=pool)
+        # Worker was replaced after the crash
+        assert pool.run(_getpid) != os.getpid()
+
+
+@pytest.mark.unit
+def test_isolationpool_evaluator():
+    """ephys.isolation: test if CellEvaluator gives same scores with pool"""
+
+    simplecell = examples.simplecell.SimpleCell()
+    evaluator = simplecell.cell_evaluator
+    param_values = [0.1, 0.03]
+
+    expected_scores = evaluator.evaluate_with_lists(param_values)
+
+    with ephys.isolation.IsolationPool() as pool:
+        evaluator.isolate_protocols = pool
+        for _ in range(2):
+            scores = evaluator.evaluate_with_lists(param_values)
+            numpy.testing.assert_almost_equal(scores, expected_scores)
@@ -180,6 +180,56 @@ def test_CellModel_destroy():
     assert 0 == len(sim.neuron.h.CellModel_destroy)
 
 
+@pytest.mark.unit
+def test_CellModel_prepare():
+    """ephys.models: Test CellModel prepare"""
+    morph = ephys.morphologies.NrnFileMorphology(simple_morphology_path)
+    cm = ephys.parameters.NrnSectionParameter(
+        name='cm',
+        param_name='cm',
+        locations=[ephys.locations.NrnSeclistLocation('all', 'all')])
+    cell_model = ephys.models.CellModel('CellModel_prepare',
+                                        morph=morph,
+                                        mechs=[],
+                                        params=[cm])
+
+    cell_model.prepare(sim=sim)
+    assert cell_model.prepared
+    assert cell_model.icell is None
+    assert 1 == len(sim.neuron.h.CellModel_prepare)
+
+    for cm_value in [1.0, 2.0]:
+        cell_model.freeze({'cm': cm_value})
+        cell_model.instantiate(sim=sim)
+        assert 1 == len(sim.neuron.h.CellModel_prepare)
+        assert cell_model.icell.soma[0].cm == cm_value
+        cell_model.destroy(sim=sim)
+        cell_model.unfreeze(['cm'])
+        assert cell_model.icell is None
+        assert 1 == len(sim.neuron.h.CellModel_prepare)
+
+    # The cell model can still be pickled
+    import pickle
+    assert pickle.loads(pickle.dumps(cell_model)).name == 'CellModel_prepare'
+
+    cell_model.unprepare(sim=sim)
+    assert not cell_model.prepared
+    assert 0 == len(sim.neuron.h.CellModel_prepare)
+
+    # Cell model without mechanisms
+    cell_model = ephys.models.CellModel('CellModel_prepare',
+                                        morph=morph,
+                                        mechs=None,
+                                        params=[cm])
+    cell_model.prepare(sim=sim)
+    cell_model.freeze({'cm': 1.0})
+    cell_model.instantiate(sim=sim)
+    assert cell_model.icell.soma[0].cm == 1.0
+    cell_model.destroy(sim=sim)
+    cell_model.unprepare(sim=sim)
+    assert 0 == len(sim.neuron.h.CellModel_prepare)
+
+
 @pytest.mark.unit
 def test_lfpy_create_empty_template():
     """ephys.models: Test creation of lfpy empty template"""
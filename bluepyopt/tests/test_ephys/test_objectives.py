@@ -222,3 +222,96 @@ def test_WeightedSumObjective():
                   'weighted',
                   features=[efeature],
                   weights=[1, 2])
+
+
+@pytest.mark.unit
+def test_CompiledObjectives():
+    """ephys.objectivescalculators: Test vectorised objective scores"""
+
+    from bluepyopt.ephys.objectivescalculators import (
+        CompiledObjectives, ObjectivesCalculator)
+
+    recording_names = {'': 'square_pulse_step1.soma.v'}
+
+    def efeature(efel_feature_name, **kwargs):
+        return ephys.efeatures.eFELFeature(
+            name=efel_feature_name,
+            efel_feature_name=efel_feature_name,
+            recording_names=recording_names,
+            stim_start=700,
+            stim_end=2700,
+            exp_mean=1,
+            exp_std=0.5,
+            **kwargs)
+
+    features = [efeature('voltage_base'),
+                efeature('AP_amplitude'),
+                efeature('Spikecount', force_max_score=True, max_score=20),
+                efeature('AP_width', threshold=-10)]
+
+    objective_list = [
+        ephys.objectives.SingletonObjective('singleton', features[0]),
+        ephys.objectives.SingletonWeightObjective(
+            'singleton_weight', features[1], 0.3),
+        ephys.objectives.MaxObjective('max', features[1:]),
+        ephys.objectives.WeightedSumObjective(
+            'sum', features, [0.1, 0.2, 0.3, 0.4])]
+
+    response = ephys.responses.TimeVoltageResponse('mock_response')
+    testdata_dir = os.path.join(
+        os.path.dirname(
+            os.path.abspath(__file__)),
+        'testdata')
+    response.read_csv(os.path.join(testdata_dir, 'TimeVoltageResponse.csv'))
+    responses_list = [{'square_pulse_step1.soma.v': response}, {}]
+
+    calculator = ObjectivesCalculator(objective_list)
+    vectorised_calculator = ObjectivesCalculator(
+        objective_list, vectorised=True)
+
+    expected_scores = [calculator.calculate_scores(responses)
+                       for responses in responses_list]
+    scores = [vectorised_calculator.calculate_scores(responses)
+              for responses in responses_list]
+    for expected, score in zip(expected_scores, scores):
+        assert list(expected) == list(score)
+        numpy.testing.assert_allclose(
+            list(score.values()), list(expected.values()), rtol=1e-12)
+
+    # Missing responses give the max score, capped by force_max_score
+    assert scores[1]['max'] == 250
+    numpy.testing.assert_allclose(
+        scores[1]['sum'], 0.1 * 250 + 0.2 * 250 + 0.3 * 20 + 0.4 * 250)
+
+    numpy.testing.assert_allclose(
+        vectorised_calculator.calculate_population_scores(responses_list),
+        [list(expected.values()) for expected in expected_scores],
+        rtol=1e-12)
+    assert vectorised_calculator.compile() is \
+        vectorised_calculator.compile()
+
+    # Edited targets are taken into account
+    features[1].exp_std = 2.0
+    objective_list[3].weights[0] = 1.0
+    expected = calculator.calculate_scores(responses_list[0])
+    score = vectorised_calculator.calculate_scores(responses_list[0])
+    numpy.testing.assert_allclose(
+        list(score.values()), list(expected.values()), rtol=1e-12)
+
+    # Known scores are reused, the others are calculated
+    known_scores = {'singleton': 1.0, 'max': 2.0}
+    for scoring_calculator in [calculator, vectorised_calculator]:
+        score = scoring_calculator.calculate_scores(
+            responses_list[0], known_scores=known_scores)
+        assert list(score) == list(expected)
+        assert score['singleton'] == 1.0 and score['max'] == 2.0
+        numpy.testing.assert_allclose(
+            [score['singleton_weight'], score['sum']],
+            [expected['singleton_weight'], expected['sum']], rtol=1e-12)
+
+    class CustomObjective(ephys.objectives.MaxObjective):
+        def combine_feature_scores(self, feature_scores):
+            return min(feature_scores)
+
+    with pytest.raises(ValueError):
+        CompiledObjectives([CustomObjective('custom', features)])
@@ -511,3 +511,250 @@ def test_sweepprotocol_instantiate_with_LFPyCellModel():
 
     protocol.destroy(sim=nrn_sim)
     dummy_cell.destroy(sim=nrn_sim)
+
+
+@pytest.mark.unit
+def test_multisweepprotocol_equilibration():
+    """ephys.protocols: test sweeps sharing an equilibration"""
+
+    import numpy
+    from bluepyopt.ephys import timing
+    from bluepyopt.ephys.examples.simplecell import SimpleCell
+
+    simplecell = SimpleCell()
+    cell_model = simplecell.cell_model
+    nrn_sim = ephys.simulators.NrnSimulator()
+    param_values = {'gnabar_hh': 0.1, 'gkbar_hh': 0.03}
+
+    def holding_stimulus(duration):
+        return ephys.stimuli.NrnSquarePulse(
+            step_amplitude=-0.01,
+            step_delay=0,
+            step_duration=duration,
+            location=simplecell.soma_loc,
+            total_duration=duration)
+
+    equilibration = ephys.protocols.Equilibration(
+        name='holding',
+        duration=500,
+        stimuli=[holding_stimulus(500)])
+
+    sweeps = []
+    for name, amplitude in [('step1', 0.01), ('step2', 0.05)]:
+        sweeps.append(ephys.protocols.SweepProtocol(
+            name=name,
+            stimuli=[
+                holding_stimulus(200),
+                ephys.stimuli.NrnSquarePulse(
+                    step_amplitude=amplitude,
+                    step_delay=100,
+                    step_duration=50,
+                    location=simplecell.soma_loc,
+                    total_duration=200)],
+            recordings=[ephys.recordings.CompRecording(
+                name='%s.soma.v' % name,
+                location=simplecell.soma_loc,
+                variable='v')],
+            equilibration=equilibration))
+
+    expected_responses = {}
+    for sweep in sweeps:
+        expected_responses.update(
+            sweep.run(cell_model, param_values, sim=nrn_sim))
+
+    # Protocol starts from the equilibrated state, not from rest
+    response = expected_responses['step1.soma.v']
+    voltage_base = response['voltage'][response['time'] < 100]
+    assert voltage_base.iloc[0] < -66.0
+    numpy.testing.assert_almost_equal(
+        voltage_base.iloc[0], voltage_base.iloc[-1], decimal=2)
+
+    multi_sweep = ephys.protocols.MultiSweepProtocol(
+        name='steps', protocols=sweeps)
+
+    with timing.evaluation() as record:
+        responses = multi_sweep.run(
+            cell_model, param_values, sim=nrn_sim, isolate=False)
+
+    # Equilibration only ran once
+    assert record['simulator.run'][1] == 3
+
+    for name, response in responses.items():
+        numpy.testing.assert_array_equal(
+            response['time'], expected_responses[name]['time'])
+        numpy.testing.assert_array_equal(
+            response['voltage'], expected_responses[name]['voltage'])
+
+    assert 'equilibration holding: 500 ms' in str(equilibration)
+
+
+@pytest.mark.unit
+def test_recording_windows():
+    """ephys.protocols: test recording windows of features"""
+
+    def feature(name, stim_start, stim_end, window_margin=10,
+                efel_feature_name='voltage_base'):
+        return ephys.efeatures.eFELFeature(
+            name,
+            efel_feature_name=efel_feature_name,
+            recording_names={'': '%s.soma.v' % name.split('.')[0]},
+            stim_start=stim_start,
+            stim_end=stim_end,
+            window_margin=window_margin)
+
+    features = [feature('step1.a', 100, 150),
+                feature('step1.b', 400, 500),
+                feature('step1.c', 140, 200),
+                feature('step2.a', 100, 150, window_margin=None),
+                feature('step3.a', 100, 150),
+                feature('step3.b', 100, 150,
+                        efel_feature_name='decay_time_constant_after_stim'),
+                feature('step5.a', 100, 150),
+                feature('step5.b', 100, 150, efel_feature_name='Spikecount')]
+
+    assert ephys.protocols.recording_windows('step1.soma.v', features) == \
+        [(80.0, 210.0), (350.0, 510.0)]
+    assert ephys.protocols.recording_windows(
+        'step2.soma.v', features) is None
+    # Features after the stimulus use the recording up to its end
+    assert ephys.protocols.recording_windows('step3.soma.v', features) == \
+        [(80.0, float('inf'))]
+    assert ephys.protocols.recording_windows(
+        'step4.soma.v', features) is None
+    # Spikecount counts the spikes of the whole recording
+    assert ephys.protocols.recording_windows(
+        'step5.soma.v', features) is None
+
+    recordings = [ephys.recordings.CompRecording(name='%s.soma.v' % name)
+                  for name in ['step1', 'step2']]
+    protocol = ephys.protocols.SequenceProtocol(
+        'steps',
+        protocols=[ephys.protocols.SweepProtocol(
+            'sweep%d' % i, stimuli=[], recordings=[recording])
+            for i, recording in enumerate(recordings)])
+    protocol.set_recording_windows(features)
+
+    assert recordings[0].windows == [(80.0, 210.0), (350.0, 510.0)]
+    assert recordings[1].windows is None
+
+    time, voltage = recordings[0].crop([0.0, 80.0, 300.0, 400.0, 600.0],
+                                       [1.0, 2.0, 3.0, 4.0, 5.0])
+    # The first sample is kept
+    assert list(time) == [0.0, 80.0, 400.0]
+    assert list(voltage) == [1.0, 2.0, 4.0]
+
+
+@pytest.mark.unit
+def test_run_nrn_batch():
+    """ephys.protocols: test Neuron sweeps of different durations in a batch"""
+
+    import numpy
+    from bluepyopt.ephys.examples.simplecell import SimpleCell
+
+    simplecell = SimpleCell()
+    nrn_sim = ephys.simulators.NrnSimulator(cvode_active=False)
+
+    def step(name, total_duration, deterministic=False):
+        return ephys.protocols.SweepProtocol(
+            name,
+            [ephys.stimuli.NrnSquarePulse(
+                step_amplitude=0.05,
+                step_delay=20,
+                step_duration=50,
+                location=simplecell.soma_loc,
+                total_duration=total_duration)],
+            [ephys.recordings.CompRecording(
+                name='%s.soma.v' % name,
+                location=simplecell.soma_loc,
+                variable='v')],
+            cvode_active=False,
+            deterministic=deterministic)
+
+    passive_cell = ephys.models.CellModel(
+        'passive_cell', morph=simplecell.morph, mechs=None,
+        params=[simplecell.cm_param])
+    runs = [(step('long', 150), simplecell.cell_model,
+             simplecell.default_param_values),
+            (step('short', 80), simplecell.cell_model,
+             {'gnabar_hh': 0.06, 'gkbar_hh': 0.065}),
+            # Deterministic protocol on a cell without mechanisms
+            (step('passive', 100, deterministic=True), passive_cell, {})]
+
+    batch_responses = ephys.protocols.run_nrn_batch(runs, sim=nrn_sim)
+
+    # The responses of the shorter runs stop at their total_duration
+    for (protocol, cell_model, param_values), responses in zip(
+            runs, batch_responses):
+        expected = protocol.run(
+            cell_model, param_values, sim=nrn_sim, isolate=False)
+        name = '%s.soma.v' % protocol.name
+        assert responses[name]['time'].iloc[-1] == \
+            pytest.approx(protocol.total_duration)
+        numpy.testing.assert_array_equal(
+            responses[name]['time'], expected[name]['time'])
+        numpy.testing.assert_array_equal(
+            responses[name]['voltage'], expected[name]['voltage'])
+
+    # The cells already instantiated are destroyed if a later one fails
+    nsections = len(list(nrn_sim.neuron.h.allsec()))
+    broken_cell = ephys.models.CellModel(
+        'broken_cell', morph=simplecell.morph, mechs=None,
+        params=[simplecell.gnabar_param])
+    pytest.raises(
+        Exception,
+        ephys.protocols.run_nrn_batch,
+        runs[:1] + [(step('broken', 80), broken_cell, {'gnabar_hh': 0.1})],
+        sim=nrn_sim)
+    assert len(list(nrn_sim.neuron.h.allsec())) == nsections
+
+
+@pytest.mark.unit
+def test_multiarbsweepprotocol_run():
+    """ephys.protocols: test Arbor sweeps run in one simulation"""
+
+    import numpy
+    from bluepyopt.ephys.examples.simplecell import SimpleCell
+
+    cell_model = SimpleCell().cell_model
+    arb_sim = ephys.simulators.ArbSimulator(dt=0.025)
+    param_values = {'gnabar_hh': 0.1, 'gkbar_hh': 0.03}
+    soma_loc = ephys.locations.ArbLocsetLocation(
+        name='soma', locset='(location 0 0.5)')
+
+    sweeps = []
+    for name, amplitude in [('step1', 0.01), ('step2', 0.05)]:
+        sweeps.append(ephys.protocols.ArbSweepProtocol(
+            name=name,
+            stimuli=[ephys.stimuli.NrnSquarePulse(
+                step_amplitude=amplitude,
+                step_delay=100,
+                step_duration=50,
+                location=soma_loc,
+                total_duration=200)],
+            recordings=[ephys.recordings.CompRecording(
+                name='%s.soma.v' % name,
+                location=soma_loc,
+                variable='v')]))
+
+    expected_responses = {}
+    for sweep in sweeps:
+        expected_responses.update(
+            sweep.run(cell_model, param_values, sim=arb_sim, isolate=False))
+
+    multi_sweep = ephys.evaluators.CellEvaluator.group_sweep_protocols(
+        sweeps)[0]
+    assert isinstance(multi_sweep, ephys.protocols.MultiArbSweepProtocol)
+
+    responses = multi_sweep.run(
+        cell_model, param_values, sim=arb_sim, isolate=False)
+
+    assert list(responses) == ['step1.soma.v', 'step2.soma.v']
+    for name, response in responses.items():
+        numpy.testing.assert_array_equal(
+            response['time'], expected_responses[name]['time'])
+        numpy.testing.assert_allclose(
+            response['voltage'], expected_responses[name]['voltage'])
+
+    # The cells of the batch don't share their stimuli
+    assert numpy.max(responses['step2.soma.v']['voltage']) > \
+        numpy.max(responses['step1.soma.v']['voltage'])
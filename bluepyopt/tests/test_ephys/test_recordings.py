@@ -113,3 +113,109 @@ def test_lfprecording_instantiate():
     assert recording.instantiated
 
     lfpy_cell.destroy(sim=neuron_sim)
+
+
+@pytest.mark.unit
+def test_comprecording_array_response():
+    """ephys.recordings: Test CompRecording with array responses"""
+
+    import pickle
+    import tempfile
+
+    import numpy
+    from bluepyopt.ephys.examples.simplecell import SimpleCell
+
+    simplecell = SimpleCell()
+    nrn_sim = ephys.simulators.NrnSimulator()
+    param_values = {'gnabar_hh': 0.1, 'gkbar_hh': 0.03}
+
+    def run(**recording_kwargs):
+        protocol = ephys.protocols.SweepProtocol(
+            name='step',
+            stimuli=[ephys.stimuli.NrnSquarePulse(
+                step_amplitude=0.05,
+                step_delay=20,
+                step_duration=50,
+                location=simplecell.soma_loc,
+                total_duration=100)],
+            recordings=[ephys.recordings.CompRecording(
+                name='step.soma.v',
+                location=simplecell.soma_loc,
+                variable='v',
+                **recording_kwargs)])
+        return protocol.run(
+            simplecell.cell_model, param_values, sim=nrn_sim)['step.soma.v']
+
+    expected = run()
+    response = run(array_response=True)
+
+    assert isinstance(response, ephys.responses.ArrayTimeVoltageResponse)
+    assert isinstance(response['time'], numpy.ndarray)
+    assert isinstance(response['voltage'], numpy.ndarray)
+    numpy.testing.assert_array_equal(response['time'], expected['time'])
+    numpy.testing.assert_array_equal(
+        response['voltage'], expected['voltage'])
+    numpy.testing.assert_array_equal(
+        response.response['voltage'], expected['voltage'])
+    assert len(pickle.dumps(response)) < len(pickle.dumps(expected))
+
+    unpickled = pickle.loads(pickle.dumps(response))
+    numpy.testing.assert_array_equal(unpickled['voltage'], response['voltage'])
+
+    with pytest.raises(KeyError):
+        response['current']
+
+    response = run(array_response=True, dtype=numpy.float32)
+    assert response['time'].dtype == numpy.float64
+    assert response['voltage'].dtype == numpy.float32
+    numpy.testing.assert_allclose(
+        response['voltage'], expected['voltage'], atol=1e-4)
+
+    # The arrays are stored in slots, csv files keep the dtypes
+    assert 'voltage' not in vars(response)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, 'response.csv')
+        response.to_csv(filename)
+        loaded = ephys.responses.ArrayTimeVoltageResponse(
+            'step.soma.v', dtype=numpy.float32)
+        loaded.read_csv(filename)
+    assert loaded['voltage'].dtype == numpy.float32
+    numpy.testing.assert_allclose(loaded['time'], response['time'])
+    numpy.testing.assert_array_equal(loaded['voltage'], response['voltage'])
+
+
+@pytest.mark.unit
+def test_comprecording_sampling_interval():
+    """ephys.recordings: Test CompRecording sampling interval"""
+
+    import numpy
+    from bluepyopt.ephys.examples.simplecell import SimpleCell
+
+    with pytest.raises(ValueError):
+        ephys.recordings.CompRecording(sampling_interval=0)
+
+    simplecell = SimpleCell()
+    param_values = {'gnabar_hh': 0.1, 'gkbar_hh': 0.03}
+
+    for cvode_active in [True, False]:
+        nrn_sim = ephys.simulators.NrnSimulator(cvode_active=cvode_active)
+        protocol = ephys.protocols.SweepProtocol(
+            name='step',
+            stimuli=[ephys.stimuli.NrnSquarePulse(
+                step_amplitude=0.05,
+                step_delay=20,
+                step_duration=50,
+                location=simplecell.soma_loc,
+                total_duration=100)],
+            recordings=[ephys.recordings.CompRecording(
+                name='step.soma.v',
+                location=simplecell.soma_loc,
+                variable='v',
+                sampling_interval=0.5)])
+        response = protocol.run(
+            simplecell.cell_model, param_values, sim=nrn_sim)['step.soma.v']
+
+        numpy.testing.assert_allclose(
+            response['time'], numpy.arange(201) * 0.5, atol=1e-9)
+        assert len(response['voltage']) == 201
+        assert response['voltage'].max() > 0
@@ -106,6 +106,119 @@ def test_nrnsimulator_cvode_minstep():
     evaluator.cell_model.freeze(params)
 
 
+@pytest.mark.unit
+def test_nrnsimulator_coreneuron():
+    """ephys.simulators: test NrnSimulator with CoreNEURON"""
+
+    params = {"gnabar_hh": 0.1, "gkbar_hh": 0.03}
+    simplecell = examples.simplecell.SimpleCell()
+    evaluator = simplecell.cell_evaluator
+    protocol = list(evaluator.fitness_protocols.values())[0]
+
+    expected_responses = protocol.run(
+        evaluator.cell_model,
+        params,
+        sim=ephys.simulators.NrnSimulator(cvode_active=False),
+        isolate=False)
+
+    coreneuron_sim = ephys.simulators.NrnSimulator(coreneuron=True)
+    assert not coreneuron_sim.cvode_active
+
+    responses = protocol.run(
+        evaluator.cell_model, params, sim=coreneuron_sim, isolate=False)
+
+    for name, expected_response in expected_responses.items():
+        numpy.testing.assert_array_equal(
+            responses[name]["time"], expected_response["time"])
+        numpy.testing.assert_allclose(
+            responses[name]["voltage"], expected_response["voltage"],
+            atol=1e-8)
+
+    # cvode is replaced by the fixed time step
+    with pytest.warns(UserWarning, match='cvode_active'):
+        coreneuron_sim.run(10, cvode_active=True)
+    pytest.raises(ValueError, coreneuron_sim.run, 10, save_state=True)
+
+
+@pytest.mark.unit
+def test_nrnsimulator_coreneuron_psolve(tmp_path):
+    """ephys.simulators: test CoreNEURON runs with a mocked psolve"""
+
+    import platform
+
+    import neuron
+    from neuron import coreneuron
+
+    params = {"gnabar_hh": 0.1, "gkbar_hh": 0.03}
+    simplecell = examples.simplecell.SimpleCell()
+    evaluator = simplecell.cell_evaluator
+    protocol = list(evaluator.fitness_protocols.values())[0]
+
+    expected_responses = protocol.run(
+        evaluator.cell_model,
+        params,
+        sim=ephys.simulators.NrnSimulator(cvode_active=False),
+        isolate=False)
+
+    # The protocol asks for cvode, which CoreNEURON doesn't support
+    protocol.cvode_active = True
+
+    # Mechanisms compiled for CoreNEURON in mechanisms_directory
+    library = tmp_path / platform.machine() / "libcorenrnmech.so"
+    library.parent.mkdir()
+    library.touch()
+
+    psolve_calls = []
+
+    def psolve(tstop):
+        """Run in Neuron instead of CoreNEURON"""
+        psolve_calls.append(
+            (tstop, coreneuron.enable, os.environ.get("CORENEURONLIB")))
+        neuron.h.continuerun(tstop)
+
+    class Hoc(object):
+        """neuron.h with a mocked ParallelContext.psolve"""
+
+        def __getattr__(self, name):
+            return getattr(neuron.h, name)
+
+        def __setattr__(self, name, value):
+            setattr(neuron.h, name, value)
+
+        def ParallelContext(self):
+            return mock.Mock(wraps=neuron.h.ParallelContext(), psolve=psolve)
+
+    class Neuron(object):
+        """neuron module with the mocked neuron.h"""
+
+        h = Hoc()
+
+        def __getattr__(self, name):
+            return getattr(neuron, name)
+
+    coreneuron_sim = ephys.simulators.NrnSimulator(coreneuron=True)
+    coreneuron_sim.mechanisms_directory = str(tmp_path)
+
+    with mock.patch.object(
+            ephys.simulators.NrnSimulator, "neuron",
+            new_callable=mock.PropertyMock, return_value=Neuron()):
+        with pytest.warns(UserWarning, match="cvode_active"):
+            responses = protocol.run(
+                evaluator.cell_model, params, sim=coreneuron_sim,
+                isolate=False)
+
+    # CoreNEURON and its mechanisms are only enabled during psolve
+    assert psolve_calls == [(protocol.total_duration, True, str(library))]
+    assert not coreneuron.enable
+    assert "CORENEURONLIB" not in os.environ
+
+    for name, expected_response in expected_responses.items():
+        numpy.testing.assert_array_equal(
+            responses[name]["time"], expected_response["time"])
+        numpy.testing.assert_array_equal(
+            responses[name]["voltage"], expected_response["voltage"])
+
+
 @pytest.mark.unit
 def test_neuron_import():
     """ephys.simulators: test if bluepyopt.neuron import was successful"""
@@ -234,3 +347,161 @@ def test_lfpysimulator_disable_banner_exception(mock_glob):
     with warnings.catch_warnings(record=True) as warnings_record:
         ephys.simulators.LFPySimulator._nrn_disable_banner()
         assert len(warnings_record) == 1
+
+
+def _arb_synapse_cell():
+    """Return single compartment Arbor cell with a synapse"""
+
+    from bluepyopt.ephys.acc import arbor
+
+    tree = arbor.segment_tree()
+    tree.append(arbor.mnpos,
+                arbor.mpoint(-3, 0, 0, 3),
+                arbor.mpoint(3, 0, 0, 3),
+                tag=1)
+    labels = arbor.label_dict({'soma': '(tag 1)',
+                               'mid': '(location 0 0.5)'})
+    decor = arbor.decor()
+    decor.paint('"soma"', arbor.density('default::hh'))
+    decor.place('"mid"', arbor.synapse('default::expsyn'), 'syn')
+
+    return arbor.cable_cell(tree, decor, labels)
+
+
+@pytest.mark.unit
+def test_arbsimulator_run_batch():
+    """ephys.simulators: test ArbSimulator run_batch"""
+
+    from bluepyopt.ephys.acc import arbor
+
+    arb_sim = ephys.simulators.ArbSimulator(
+        dt=0.025, threads=2, cpu_group_size=2)
+
+    def events(weight):
+        return [arbor.event_generator(
+            'syn', weight, arbor.explicit_schedule([10 * arbor.units.ms]))]
+
+    batch_cells = [
+        ephys.simulators.ArbBatchCell(
+            _arb_synapse_cell(),
+            probes=[('"mid"', 'v')],
+            event_generators=events(weight),
+            tstop=tstop)
+        for weight, tstop in [(0.0, 30), (0.5, 50)]]
+
+    traces = arb_sim.run_batch(batch_cells)
+
+    assert len(traces) == 2
+    (rest_time, rest_voltage), = traces[0]
+    (syn_time, syn_voltage), = traces[1]
+    assert rest_time[-1] < 30 and syn_time[-1] < 50
+    assert len(rest_time) == 300 and len(syn_time) == 500
+    assert numpy.max(rest_voltage) < -60
+    assert numpy.max(syn_voltage) > 0
+
+    # Same trace as a single cell model
+    arb_cell_model = arbor.single_cell_model(_arb_synapse_cell())
+    arb_cell_model.properties.catalogue = arb_sim.catalogue()
+    arb_cell_model.event_generator(events(0.5)[0])
+    arb_cell_model.probe('voltage', '"mid"', tag='v',
+                         frequency=10 * arbor.units.kHz)
+    arb_sim.run(arb_cell_model, tstop=50)
+
+    numpy.testing.assert_allclose(
+        syn_voltage, numpy.array(arb_cell_model.traces[0].value))
+
+
+@pytest.mark.unit
+def test_arbsimulator_context_catalogue():
+    """ephys.simulators: test ArbSimulator context and catalogue reuse"""
+    import pickle
+
+    arb_sim = ephys.simulators.ArbSimulator(threads=2)
+
+    assert arb_sim.context is arb_sim.context
+    assert arb_sim.context.threads == 2
+    assert arb_sim.partition_hints() == {}
+
+    # Catalogue is built once per process
+    assert arb_sim.catalogue() is \
+        ephys.simulators.ArbSimulator().catalogue()
+    assert 'default::hh' in arb_sim.catalogue()
+
+    # Context is not pickled, a new one is created when needed
+    unpickled_sim = pickle.loads(pickle.dumps(arb_sim))
+    assert unpickled_sim.threads == 2
+    assert unpickled_sim._context is None
+    assert unpickled_sim.context.threads == 2
+
+
+@pytest.mark.unit
+def test_arbsimulator_cv_policy():
+    """ephys.simulators: test ArbSimulator CV policies"""
+
+    from bluepyopt.ephys.acc import arbor
+
+    morph = arbor.load_asc(os.path.join(
+        os.path.dirname(__file__), '../../../examples/l5pc/morphology/'
+        'C060114A7.asc')).morphology
+
+    def num_cv(cv_policy, nseg_frequency=40):
+        arb_sim = ephys.simulators.ArbSimulator(
+            cv_policy=cv_policy, nseg_frequency=nseg_frequency)
+        cable_cell = arb_sim.cable_cell(
+            morph, arbor.decor(), arbor.label_dict())
+        return arbor.cv_data(cable_cell).num_cv
+
+    # Presets are ordered from coarse to fine
+    num_cvs = [num_cv(preset)
+               for preset in ephys.simulators.ArbSimulator.CV_POLICY_PRESETS]
+    assert num_cvs == sorted(num_cvs)
+    assert num_cv('(max-extent 10)') == num_cv('fine')
+
+    # Branches get the nseg of NEURON, at least one compartment
+    assert num_cv('nseg', nseg_frequency=1e6) == num_cv('coarse')
+    assert num_cv('coarse') < num_cv('nseg') < num_cv('finest')
+    assert ephys.simulators.ArbSimulator.nseg_cv_policy(morph, 1e6) == \
+        '(join %s)' % ' '.join(
+            '(fixed-per-branch 1 (branch %d))' % branch
+            for branch in range(morph.num_branches))
+
+    pytest.raises(
+        ValueError, ephys.simulators.ArbSimulator, cv_policy='fastest')
+
+
+@pytest.mark.unit
+def test_benchmark_cv_policies():
+    """ephys.simulators: test benchmark of Arbor CV policies"""
+
+    from bluepyopt.ephys.examples.simplecell import SimpleCell
+
+    soma_loc = ephys.locations.ArbLocsetLocation(
+        name='soma', locset='(location 0 0.5)')
+    protocol = ephys.protocols.ArbSweepProtocol(
+        'step',
+        [ephys.stimuli.NrnSquarePulse(
+            step_amplitude=0.05,
+            step_delay=100,
+            step_duration=50,
+            location=soma_loc,
+            total_duration=200)],
+        [ephys.recordings.CompRecording(
+            name='step.soma.v', location=soma_loc, variable='v')])
+
+    results = ephys.simulators.benchmark_cv_policies(
+        protocol,
+        SimpleCell().cell_model,
+        {'gnabar_hh': 0.1, 'gkbar_hh': 0.03},
+        cv_policies=['coarse', 'fine'],
+        reference='fine',
+        repeat=2,
+        dt=0.025)
+
+    assert list(results) == ['coarse', 'fine']
+    for result in results.values():
+        assert sorted(result) == ['max_error', 'rms_error', 'time']
+        assert result['time'] > 0
+        assert 0 <= result['rms_error'] <= result['max_error']
+
+    # The reference policy doesn't deviate from itself
+    assert results['fine']['max_error'] == 0
@@ -0,0 +1,98 @@
+"""bluepyopt.ephys.timing tests"""
+
+"""
+Copyright (c) 2016-2020, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import os
+import tempfile
+import time
+
+import pytest
+
+import bluepyopt.ephys.examples as examples
+from bluepyopt.ephys import timing
+
+
+@timing.timed('test.sleep')
+def _sleep(duration):
+    """Sleep for duration seconds"""
+    time.sleep(duration)
+
+
+@pytest.mark.unit
+def test_timing_evaluation():
+    """ephys.timing: test timing of the phases of an evaluation"""
+
+    timing.reset()
+
+    # Phases outside of an evaluation are not timed
+    _sleep(0.01)
+    assert not timing.recording()
+    assert timing.summary() == {}
+
+    with timing.evaluation() as record:
+        assert timing.recording()
+        _sleep(0.01)
+        with timing.phase('test.outer'):
+            _sleep(0.01)
+
+    assert record['test.sleep'][1] == 2
+    assert record['test.sleep'][0] >= 0.02
+    assert record['test.outer'][0] >= 0.01
+
+    # Functions run in another process send back their timings
+    with timing.evaluation():
+        result = timing.isolated(_sleep)(0.01)
+        assert timing.collect(result) is None
+
+    summary = timing.summary()
+    assert summary['test.sleep']['count'] == 3
+    assert summary['evaluation']['count'] == 2
+    assert summary['test.sleep']['mean'] >= 0.01
+
+    timing.reset()
+    assert timing.summary() == {}
+
+
+@pytest.mark.unit
+def test_timing_evaluator():
+    """ephys.timing: test timing file of CellEvaluator with isolation"""
+
+    simplecell = examples.simplecell.SimpleCell()
+    evaluator = simplecell.cell_evaluator
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        timing_file = os.path.join(tmp_dir, 'timings.jsonl')
+        evaluator.timings = timing_file
+
+        evaluator.evaluate_with_lists([0.1, 0.03])
+        evaluator.evaluate_population([[0.1, 0.03], [0.06, 0.065]])
+
+        summary = timing.read_timing_file(timing_file)
+
+    # One evaluation, two protocol tasks and two scorings
+    assert summary['evaluation']['count'] == 5
+    assert summary['protocol.run']['count'] == 3
+    # Phases in the isolated processes are included
+    for phase_name in ['cell_model.instantiate', 'morphology.instantiate',
+                       'parameter.instantiate', 'simulator.run']:
+        assert summary[phase_name]['count'] >= 3
+    assert summary['efeature.calculate_batch']['count'] == 3
+    assert summary['protocol.run']['total'] >= \
+        summary['simulator.run']['total']
@@ -134,6 +134,40 @@ class TestL5PCEvaluator(object):
             expected_results["TestL5PCEvaluator.test_eval"].keys()
         )
 
+    @pytest.mark.slow
+    def test_eval_coreneuron(self, monkeypatch):
+        """L5PC: test CoreNEURON traces are the ones of Neuron
+
+        Needs the mechanisms compiled with nrnivmodl -coreneuron
+        (make l5pc_nrnivmodl_coreneuron)
+        """
+        import numpy
+
+        library = os.path.join(L5PC_PATH, "x86_64", "libcorenrnmech.so")
+        if not os.path.exists(library):
+            pytest.skip("l5pc mechanisms not compiled for CoreNEURON")
+        monkeypatch.setenv("CORENEURONLIB", library)
+
+        protocol = self.l5pc_evaluator.fitness_protocols["bAP"]
+
+        expected_responses = protocol.run(
+            self.l5pc_evaluator.cell_model,
+            release_parameters,
+            sim=ephys.simulators.NrnSimulator(cvode_active=False),
+            isolate=False)
+        responses = protocol.run(
+            self.l5pc_evaluator.cell_model,
+            release_parameters,
+            sim=ephys.simulators.NrnSimulator(coreneuron=True),
+            isolate=False)
+
+        for name, expected_response in expected_responses.items():
+            numpy.testing.assert_array_equal(
+                responses[name]["time"], expected_response["time"])
+            numpy.testing.assert_allclose(
+                responses[name]["voltage"], expected_response["voltage"],
+                atol=1e-8)
+
     def teardown_method(self):
         """Teardown"""
         pass